@@ -1,26 +1,29 @@
-import RPi.GPIO as GPIO
-import time
-from board import D22, D27, D4
-from adafruit_bitbangio import I2C
-import adafruit_tcs34725
-from datetime import datetime, timedelta
-import requests
-import adafruit_dht
+from datetime import datetime
 import json
 import os
-import board
-import busio
-import adafruit_ads1x15.ads1115 as ADS
-from adafruit_ads1x15.analog_in import AnalogIn
-from collections import defaultdict
+import threading
+import atexit
+import hardware
+from hardware import GPIO, clock
 from sensors.flow_sensor import FlowSensor
 from sensors.color_sensor import ColorSensor
-from sensors.dht22_sensor import DHT22Sensor
+from sensors.dht22_sensor import DHT22Sensor, DHT22Sampler
 from sensors.wind_sensor import WindSensor
 from sensors.pressure_sensor import PressureSensor
 from sensors.wind_direction_sensor import WindDirectionSensor
+from sensors.ads1115_engine import ADS1115Engine
 from services.mqtt_publisher import MqttPublisher
+from services.mqtt_journal import MqttJournal
 from services.log_manager import LogManager
+from services.batch_writer import BatchWriter
+from services.acquisition import AcquisitionEngine
+from services.scheduler import Scheduler
+from services.recorder import SampleRecorder
+from services.series_store import SeriesStore
+from services.binary_series import BinarySeries
+from services.rollup import RollupEngine, LINEAR, CIRCULAR
+from services.live_feed import LiveFeedSender
+from services.live_snapshot import LiveSnapshotWriter
 from logging_utils import calculate_flow_rate
 
 # --- CONFIG ---
@@ -30,23 +33,62 @@ LED_PIN = 17
 NUM_COLOR_READINGS = 4
 COLOR_READ_SPACING = 2  # seconds between color readings
 GROUP_INTERVAL = 5  # minutes between groups
-DHT_PIN = D4  # Use board pin object for AM2302/DHT22
+DHT_PIN = "D4"  # board pin name for AM2302/DHT22
 WIND_SENSOR_PIN = 13  # BCM numbering for wind anemometer (using blue wire)
 
 ERROR_LOG_FILE = "error_log.txt"
 SOFTWARE_VERSION = "1.0.0"
 AVG_PRESSURE_LOG_FILE = "avg_pressure_log.txt"
-AVG_PRESSURE_INTERVAL = 300  # 5 minutes in seconds
 AVG_WIND_LOG_FILE = "avg_wind_log.txt"
-AVG_WIND_INTERVAL = 300  # 5 minutes in seconds
 AVG_TEMPERATURE_LOG_FILE = "avg_temperature_log.txt"
-AVG_TEMPERATURE_INTERVAL = 300  # 5 minutes in seconds
 AVG_FLOW_LOG_FILE = "avg_flow_log.txt"
-AVG_FLOW_INTERVAL = 300  # 5 minutes in seconds
 AVG_WIND_DIRECTION_LOG_FILE = "avg_wind_direction_log.txt"
+ROLLUP_LOG_FILE = "rollup_{tier}_log.txt"
+COLOR_LOG_FILE = "color_log.txt"
+ACQUISITION_INTERVAL = 1  # seconds between sensor frames
+# Rolled-up metrics: metric -> (kind, avg log file, label, value format)
+ROLLUP_METRICS = {
+    "flow": (LINEAR, AVG_FLOW_LOG_FILE, "avg_flow", "{:.4f}"),
+    "pressure": (LINEAR, AVG_PRESSURE_LOG_FILE, "avg_psi", "{:.2f}"),
+    "wind": (LINEAR, AVG_WIND_LOG_FILE, "avg_wind", "{:.2f}"),
+    "temperature": (LINEAR, AVG_TEMPERATURE_LOG_FILE, "avg_temp", "{:.2f}"),
+    "wind_direction": (CIRCULAR, AVG_WIND_DIRECTION_LOG_FILE, "avg_wind_direction", "{:.2f}"),
+}
+# Rollup tiers, finest first; each bucket closes on a wall-clock multiple of
+# its width and is merged into the next tier. Sinks: "avg_log" writes the
+# avg_*_log.txt lines, "flow_5s_log" the granular flow line while water is
+# flowing, "rollup_log" one line per metric to rollup_<tier>_log.txt.
+# retention = closed buckets kept in memory per metric.
+DEFAULT_ROLLUP_TIERS = [
+    {"name": "1s", "seconds": 1, "retention": 300},
+    {"name": "5s", "seconds": 5, "retention": 720, "sinks": ["flow_5s_log"]},
+    {"name": "1min", "seconds": 60, "retention": 1440},
+    {"name": "5min", "seconds": 300, "retention": 2016, "sinks": ["avg_log"]},
+    {"name": "1h", "seconds": 3600, "retention": 720, "sinks": ["rollup_log"]},
+    {"name": "1day", "seconds": 86400, "retention": 365, "sinks": ["rollup_log"]},
+]
+# Log rotation (see services/log_manager.py): log file -> max_bytes / max_age_s /
+# keep (closed segments kept) / compress (gzip closed segments); "default"
+# covers the avg_* and rollup_* logs.
+DEFAULT_LOG_ROTATION = {
+    "default": {"max_bytes": 1048576, "keep": 50},
+    ERROR_LOG_FILE: {"max_bytes": 262144, "keep": 8, "compress": True},
+    COLOR_LOG_FILE: {"max_bytes": 262144, "keep": 4},
+}
+# Per-sensor acquisition timeouts (seconds). Polling-mode pulse reads take 1 s;
+# ADC reads are a few milliseconds.
+SENSOR_TIMEOUTS = {
+    "flow": 1.5,
+    "wind": 1.5,
+    "pressure": 0.5,
+    "wind_direction": 0.5,
+}
+DHT_SAMPLE_INTERVAL = 2.5  # seconds between background DHT22 reads (sensor limit ~2 s)
+DHT_STALE_AFTER = 30  # seconds before the cached DHT22 reading is flagged stale
 
 # --- LOAD CONFIG ---
-CONFIG_FILE = "config.json"
+# SENSOR_CONFIG selects another file, e.g. a simulated-hardware config on a dev box.
+CONFIG_FILE = os.environ.get("SENSOR_CONFIG", "config.json")
 def load_config():
     try:
         with open(CONFIG_FILE, "r") as f:
@@ -63,13 +105,53 @@ ENABLE_DHT22 = config.get("enable_dht22", True)
 ENABLE_PRESSURE_SENSOR = config.get("enable_pressure_sensor", True)
 ENABLE_WIND_SENSOR = config.get("enable_wind_sensor", True)
 ENABLE_COLOR_SENSOR = config.get("enable_color_sensor", True)
+# "pi" for real hardware, "sim" for synthetic sensors (see hardware/sim.py)
+HARDWARE_BACKEND = config.get("hardware_backend", "pi")
+MQTT_BROKER = config.get("mqtt_broker", "100.116.147.6")
+MQTT_PORT = config.get("mqtt_port", 1883)
+# Store-and-forward (see services/mqtt_journal.py): messages the broker can't take
+# are journaled here and sent with QoS 1 at up to MQTT_DRAIN_RATE msg/s (0 for
+# no limit) once it is back; the oldest are dropped past MQTT_JOURNAL_MAX_BYTES
+# (~2 msg/s of ~300 bytes, so 64 MiB covers about a day of outage). null disables.
+MQTT_JOURNAL_DIR = config.get("mqtt_journal_dir", "mqtt_journal")
+MQTT_JOURNAL_MAX_BYTES = config.get("mqtt_journal_max_bytes", 64 * 1024 * 1024)
+MQTT_DRAIN_RATE = config.get("mqtt_drain_rate", 20)
+# ADS1115 acquisition engine: samples P0..P3 round-robin on its own thread.
+ENABLE_ADS_ENGINE = config.get("enable_ads_engine", True)
+ADS_DATA_RATE = config.get("ads_data_rate", 128)  # samples/s per conversion (ADS1115 rates: 8..860)
+ADS_SCAN_INTERVAL = config.get("ads_scan_interval", 0.1)  # seconds between channel sweeps
+# Raw-sample recording for replay.py; "{start}" becomes the start time. ~130 bytes/s.
+RECORD_FILE = config.get("record_file")
+ROLLUP_TIERS = config.get("rollup_tiers", DEFAULT_ROLLUP_TIERS)
+# Where averages go: "text" (avg_*_log.txt files), "sqlite" (SERIES_DB_FILE, see
+# services/series_store.py) or "binary" (fixed-width files in SERIES_DIR, see services/binary_series.py)
+SERIES_BACKEND = config.get("series_backend", "text")
+SERIES_DB_FILE = config.get("series_db", "series.db")
+SERIES_DIR = config.get("series_dir", "series")
+# Days of history kept per series in the SQLite store; "default" covers unlisted series
+SERIES_RETENTION_DAYS = config.get("series_retention_days", {"default": 365})
+LOG_ROTATION = config.get("log_rotation", DEFAULT_LOG_ROTATION)
+# Identical error-log messages within this many seconds are written once plus a
+# "repeated N more times" summary (see services/log_manager.py); 0 disables
+ERROR_LOG_COALESCE_S = config.get("error_log_coalesce_s", 60)
+# Write-behind for the text logs (see services/batch_writer.py): a background
+# thread writes batches every flush_interval_s or max_batch_bytes (with fsync
+# if set), so SD-card stalls never reach the sampling loop; null writes inline
+WRITE_BEHIND = config.get("write_behind", {"flush_interval_s": 2.0, "max_batch_bytes": 65536, "fsync": False})
+# Local UDP port the per-second payloads are also sent to, for the API's /stream
+# endpoint (see services/live_feed.py); null disables
+LIVE_FEED_PORT = config.get("live_feed_port", 5002)
+# Shared-memory ring of the latest frames for the API's /live endpoint (see
+# services/live_snapshot.py); /dev/shm is RAM, null disables
+LIVE_SNAPSHOT_FILE = config.get("live_snapshot_file", "/dev/shm/sensor_monitor_live")
 
 # --- SETUP ---
-GPIO.setmode(GPIO.BCM)
-GPIO.setup(LED_PIN, GPIO.OUT)
-GPIO.output(LED_PIN, GPIO.LOW)
-GPIO.setup(FLOW_SENSOR_PIN, GPIO.IN, pull_up_down=GPIO.PUD_UP)
-GPIO.setup(WIND_SENSOR_PIN, GPIO.IN)
+def setup_gpio():
+    GPIO.setmode(GPIO.BCM)
+    GPIO.setup(LED_PIN, GPIO.OUT)
+    GPIO.output(LED_PIN, GPIO.LOW)
+    GPIO.setup(FLOW_SENSOR_PIN, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+    GPIO.setup(WIND_SENSOR_PIN, GPIO.IN)
 
 # --- Wind direction calibration constants (from wind_direction_test.py) ---
 CAL_N_RAW = 14350  # North
@@ -102,88 +184,293 @@ def degrees_to_compass(degrees):
     return COMPASS_LABELS[idx]
 
 # --- Modularized Sensor Reading Functions ---
-def get_flow_reading():
-    """Read flow sensor if enabled. Returns dict with timestamp, pulses, litres, rate."""
-    if not ENABLE_FLOW_SENSOR:
-        return {"timestamp": datetime.now().isoformat(), "flow_pulses": None, "flow_litres": None, "flow_rate_lpm": None}
-    pulses, litres = poll_flow_meter(1.0)
-    if not is_sane_flow(pulses, litres):
-        log_mgr.log_error(f"Flow reading out of range: pulses={pulses}, litres={litres}")
-        return {"timestamp": datetime.now().isoformat(), "flow_pulses": None, "flow_litres": None, "flow_rate_lpm": None}
-    rate = calculate_flow_rate(litres, 1.0)
-    return {"timestamp": datetime.now().isoformat(), "flow_pulses": pulses, "flow_litres": litres, "flow_rate_lpm": rate}
-
-def get_pressure_reading(pressure_sensor):
-    """Read pressure sensor if enabled. Returns dict with timestamp, psi, kpa."""
-    if not ENABLE_PRESSURE_SENSOR or pressure_sensor is None:
-        return {"timestamp": datetime.now().isoformat(), "pressure_psi": None, "pressure_kpa": None}
-    try:
-        pressure = pressure_sensor.read()
-        return {
-            "timestamp": pressure["timestamp"],
-            "pressure_psi": pressure["pressure_psi"],
-            "pressure_kpa": pressure["pressure_kpa"]
-        }
-    except Exception as e:
-        log_mgr.log_error(f"Pressure sensor read error: {e}")
-    return {"timestamp": datetime.now().isoformat(), "pressure_psi": None, "pressure_kpa": None}
-
-def get_wind_reading(wind_sensor):
-    """Read wind speed and direction if enabled. Returns dict with timestamp, speed, deg, compass."""
-    if not ENABLE_WIND_SENSOR:
-        return {"timestamp": datetime.now().isoformat(), "wind_speed": None, "wind_direction_deg": None, "wind_direction_compass": None}
-    wind = wind_sensor.read()
-    # --- Wind direction reading ---
+def get_dht22_reading(dht_sampler):
+    """Latest DHT22 reading from the background sampler (never blocks). Adds age_s and stale."""
+    if not ENABLE_DHT22 or dht_sampler is None:
+        return {"timestamp": clock.now().isoformat(), "temperature": None, "humidity": None, "age_s": None, "stale": True}
+    return dht_sampler.latest()
+
+# --- Acquisition helpers (one reading per sensor per tick) ---
+def empty_flow_reading():
+    return {"timestamp": clock.now().isoformat(), "flow_pulses": None, "flow_litres": None, "flow_rate_lpm": None}
+
+def empty_pressure_reading():
+    return {"timestamp": clock.now().isoformat(), "pressure_psi": None, "pressure_kpa": None}
+
+def empty_wind_reading():
+    return {"timestamp": clock.now().isoformat(), "wind_speed": None}
+
+def empty_wind_direction_reading():
+    return {"timestamp": clock.now().isoformat(), "wind_direction_deg": None, "wind_direction_compass": None}
+
+def read_flow(flow_sensor):
+    """Read the flow sensor and add the flow rate in L/min."""
+    flow = flow_sensor.read()
+    flow["flow_rate_lpm"] = calculate_flow_rate(flow["flow_litres"], flow["elapsed_s"])
+    return flow
+
+def build_acquisition(log_mgr, flow_sensor, pressure_sensor, wind_sensor, wind_direction_sensor):
+    """Register every available sensor with a concurrent AcquisitionEngine."""
+    engine = AcquisitionEngine(log_mgr)
+    # Pressure and wind direction are two channels of one ADS1115. Without the
+    # ADC engine a channel read is a config write followed by a conversion
+    # read on the bus, so serialize them.
+    ads_lock = threading.Lock()
+    if flow_sensor is not None:
+        engine.register("flow", lambda: read_flow(flow_sensor), SENSOR_TIMEOUTS["flow"], empty_flow_reading)
+    if pressure_sensor is not None:
+        engine.register("pressure", pressure_sensor.read, SENSOR_TIMEOUTS["pressure"], empty_pressure_reading, lock=ads_lock)
+    if wind_sensor is not None:
+        engine.register("wind", wind_sensor.read, SENSOR_TIMEOUTS["wind"], empty_wind_reading)
     if wind_direction_sensor is not None:
-        wind_dir = wind_direction_sensor.read()
-        wind["wind_direction_deg"] = wind_dir["wind_direction_deg"]
-        wind["wind_direction_compass"] = wind_dir["wind_direction_compass"]
-    else:
-        wind["wind_direction_deg"] = None
-        wind["wind_direction_compass"] = None
-    return {"timestamp": datetime.now().isoformat(), "wind_speed": wind["wind_speed"], "wind_direction_deg": wind["wind_direction_deg"], "wind_direction_compass": wind["wind_direction_compass"]}
-
-def get_dht22_reading(dht_device):
-    """Read DHT22 if enabled. Returns dict with timestamp, temp, humidity. Retries up to 3 times if needed."""
-    if not ENABLE_DHT22 or dht_device is None:
-        return {"timestamp": datetime.now().isoformat(), "temperature": None, "humidity": None}
-    attempts = 3
-    for attempt in range(attempts):
-        data = read_dht_sensor(dht_device)
-        if data and is_sane_temp(data.get("temperature")) and is_sane_humidity(data.get("humidity")):
-            temp = data.get("temperature")
-            hum = data.get("humidity")
-            return {"timestamp": data["timestamp"], "temperature": temp, "humidity": hum}
-        time.sleep(0.3)
-    log_mgr.log_error("DHT22: No valid reading this second after 3 attempts.")
-    return {"timestamp": datetime.now().isoformat(), "temperature": None, "humidity": None}
+        engine.register("wind_direction", wind_direction_sensor.read, SENSOR_TIMEOUTS["wind_direction"],
+                        empty_wind_direction_reading, lock=ads_lock)
+    return engine
 
 # --- Reporting/Logging Functions ---
-def log_5min_average(logfile, avg_value, label, sample_count):
+def log_5min_average(logfile, avg_value, label, sample_count, log_mgr):
     """Append a 5-min average to a log file."""
     try:
-        with open(logfile, "a") as f:
-            f.write(f"{datetime.now().isoformat()}, {label}={avg_value}, samples={sample_count}\n")
+        log_mgr.append(logfile, f"{clock.now().isoformat()}, {label}={avg_value}, samples={sample_count}\n")
         print(f"[DEBUG] Logged 5-min avg {label}: {avg_value} over {sample_count} samples")
     except Exception as e:
         log_mgr.log_error(f"Failed to write avg {label} log: {e}")
 
+def format_average(metric, value, label=None):
+    """Format an averaged value the way the avg_*_log.txt files hold it."""
+    text = ROLLUP_METRICS[metric][3].format(value)
+    return f"{text},{label}" if ROLLUP_METRICS[metric][0] == CIRCULAR else text
+
+def write_rollup_log(tier, metric, bucket, log_mgr):
+    """Append one rollup bucket to rollup_<tier>_log.txt."""
+    fmt = ROLLUP_METRICS[metric][3]
+    line = f"{datetime.fromtimestamp(bucket.start).isoformat()}, {metric}={format_average(metric, bucket.mean, bucket.label)}"
+    if bucket.min is not None:
+        line += f", min={fmt.format(bucket.min)}, max={fmt.format(bucket.max)}"
+    log_mgr.append(ROLLUP_LOG_FILE.format(tier=tier.name), f"{line}, samples={bucket.count}\n")
+
+def setup_log_rotation(log_mgr, tiers):
+    """Apply LOG_ROTATION to the error, colour, avg_* and rollup_* logs."""
+    logs = [ERROR_LOG_FILE, COLOR_LOG_FILE] + [spec[1] for spec in ROLLUP_METRICS.values()]
+    logs += [ROLLUP_LOG_FILE.format(tier=t["name"]) for t in tiers if "rollup_log" in t.get("sinks", [])]
+    for log_file in logs:
+        policy = LOG_ROTATION.get(log_file, LOG_ROTATION.get("default"))
+        if policy:
+            log_mgr.set_rotation(log_file, **policy)
+
+def build_rollups(tiers, log_mgr, write_average, write_rollup):
+    """
+    Create the RollupEngine for ROLLUP_METRICS with the configured tiers.
+    write_average(metric, bucket) and write_rollup(tier, metric, bucket) store
+    what the "avg_log"/"flow_5s_log" and "rollup_log" sinks emit.
+    """
+    # Granular flow lines are skipped where a 5-min (avg_log) line is written
+    avg_log_seconds = [t["seconds"] for t in tiers if "avg_log" in t.get("sinks", [])]
+
+    def avg_log(tier, metric, bucket):
+        if bucket.mean is not None:
+            write_average(metric, bucket)
+
+    def flow_5s_log(tier, metric, bucket):
+        if metric != "flow" or bucket.mean <= 0:
+            return
+        if any(bucket.end % seconds == 0 for seconds in avg_log_seconds):
+            return
+        write_average(metric, bucket)
+
+    def rollup_log(tier, metric, bucket):
+        if bucket.mean is not None:
+            write_rollup(tier, metric, bucket)
+
+    sinks = {"avg_log": avg_log, "flow_5s_log": flow_5s_log, "rollup_log": rollup_log}
+    engine = RollupEngine({metric: spec[0] for metric, spec in ROLLUP_METRICS.items()}, log_mgr=log_mgr)
+    for tier in tiers:
+        engine.add_tier(tier["name"], tier["seconds"], tier.get("retention", 0),
+                        [sinks[name] for name in tier.get("sinks", [])])
+    return engine
+
+# --- Processing pipeline (shared by the live loop and replay.py) ---
+def run_pipeline(scheduler, read_frame, read_color, mqtt_publisher, log_mgr, recorder=None, store=None,
+                 live_feed=None, snapshot=None):
+    """
+    Register the acquisition, averaging and colour jobs on `scheduler` and run it.
+    read_frame() returns {"flow", "pressure", "wind", "wind_direction", "dht22"}
+    readings (missing keys count as no reading) and raises StopIteration when a
+    replayed recording runs out. read_color() returns the colour readings, or
+    is None when there is no colour sensor. If given, `recorder` captures every
+    frame, colour cycle and logged average. If a SeriesStore or BinarySeries is
+    given, averages, rollups and moisture go to it instead of the avg_*/rollup_*
+    log files. A LiveFeedSender gets a copy of every MQTT payload, and a
+    LiveSnapshotWriter every frame.
+    """
+    def publish(topic, payload):
+        mqtt_publisher.publish(topic, payload)
+        if live_feed is not None:
+            live_feed.publish(topic, payload)
+
+    def write_average(metric, bucket):
+        _, logfile, label, _ = ROLLUP_METRICS[metric]
+        avg_value = format_average(metric, bucket.mean, bucket.label)
+        if store is not None:
+            store.append(metric, bucket.end, bucket.mean, samples=bucket.count,
+                         min=bucket.min, max=bucket.max, label=bucket.label)
+            print(f"[DEBUG] Stored avg {label}: {avg_value} over {bucket.count} samples")
+        else:
+            log_5min_average(logfile, avg_value, label, bucket.count, log_mgr)
+        if recorder is not None:
+            recorder.record_aggregate(label, avg_value, bucket.count)
+
+    def write_rollup(tier, metric, bucket):
+        if store is not None:
+            # Tiers are stored as their own series, e.g. "pressure@1h"
+            store.append(f"{metric}@{tier.name}", bucket.start, bucket.mean, samples=bucket.count,
+                         min=bucket.min, max=bucket.max, label=bucket.label)
+        else:
+            write_rollup_log(tier, metric, bucket, log_mgr)
+        if recorder is not None:
+            recorder.record_aggregate(f"{metric}@{tier.name}", format_average(metric, bucket.mean, bucket.label),
+                                      bucket.count)
+
+    rollups = build_rollups(ROLLUP_TIERS, log_mgr, write_average, write_rollup)
+
+    def close_buckets():
+        rollups.advance(clock.time())
+        if store is not None:
+            store.flush_if_due(clock.time())
+
+    def acquire_and_publish():
+        # --- Step 1: Collect all sensor readings ---
+        try:
+            frame = read_frame()
+        except StopIteration:
+            # Replay source exhausted
+            scheduler.stop()
+            return
+        # The frame's time, taken once next to its FRAME record, so a replay files it in the same windows
+        now = clock.time()
+        if recorder is not None:
+            recorder.record_frame(frame)
+        flow = frame.get("flow") or empty_flow_reading()
+        pressure = frame.get("pressure") or empty_pressure_reading()
+        wind = frame.get("wind") or empty_wind_reading()
+        wind_dir = frame.get("wind_direction") or empty_wind_direction_reading()
+        wind["wind_direction_deg"] = wind_dir["wind_direction_deg"]
+        wind["wind_direction_compass"] = wind_dir["wind_direction_compass"]
+        dht = frame.get("dht22") or get_dht22_reading(None)
+        # --- Step 2: Publish/report per-second data ---
+        sets_data = {
+            "sensor_name": SENSOR_NAME,
+            "timestamp": flow["timestamp"],
+            "flow_pulses": flow["flow_pulses"],
+            "flow_litres": flow["flow_litres"],
+            "flow_rate_lpm": flow["flow_rate_lpm"],
+            "pressure_psi": pressure["pressure_psi"],
+            "pressure_kpa": pressure["pressure_kpa"],
+            "version": SOFTWARE_VERSION
+        }
+        publish("sensors/sets", sets_data)
+        environment_data = {
+            "sensor_name": SENSOR_NAME,
+            "timestamp": dht["timestamp"],
+            "temperature": dht["temperature"],
+            "humidity": dht["humidity"],
+            "dht_age_s": dht["age_s"],
+            "dht_stale": dht["stale"],
+            "wind_speed": wind["wind_speed"],
+            "wind_direction_deg": wind["wind_direction_deg"],
+            "wind_direction_compass": wind["wind_direction_compass"],
+            "barometric_pressure": None,
+            "version": SOFTWARE_VERSION
+        }
+        publish("sensors/environment", environment_data)
+        if snapshot is not None:
+            snapshot.write({**sets_data, **environment_data, "timestamp": now})
+        # --- Step 3: Feed the rollup tiers (5-sec, 5-min, hourly, ... averages) ---
+        rollups.add(now, {
+            "flow": flow["flow_litres"],
+            "pressure": pressure["pressure_psi"],
+            "wind": wind["wind_speed"],
+            # Skip stale values so a failed sensor doesn't keep feeding the average its last reading.
+            "temperature": None if dht["stale"] else dht["temperature"],
+            "wind_direction": (wind["wind_direction_deg"], wind["wind_direction_compass"]),
+        })
+
+    # --- Step 6: Plant/color reporting every GROUP_INTERVAL minutes ---
+    # Runs as a background job: a colour cycle takes ~7 s (LED settle plus
+    # COLOR_READ_SPACING between readings) and must not stall the 1 Hz stream.
+    # The result is published as soon as the cycle completes.
+    def report_plant():
+        color_readings = read_color()
+        if recorder is not None:
+            recorder.record_color(color_readings)
+        if color_readings:
+            avg_b = sum(d['b'] for d in color_readings) / len(color_readings)
+            avg_lux = sum(d['lux'] for d in color_readings) / len(color_readings)
+            ts = color_readings[0]['timestamp']
+            try:
+                with open("calibration.json", "r") as f:
+                    calib = json.load(f)
+                b_dry = float(calib["white_stick"]["b"])
+                b_wet = float(calib["blue_stick"]["b"])
+                if b_wet == b_dry:
+                    moisture_pct = 0.0
+                else:
+                    moisture_pct = (avg_b - b_dry) / (b_wet - b_dry) * 100.0
+                    moisture_pct = max(0.0, min(100.0, moisture_pct))
+            except Exception as e:
+                log_mgr.log_error(f"Failed to load or use calibration.json: {e}")
+                moisture_pct = None
+        else:
+            avg_lux, ts, moisture_pct = None, clock.now().isoformat(), None
+        plant_data = {
+            "sensor_name": SENSOR_NAME,
+            "timestamp": ts,
+            "moisture": moisture_pct,
+            "lux": avg_lux,
+            "soil_temperature": None,
+            "version": SOFTWARE_VERSION
+        }
+        publish("sensors/plant", plant_data)
+        if store is not None and moisture_pct is not None:
+            store.append("moisture", clock.time(), moisture_pct)
+        log_mgr.append(COLOR_LOG_FILE, json.dumps(plant_data) + "\n")
+
+    # Job order matters for jobs due in the same pass: acquisition first, then
+    # closing the rollup buckets that ended (every tier in one pass, finest first).
+    scheduler.add_job("acquire", ACQUISITION_INTERVAL, acquire_and_publish)
+    scheduler.add_job("rollup", rollups.tiers[0].seconds, close_buckets, align=True)
+    if log_mgr.coalesce_window_s:
+        # Writes the repeat summaries of coalesced errors once their window has ended
+        scheduler.add_job("log_flush", log_mgr.coalesce_window_s, log_mgr.flush)
+    if read_color is not None:
+        scheduler.add_job("color", GROUP_INTERVAL * 60, report_plant, background=True)
+    # Step 7 (trim stdout_log.txt) is disabled: handled by logrotate or external tool
+    scheduler.run_forever()
+
 # --- Main Loop with Scheduler ---
 def main():
-    print(f"[DEBUG] Starting SensorMonitor main loop... (version {SOFTWARE_VERSION})")
-    log_mgr = LogManager(ERROR_LOG_FILE)
+    hardware.select_backend(HARDWARE_BACKEND, config.get("sim"))
+    print(f"[DEBUG] Starting SensorMonitor main loop... (version {SOFTWARE_VERSION}, hardware: {HARDWARE_BACKEND})")
+    setup_gpio()
+    writer = BatchWriter(**WRITE_BEHIND) if WRITE_BEHIND else None
+    log_mgr = LogManager(ERROR_LOG_FILE, coalesce_window_s=ERROR_LOG_COALESCE_S, writer=writer)
+    # Also drains the write-behind queue if cleanup below is interrupted (a second Ctrl+C)
+    atexit.register(log_mgr.close)
+    setup_log_rotation(log_mgr, ROLLUP_TIERS)
     # Sensor initialization
     flow_sensor = None
     color_sensor = None
     dht22_sensor = None
+    dht_sampler = None
     wind_sensor = None
     pressure_sensor = None
     ads = None
+    ads_engine = None
     wind_direction_sensor = None
     if ENABLE_FLOW_SENSOR:
         try:
             flow_sensor = FlowSensor(FLOW_SENSOR_PIN, FLOW_PULSES_PER_LITRE)
-            print("[DEBUG] Flow sensor initialized.")
+            print(f"[DEBUG] Flow sensor initialized (interrupt counting: {flow_sensor.interrupt_mode}).")
         except Exception as e:
             log_mgr.log_error(f"Flow sensor init error: {e}")
             flow_sensor = None
@@ -196,7 +483,10 @@ def main():
             color_sensor = None
     if ENABLE_DHT22:
         try:
-            dht22_sensor = DHT22Sensor(DHT_PIN)
+            dht22_sensor = DHT22Sensor(getattr(hardware.board, DHT_PIN))
+            # The DHT22 is polled on its own thread; the main loop only reads the cached value.
+            dht_sampler = DHT22Sampler(dht22_sensor, DHT_SAMPLE_INTERVAL, DHT_STALE_AFTER, log_mgr=log_mgr)
+            dht_sampler.start()
             print("[DEBUG] DHT22 sensor initialized.")
         except Exception as e:
             log_mgr.log_error(f"DHT22 init error: {e}")
@@ -204,213 +494,101 @@ def main():
     if ENABLE_WIND_SENSOR:
         try:
             wind_sensor = WindSensor(WIND_SENSOR_PIN)
-            print("[DEBUG] Wind sensor initialized.")
+            print(f"[DEBUG] Wind sensor initialized (interrupt counting: {wind_sensor.interrupt_mode}).")
         except Exception as e:
             log_mgr.log_error(f"Wind sensor init error: {e}")
             wind_sensor = None
     if ENABLE_PRESSURE_SENSOR or True:  # Ensure ADS is always initialized if wind direction is needed
         try:
-            import busio
-            import board
-            ads = ADS.ADS1115(busio.I2C(board.SCL, board.SDA))
+            ads = hardware.ADS1115(hardware.I2C(hardware.board.SCL, hardware.board.SDA))
             print("[DEBUG] ADS1115 initialized.")
+            if ENABLE_ADS_ENGINE:
+                ads_engine = ADS1115Engine(ADS_DATA_RATE, ADS_SCAN_INTERVAL, log_mgr=log_mgr)
             if ENABLE_PRESSURE_SENSOR:
-                pressure_sensor = PressureSensor(ads)
+                pressure_sensor = PressureSensor(ads, hardware.P0, engine=ads_engine)
                 print("[DEBUG] Pressure sensor initialized.")
             # --- Wind direction sensor ---
-            wind_direction_sensor = WindDirectionSensor(ads)
+            wind_direction_sensor = WindDirectionSensor(ads, hardware.P1, engine=ads_engine)
             print("[DEBUG] Wind direction sensor initialized.")
+            if ads_engine is not None:
+                ads_engine.start()
+                print(f"[DEBUG] ADS1115 engine started ({ADS_DATA_RATE} SPS, channels: {ads_engine.channels()}).")
         except Exception as e:
             log_mgr.log_error(f"ADS1115 init error: {e}")
             pressure_sensor = None
             wind_direction_sensor = None
+            ads_engine = None
     # MQTT setup (now using MqttPublisher)
-    mqtt_broker = "100.116.147.6"
-    mqtt_port = 1883
-    mqtt_publisher = MqttPublisher(mqtt_broker, mqtt_port, log_file=ERROR_LOG_FILE)
-    # Scheduler state
-    last_run = defaultdict(lambda: 0)
-    readings_accum = defaultdict(list)
-    last_flow_log_time = 0  # For 5s logging when flow > 0
+    journal = None
+    if MQTT_JOURNAL_DIR:
+        try:
+            journal = MqttJournal(MQTT_JOURNAL_DIR, max_bytes=MQTT_JOURNAL_MAX_BYTES, log_mgr=log_mgr)
+        except Exception as e:
+            log_mgr.log_error(f"MQTT journal init error, publishing without store-and-forward: {e}")
+    mqtt_publisher = MqttPublisher(MQTT_BROKER, MQTT_PORT, log_file=ERROR_LOG_FILE, log_mgr=log_mgr,
+                                   journal=journal, drain_rate=MQTT_DRAIN_RATE)
+    acquisition = build_acquisition(log_mgr, flow_sensor, pressure_sensor, wind_sensor,
+                                    wind_direction_sensor)
+    recorder = SampleRecorder(RECORD_FILE) if RECORD_FILE else None
+    if recorder is not None:
+        print(f"[DEBUG] Recording raw samples to {recorder.path}")
+    store = None
     try:
-        while True:
-            now = time.time()
-            # --- Step 1: Collect all sensor readings ---
-            if flow_sensor is not None:
-                try:
-                    flow = flow_sensor.read()
-                    flow["flow_rate_lpm"] = calculate_flow_rate(flow["flow_litres"], 1.0)
-                except Exception as e:
-                    log_mgr.log_error(f"Flow reading out of range: {e}")
-                    flow = {"timestamp": datetime.now().isoformat(), "flow_pulses": None, "flow_litres": None, "flow_rate_lpm": None}
-            else:
-                flow = {"timestamp": datetime.now().isoformat(), "flow_pulses": None, "flow_litres": None, "flow_rate_lpm": None}
-            if pressure_sensor is not None:
-                try:
-                    pressure = pressure_sensor.read()
-                except Exception as e:
-                    log_mgr.log_error(f"Pressure sensor read error: {e}")
-                    pressure = {"timestamp": datetime.now().isoformat(), "pressure_psi": None, "pressure_kpa": None}
-            else:
-                pressure = {"timestamp": datetime.now().isoformat(), "pressure_psi": None, "pressure_kpa": None}
-            if wind_sensor is not None:
-                wind = wind_sensor.read()
-            else:
-                wind = {"timestamp": datetime.now().isoformat(), "wind_speed": None}
-            # --- Wind direction reading ---
-            if wind_direction_sensor is not None:
-                wind_dir = wind_direction_sensor.read()
-                wind["wind_direction_deg"] = wind_dir["wind_direction_deg"]
-                wind["wind_direction_compass"] = wind_dir["wind_direction_compass"]
-            else:
-                wind["wind_direction_deg"] = None
-                wind["wind_direction_compass"] = None
-            if dht22_sensor is not None:
-                try:
-                    dht = dht22_sensor.read()
-                except Exception as e:
-                    log_mgr.log_error(f"DHT22: No valid reading this second after 3 attempts. {e}")
-                    dht = {"timestamp": datetime.now().isoformat(), "temperature": None, "humidity": None}
-            else:
-                dht = {"timestamp": datetime.now().isoformat(), "temperature": None, "humidity": None}
-            # --- Step 2: Publish/report per-second data ---
-            sets_data = {
-                "sensor_name": SENSOR_NAME,
-                "timestamp": flow["timestamp"],
-                "flow_pulses": flow["flow_pulses"],
-                "flow_litres": flow["flow_litres"],
-                "flow_rate_lpm": flow["flow_rate_lpm"],
-                "pressure_psi": pressure["pressure_psi"],
-                "pressure_kpa": pressure["pressure_kpa"],
-                "version": SOFTWARE_VERSION
-            }
-            mqtt_publisher.publish("sensors/sets", sets_data)
-            environment_data = {
-                "sensor_name": SENSOR_NAME,
-                "timestamp": dht["timestamp"],
-                "temperature": dht["temperature"],
-                "humidity": dht["humidity"],
-                "wind_speed": wind["wind_speed"],
-                "wind_direction_deg": wind["wind_direction_deg"],
-                "wind_direction_compass": wind["wind_direction_compass"],
-                "barometric_pressure": None,
-                "version": SOFTWARE_VERSION
-            }
-            mqtt_publisher.publish("sensors/environment", environment_data)
-            # --- Step 3: Accumulate for 5-min and 5-sec averages ---
-            if flow["flow_litres"] is not None:
-                readings_accum["flow"].append(flow["flow_litres"])
-                # New: maintain a separate 5-sec accumulator for granular logging
-                if "flow_5s" not in readings_accum:
-                    readings_accum["flow_5s"] = []
-                readings_accum["flow_5s"].append(flow["flow_litres"])
-            if pressure["pressure_psi"] is not None:
-                readings_accum["pressure"].append(pressure["pressure_psi"])
-            if wind["wind_speed"] is not None:
-                readings_accum["wind"].append(wind["wind_speed"])
-            if dht["temperature"] is not None:
-                readings_accum["temperature"].append(dht["temperature"])
-            if wind["wind_direction_deg"] is not None:
-                if "wind_direction" not in readings_accum:
-                    readings_accum["wind_direction"] = []
-                readings_accum["wind_direction"].append({
-                    "wind_direction_deg": wind["wind_direction_deg"],
-                    "wind_direction_compass": wind["wind_direction_compass"]
-                })
-            # --- Step 4: Conditional avg_flow logging (dual-accumulator) ---
-            avg_flow_5min = None
-            avg_flow_5s = None
-            if readings_accum["flow"]:
-                avg_flow_5min = sum(readings_accum["flow"]) / len(readings_accum["flow"])
-            if "flow_5s" in readings_accum and readings_accum["flow_5s"]:
-                avg_flow_5s = sum(readings_accum["flow_5s"]) / len(readings_accum["flow_5s"])
-            # Log every 5 minutes (regardless of flow value)
-            if now - last_run["flow_avg"] >= AVG_FLOW_INTERVAL:
-                if avg_flow_5min is not None:
-                    log_5min_average(AVG_FLOW_LOG_FILE, f"{avg_flow_5min:.4f}", "avg_flow", len(readings_accum["flow"]))
-                    readings_accum["flow"] = []
-                last_run["flow_avg"] = now
-                last_flow_log_time = now  # Reset 5s timer after 5min log
-                # Also clear the 5s accumulator to avoid overlap
-                readings_accum["flow_5s"] = []
-            # Log every 5 seconds if avg_flow_5s > 0 (but do not reset 5min timer)
-            elif avg_flow_5s is not None and avg_flow_5s > 0 and now - last_flow_log_time >= 5:
-                log_5min_average(AVG_FLOW_LOG_FILE, f"{avg_flow_5s:.4f}", "avg_flow", len(readings_accum["flow_5s"]))
-                readings_accum["flow_5s"] = []
-                last_flow_log_time = now
-            # --- Step 5: 5-min average logging (scheduler pattern) ---
-            if now - last_run["pressure_avg"] >= AVG_PRESSURE_INTERVAL:
-                if readings_accum["pressure"]:
-                    avg_psi = sum(readings_accum["pressure"]) / len(readings_accum["pressure"])
-                    log_5min_average(AVG_PRESSURE_LOG_FILE, f"{avg_psi:.2f}", "avg_psi", len(readings_accum["pressure"]))
-                    readings_accum["pressure"] = []
-                last_run["pressure_avg"] = now
-            if now - last_run["wind_avg"] >= AVG_WIND_INTERVAL:
-                if readings_accum["wind"]:
-                    avg_wind = sum(readings_accum["wind"]) / len(readings_accum["wind"])
-                    log_5min_average(AVG_WIND_LOG_FILE, f"{avg_wind:.2f}", "avg_wind", len(readings_accum["wind"]))
-                    readings_accum["wind"] = []
-                last_run["wind_avg"] = now
-            if now - last_run["temperature_avg"] >= AVG_TEMPERATURE_INTERVAL:
-                if readings_accum["temperature"]:
-                    avg_temp = sum(readings_accum["temperature"]) / len(readings_accum["temperature"])
-                    log_5min_average(AVG_TEMPERATURE_LOG_FILE, f"{avg_temp:.2f}", "avg_temp", len(readings_accum["temperature"]))
-                    readings_accum["temperature"] = []
-                last_run["temperature_avg"] = now
-            # --- RESTORED: Wind direction 5-min average logging ---
-            if now - last_run["wind_direction_avg"] >= AVG_WIND_INTERVAL:
-                wind_dir_degs = [x["wind_direction_deg"] for x in readings_accum.get("wind_direction", []) if x["wind_direction_deg"] is not None]
-                wind_dir_compass = [x["wind_direction_compass"] for x in readings_accum.get("wind_direction", []) if x["wind_direction_compass"] is not None]
-                if wind_dir_degs:
-                    avg_deg = sum(wind_dir_degs) / len(wind_dir_degs)
-                    from collections import Counter
-                    compass = Counter(wind_dir_compass).most_common(1)[0][0] if wind_dir_compass else None
-                    log_5min_average(AVG_WIND_DIRECTION_LOG_FILE, f"{avg_deg:.2f},{compass}", "avg_wind_direction", len(wind_dir_degs))
-                readings_accum["wind_direction"] = []
-                last_run["wind_direction_avg"] = now
-            # --- Step 6: Plant/color reporting every GROUP_INTERVAL minutes ---
-            if ENABLE_COLOR_SENSOR and color_sensor is not None and now - last_run["color"] >= GROUP_INTERVAL * 60:
-                color_readings = color_sensor.read()
-                if color_readings:
-                    avg_b = sum(d['b'] for d in color_readings) / len(color_readings)
-                    avg_lux = sum(d['lux'] for d in color_readings) / len(color_readings)
-                    ts = color_readings[0]['timestamp']
-                    try:
-                        with open("calibration.json", "r") as f:
-                            calib = json.load(f)
-                        b_dry = float(calib["white_stick"]["b"])
-                        b_wet = float(calib["blue_stick"]["b"])
-                        if b_wet == b_dry:
-                            moisture_pct = 0.0
-                        else:
-                            moisture_pct = (avg_b - b_dry) / (b_wet - b_dry) * 100.0
-                            moisture_pct = max(0.0, min(100.0, moisture_pct))
-                    except Exception as e:
-                        log_mgr.log_error(f"Failed to load or use calibration.json: {e}")
-                        moisture_pct = None
-                else:
-                    avg_lux, ts, moisture_pct = None, datetime.now().isoformat(), None
-                plant_data = {
-                    "sensor_name": SENSOR_NAME,
-                    "timestamp": ts,
-                    "moisture": moisture_pct,
-                    "lux": avg_lux,
-                    "soil_temperature": None,
-                    "version": SOFTWARE_VERSION
-                }
-                mqtt_publisher.publish("sensors/plant", plant_data)
-                with open("color_log.txt", "a") as f:
-                    f.write(json.dumps(plant_data) + "\n")
-                log_mgr.trim_log_file("color_log.txt", 1000)
-                last_run["color"] = now
-            # --- Step 7: Trim stdout_log.txt ---
-            # trim_stdout_log(1000)  # Disabled: handled by logrotate or external tool
+        if SERIES_BACKEND == "sqlite":
+            store = SeriesStore(SERIES_DB_FILE, retention_days=SERIES_RETENTION_DAYS, log_mgr=log_mgr)
+            print(f"[DEBUG] Writing averages to {SERIES_DB_FILE}")
+        elif SERIES_BACKEND == "binary":
+            store = BinarySeries(SERIES_DIR, log_mgr=log_mgr)
+            print(f"[DEBUG] Writing averages to {SERIES_DIR}/*.series")
+    except Exception as e:
+        log_mgr.log_error(f"Series store init error, falling back to text logs: {e}")
+
+    def read_frame():
+        # Sensor reads run concurrently; the DHT22 comes from its sampler's cache.
+        frame = acquisition.acquire()
+        frame["dht22"] = get_dht22_reading(dht_sampler)
+        return frame
+
+    live_feed = LiveFeedSender(("127.0.0.1", LIVE_FEED_PORT)) if LIVE_FEED_PORT else None
+    snapshot = None
+    if LIVE_SNAPSHOT_FILE:
+        try:
+            snapshot = LiveSnapshotWriter(LIVE_SNAPSHOT_FILE)
+            print(f"[DEBUG] Live snapshot at {LIVE_SNAPSHOT_FILE}")
+        except Exception as e:
+            log_mgr.log_error(f"Live snapshot init error: {e}")
+    read_color = color_sensor.read if ENABLE_COLOR_SENSOR and color_sensor is not None else None
+    scheduler = Scheduler(clock=clock.monotonic, sleep=clock.sleep, wall_clock=clock.time, log_mgr=log_mgr)
+    try:
+        run_pipeline(scheduler, read_frame, read_color, mqtt_publisher, log_mgr, recorder, store, live_feed,
+                     snapshot)
     except KeyboardInterrupt:
         print("[INFO] Exiting...")
     finally:
+        log_mgr.flush(force=True)  # pending "repeated N times" summaries
+        # Let an in-progress colour cycle finish so it can't drive the LED after cleanup.
+        scheduler.join_background(timeout=NUM_COLOR_READINGS * (COLOR_READ_SPACING + 1))
+        acquisition.shutdown()
+        if dht_sampler is not None:
+            dht_sampler.stop()
+        if ads_engine is not None:
+            ads_engine.stop()
+        if recorder is not None:
+            recorder.close()
+        if store is not None:
+            store.close()
+        if live_feed is not None:
+            live_feed.close()
+        if snapshot is not None:
+            snapshot.close()
+        for sensor in (flow_sensor, wind_sensor):
+            if sensor is not None:
+                sensor.close()
         GPIO.output(LED_PIN, GPIO.LOW)
         GPIO.cleanup()
-        # No explicit disconnect needed; MqttPublisher handles cleanup
+        # No explicit disconnect needed; close() only stops the journal drain
+        mqtt_publisher.close()
+        log_mgr.close()  # drains the write-behind queue
         print("[INFO] GPIO cleaned up and MQTT publisher stopped.")
 
 if __name__ == "__main__":
@@ -1,9 +1,27 @@
 # Flask API for Average Pressure Log
 # (Restored from archive by Copilot)
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 import os
 import json
+import gzip
+import zlib
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from services.series_store import SeriesStore
+from services.binary_series import BinarySeries
+from services.log_cache import LogCache
+from services.log_search import read_range
+from services.log_manager import log_segments
+from services.downsample import downsample, METHODS as DOWNSAMPLE_METHODS
+from services.range_stats import linear_stats, circular_stats
+from services.live_feed import LiveBroadcaster
+from services.live_snapshot import LiveSnapshotReader
+from sensors.wind_direction_sensor import degrees_to_compass
+import numpy as np
 
 AVG_PRESSURE_LOG_FILE = "avg_pressure_log.txt"
 AVG_WIND_LOG_FILE = "avg_wind_log.txt"
@@ -11,226 +29,572 @@ AVG_FLOW_LOG_FILE = "avg_flow_log.txt"
 AVG_TEMPERATURE_LOG_FILE = "avg_temperature_log.txt"
 COLOR_LOG_FILE = "color_log.txt"
 AVG_WIND_DIRECTION_LOG_FILE = "avg_wind_direction_log.txt"
+ROLLUP_LOG_FILE = "rollup_{tier}_log.txt"  # written by SensorMonitor's "rollup_log" sink
+MAX_N = 500
+MAX_RANGE_RECORDS = 10000  # cap on records returned for one ?start=&end= query
+SERIES_WORKERS = 6  # threads reading series concurrently for /series
+COMPRESS_MIN_BYTES = 1024  # smaller responses are sent uncompressed
+STREAM_KEEPALIVE_S = 15  # comment line sent on idle /stream connections
+MAX_STREAM_CLIENTS = 16  # each /stream connection holds a server thread
+COMPRESS_LEVEL = 5  # gzip/deflate level: most of the size win for a fraction of level 9's CPU
+
+# Same config file as SensorMonitor: "series_backend": "sqlite" or "binary"
+# serves the averages from that store instead of the avg_*_log.txt files.
+CONFIG_FILE = os.environ.get("SENSOR_CONFIG", "config.json")
+try:
+    with open(CONFIG_FILE, "r") as f:
+        config = json.load(f)
+except Exception:
+    config = {}
+SERIES_BACKEND = config.get("series_backend", "text")
+SERIES_DB_FILE = config.get("series_db", "series.db")
+SERIES_DIR = config.get("series_dir", "series")
+LIVE_FEED_PORT = config.get("live_feed_port", 5002)
+LIVE_SNAPSHOT_FILE = config.get("live_snapshot_file", "/dev/shm/sensor_monitor_live")
+if SERIES_BACKEND == "sqlite":
+    store = SeriesStore(SERIES_DB_FILE, readonly=True)
+elif SERIES_BACKEND == "binary":
+    store = BinarySeries(SERIES_DIR)
+else:
+    store = None
+
+# --- Text log line parsers (return a record, or None to skip the line) ---
+def parse_avg_line(value_key):
+    """Parser for avg_*_log.txt lines."""
+    def parse(line):
+        # Example line: 2025-06-19T12:00:00.000000, avg_psi=45.23, samples=300
+        parts = line.split(",")
+        return {
+            "timestamp": parts[0].strip(),
+            value_key: float(parts[1].split("=")[1]),
+            "samples": int(parts[2].split("=")[1])
+        }
+    return parse
+
+def parse_wind_direction_line(line):
+    # Example: 2025-07-03T12:00:00.000000, avg_wind_direction=123.45,NW, samples=300
+    # The compass follows the degrees after a comma (or ";"), so samples is the last field
+    parts = line.split(",")
+    deg_and_compass = parts[1].split("=")[1].split(";")
+    if len(deg_and_compass) > 1:
+        compass = deg_and_compass[1].strip()
+    else:
+        compass = parts[2].strip() if len(parts) > 3 else None
+    return {
+        "timestamp": parts[0].strip(),
+        "avg_wind_direction_deg": float(deg_and_compass[0]),
+        "avg_wind_direction_compass": compass,
+        "samples": int(parts[-1].split("=")[1])
+    }
+
+def parse_moisture_line(line):
+    # Handles both legacy plain text and new JSON lines; AVG and [INFO] lines are skipped.
+    if line.startswith("AVG") or line.startswith("[INFO]"):
+        return None
+    if line.startswith("{"):
+        obj = json.loads(line)
+        ts = obj.get("timestamp")
+        val = obj.get("moisture")
+        if ts is None or val is None:
+            return None
+        return {"timestamp": ts, "value": float(val)}
+    # Legacy plain text line
+    parts = line.split()
+    return {"timestamp": parts[0], "value": float(parts[3].split(":")[1])}
+
+def parse_rollup_line(metric):
+    """Parser for rollup_<tier>_log.txt lines of one metric."""
+    def parse(line):
+        # Example: 2025-07-03T12:00:00, pressure=37.12, min=35.90, max=38.02, samples=3600
+        #          2025-07-03T12:00:00, wind_direction=123.45,SE, samples=3600
+        parts = line.split(", ")
+        fields = dict(part.split("=", 1) for part in parts[1:])
+        if metric not in fields:
+            return None
+        value = fields[metric].split(",")
+        result = {"timestamp": parts[0], "mean": float(value[0]), "samples": int(fields["samples"])}
+        if len(value) > 1:
+            result["compass"] = value[1]
+        if "min" in fields:
+            result["min"] = float(fields["min"])
+            result["max"] = float(fields["max"])
+        return result
+    return parse
+
+# --- Store row converters (same record shapes as the text parsers) ---
+def avg_record(value_key):
+    return lambda row: {"timestamp": row["timestamp"], value_key: row["value"], "samples": row["samples"]}
+
+def wind_direction_record(row):
+    return {"timestamp": row["timestamp"], "avg_wind_direction_deg": row["value"],
+            "avg_wind_direction_compass": row["label"], "samples": row["samples"]}
+
+def moisture_record(row):
+    return {"timestamp": row["timestamp"], "value": row["value"]}
+
+def rollup_record(row):
+    result = {"timestamp": row["timestamp"], "mean": row["value"], "samples": row["samples"]}
+    if row["label"] is not None:
+        result["compass"] = row["label"]
+    if row["min"] is not None:
+        result["min"] = row["min"]
+        result["max"] = row["max"]
+    return result
+
+# series name -> (text log file, line parser, store row converter, record value key)
+SERIES = {
+    "pressure": (AVG_PRESSURE_LOG_FILE, parse_avg_line("avg_psi"), avg_record("avg_psi"), "avg_psi"),
+    "wind": (AVG_WIND_LOG_FILE, parse_avg_line("avg_wind"), avg_record("avg_wind"), "avg_wind"),
+    "flow": (AVG_FLOW_LOG_FILE, parse_avg_line("avg_flow"), avg_record("avg_flow"), "avg_flow"),
+    "temperature": (AVG_TEMPERATURE_LOG_FILE, parse_avg_line("avg_temp"), avg_record("avg_temp"), "avg_temp"),
+    "moisture": (COLOR_LOG_FILE, parse_moisture_line, moisture_record, "value"),
+    "wind_direction": (AVG_WIND_DIRECTION_LOG_FILE, parse_wind_direction_line, wind_direction_record,
+                       "avg_wind_direction_deg"),
+}
+
+def series_spec(name):
+    """(log file, parser, converter, value key) for a series; "<metric>@<tier>" names a rollup tier."""
+    if name in SERIES:
+        return SERIES[name]
+    metric, _, tier = name.partition("@")
+    return ROLLUP_LOG_FILE.format(tier=tier), parse_rollup_line(metric), rollup_record, "mean"
+
+# Parsed-record caches for the text logs, one per series, created on first use
+_caches = {}
+_caches_lock = threading.Lock()
+
+def log_cache(name):
+    with _caches_lock:
+        cache = _caches.get(name)
+        if cache is None:
+            logfile, parse_line = series_spec(name)[:2]
+            cache = _caches[name] = LogCache(logfile, parse_line, maxlen=MAX_N)
+        return cache
+
+# Receives SensorMonitor's per-second payloads; started by the first /stream client
+live = LiveBroadcaster(("127.0.0.1", LIVE_FEED_PORT)) if LIVE_FEED_PORT else None
+_stream_lock = threading.Lock()
+# SensorMonitor's shared-memory ring of recent frames, read without locks
+snapshot = LiveSnapshotReader(LIVE_SNAPSHOT_FILE) if LIVE_SNAPSHOT_FILE else None
+
+# Shared by /series requests; file reads and SQLite queries release the GIL
+_series_pool = ThreadPoolExecutor(max_workers=SERIES_WORKERS, thread_name_prefix="series")
+
+def with_timestamps(rows):
+    """Add ISO "timestamp" fields to store rows (which carry epoch "ts")."""
+    for row in rows:
+        row["timestamp"] = datetime.fromtimestamp(row["ts"]).isoformat()
+    return rows
+
+def store_available():
+    return SERIES_BACKEND != "sqlite" or os.path.exists(SERIES_DB_FILE)
+
+def latest_records(name, n):
+    """The n most recent records of series `name`, oldest first, from the configured backend."""
+    if store is not None:
+        if not store_available():
+            return []
+        to_record = series_spec(name)[2]
+        return [to_record(row) for row in with_timestamps(store.latest(name, n))]
+    return log_cache(name).latest(n)
+
+def range_records(name, start=None, end=None, limit=None):
+    """
+    Records of series `name` with start <= timestamp <= end, oldest first, up to limit.
+    start/end are (iso, epoch) pairs or None. Text logs are binary-searched; the
+    stores use their timestamp index.
+    """
+    logfile, parse_line, to_record, _ = series_spec(name)
+    if store is not None:
+        if not store_available():
+            return []
+        rows = store.range(name, start and start[1], end and end[1], limit)
+        return [to_record(row) for row in with_timestamps(rows)]
+    if not log_segments(logfile):
+        return []
+    return read_range(logfile, parse_line, start and start[0], end and end[0], limit)
+
+def downsample_records(name, records, points, method):
+    """Keep at most `points` of `records` (time-ordered dicts) chosen by `method`."""
+    if len(records) <= points:
+        return records
+    value_key = series_spec(name)[3]
+    try:
+        x = np.array([r["timestamp"] for r in records], dtype="datetime64[us]").astype(np.int64) / 1e6
+    except ValueError:
+        x = np.arange(len(records), dtype=np.float64)  # unparseable (legacy) timestamps: evenly spaced
+    y = np.array([r[value_key] for r in records], dtype=np.float64)
+    return [records[i] for i in downsample(x, y, points, method)]
+
+def downsampled_range(name, start, end, points, method):
+    """Every record in the range, downsampled to `points`."""
+    if SERIES_BACKEND == "binary":
+        # Straight from the mapped arrays: only the kept points become records
+        view = store.range_view(name, start and start[1], end and end[1])
+        if view is None:
+            return []
+        idx = downsample(view["ts_ns"] / 1e9, view["value"], points, method)
+        to_record = series_spec(name)[2]
+        return [to_record(row) for row in with_timestamps(store.to_rows(name, view[idx]))]
+    if SERIES_BACKEND == "sqlite":
+        # Downsample on (ts, value) columns, then fetch only the kept rows in full
+        if not store_available():
+            return []
+        values = np.array(store.range_values(name, start and start[1], end and end[1]), dtype=np.float64)
+        if len(values) == 0:
+            return []
+        idx = downsample(values[:, 1], values[:, 2], points, method)
+        to_record = series_spec(name)[2]
+        return [to_record(row) for row in with_timestamps(store.rows_by_id(values[idx, 0]))]
+    return downsample_records(name, range_records(name, start, end), points, method)
+
+def range_values(name, start=None, end=None):
+    """The values of series `name` in the range as a float64 array, without building records where possible."""
+    if SERIES_BACKEND == "binary":
+        view = store.range_view(name, start and start[1], end and end[1])
+        return np.empty(0) if view is None else view["value"].astype(np.float64)
+    if SERIES_BACKEND == "sqlite":
+        if not store_available():
+            return np.empty(0)
+        values = np.array(store.range_values(name, start and start[1], end and end[1]), dtype=np.float64)
+        return values[:, 2] if len(values) else np.empty(0)
+    value_key = series_spec(name)[3]
+    return np.array([r[value_key] for r in range_records(name, start, end)], dtype=np.float64)
+
+def series_version(name):
+    """
+    (token, mtime) identifying the current contents of series `name`,
+    computed without reading its records: the log or series file's
+    (inode, size, mtime), or the first and last timestamps in SQLite.
+    """
+    if SERIES_BACKEND == "sqlite":
+        if not store_available():
+            return None, None
+        first, last = store.bounds(name)
+        return (first, last), last
+    if SERIES_BACKEND == "binary":
+        path = store.path(name)
+    else:
+        # The active file, or the newest closed segment right after a rotation
+        segments = log_segments(series_spec(name)[0])
+        path = segments[-1] if segments else None
+    try:
+        st = os.stat(path) if path else None
+    except FileNotFoundError:
+        st = None
+    if st is None:
+        return None, None
+    return (st.st_ino, st.st_size, st.st_mtime_ns), st.st_mtime
+
+def conditional_response(names, build):
+    """
+    JSON response of build() with a weak ETag and Last-Modified taken from
+    the versions of series `names` and the query; 304 Not Modified (without
+    calling build) when the client's copy is current.
+    """
+    versions = [series_version(name) for name in names]
+    key = repr((request.path, sorted(request.args.items(multi=True)), [token for token, _ in versions]))
+    etag = hashlib.blake2b(key.encode(), digest_size=12).hexdigest()
+    mtimes = [mtime for _, mtime in versions if mtime is not None]
+    last_modified = datetime.fromtimestamp(int(max(mtimes)), timezone.utc) if mtimes else None
+    if request.if_none_match:
+        fresh = request.if_none_match.contains_weak(etag)
+    else:
+        since = request.if_modified_since
+        fresh = since is not None and last_modified is not None and last_modified <= since
+    response = app.response_class(status=304) if fresh else jsonify(build())
+    response.set_etag(etag, weak=True)  # weak: the same data is served gzipped or not
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.cache_control.no_cache = True  # clients must revalidate, which is now cheap
+    return response
+
+def parse_time_param(value):
+    """ISO 8601 (local time unless it has an offset) or epoch seconds -> (iso, epoch)."""
+    try:
+        dt = datetime.fromtimestamp(float(value))
+    except ValueError:
+        dt = datetime.fromisoformat(value)
+        if dt.tzinfo is not None:
+            dt = dt.astimezone().replace(tzinfo=None)
+    return dt.isoformat(), dt.timestamp()
+
+def parse_range_params():
+    """(start, end) from the query string, each (iso, epoch) or None; raises ValueError."""
+    try:
+        start = parse_time_param(request.args["start"]) if "start" in request.args else None
+        end = parse_time_param(request.args["end"]) if "end" in request.args else None
+    except (ValueError, OverflowError, OSError):
+        raise ValueError("start and end must be ISO 8601 times or epoch seconds")
+    return start, end
+
+def series_query(default_n=5):
+    """
+    Validate the query string and return fetch(name) giving the records it
+    selects: the n most recent records, or with start and/or end the records
+    in that time range (at most `limit`, default and maximum
+    MAX_RANGE_RECORDS, counted from the start of the range). With points,
+    the selection (the whole range, ignoring limit) is downsampled to that
+    many points using downsample=lttb (default) or minmax. Raises ValueError
+    for invalid parameters.
+    """
+    points = request.args.get("points", type=int)
+    method = request.args.get("downsample", default="lttb")
+    if points is not None and (points < 3 or points > MAX_RANGE_RECORDS):
+        raise ValueError(f"points must be between 3 and {MAX_RANGE_RECORDS}")
+    if method not in DOWNSAMPLE_METHODS:
+        raise ValueError(f"downsample must be one of {', '.join(DOWNSAMPLE_METHODS)}")
+    if "start" in request.args or "end" in request.args:
+        start, end = parse_range_params()
+        limit = request.args.get("limit", default=MAX_RANGE_RECORDS, type=int)
+        if limit < 1 or limit > MAX_RANGE_RECORDS:
+            raise ValueError(f"limit must be between 1 and {MAX_RANGE_RECORDS}")
+        if points is not None:
+            return lambda name: downsampled_range(name, start, end, points, method)
+        return lambda name: range_records(name, start, end, limit)
+    n = request.args.get("n", default=default_n, type=int)
+    if n < 1 or n > MAX_N:
+        raise ValueError(f"n must be between 1 and {MAX_N}")
+    if points is not None:
+        return lambda name: downsample_records(name, latest_records(name, n), points, method)
+    return lambda name: latest_records(name, n)
+
+def latest_response(name, default_n=5):
+    """Response for one series endpoint (see series_query for the query params)."""
+    try:
+        fetch = series_query(default_n)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        return conditional_response([name], lambda: fetch(name))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
 app = Flask(__name__)
 
+@app.after_request
+def compress_response(response):
+    """gzip (or deflate) large responses for clients that accept it."""
+    if response.is_streamed or response.direct_passthrough or response.status_code != 200 or "Content-Encoding" in response.headers:
+        return response
+    response.vary.add("Accept-Encoding")
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_BYTES:
+        return response
+    if request.accept_encodings["gzip"]:
+        response.set_data(gzip.compress(data, compresslevel=COMPRESS_LEVEL))
+        response.headers["Content-Encoding"] = "gzip"
+    elif request.accept_encodings["deflate"]:
+        response.set_data(zlib.compress(data, COMPRESS_LEVEL))
+        response.headers["Content-Encoding"] = "deflate"
+    return response
+
 @app.route("/pressure-avg-latest", methods=["GET"])
 def get_recent_avg_pressures():
     """
     Returns the n most recent average pressure readings from avg_pressure_log.txt.
-    Query param: n (default 5)
+    Query params: n (default 5), or start/end (ISO 8601 or epoch seconds) and limit for a time range;
+    points (and downsample=lttb|minmax) to downsample
     """
-    n = request.args.get("n", default=5, type=int)
-    if n < 1 or n > 500:
-        return jsonify({"error": "n must be between 1 and 500"}), 400
-    if not os.path.exists(AVG_PRESSURE_LOG_FILE):
-        return jsonify([])
-    try:
-        with open(AVG_PRESSURE_LOG_FILE, "r") as f:
-            lines = f.readlines()
-        # Get last n non-empty lines
-        lines = [line.strip() for line in lines if line.strip()][-n:]
-        results = []
-        for line in lines:
-            # Example line: 2025-06-19T12:00:00.000000, avg_psi=45.23, samples=300
-            try:
-                parts = line.split(",")
-                timestamp = parts[0].strip()
-                avg_psi = float(parts[1].split("=")[1])
-                samples = int(parts[2].split("=")[1])
-                results.append({
-                    "timestamp": timestamp,
-                    "avg_psi": avg_psi,
-                    "samples": samples
-                })
-            except Exception as e:
-                continue  # skip malformed lines
-        return jsonify(results)
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    return latest_response("pressure")
 
 @app.route("/wind-avg-latest", methods=["GET"])
 def get_recent_avg_wind():
     """
     Returns the n most recent average wind speed readings from avg_wind_log.txt.
-    Query param: n (default 5)
+    Query params: n (default 5), or start/end (ISO 8601 or epoch seconds) and limit for a time range;
+    points (and downsample=lttb|minmax) to downsample
     """
-    n = request.args.get("n", default=5, type=int)
-    if n < 1 or n > 500:
-        return jsonify({"error": "n must be between 1 and 500"}), 400
-    if not os.path.exists(AVG_WIND_LOG_FILE):
-        return jsonify([])
-    try:
-        with open(AVG_WIND_LOG_FILE, "r") as f:
-            lines = f.readlines()
-        lines = [line.strip() for line in lines if line.strip()][-n:]
-        results = []
-        for line in lines:
-            # Example line: 2025-06-19T12:00:00.000000, avg_wind=2.34, samples=300
-            try:
-                parts = line.split(",")
-                timestamp = parts[0].strip()
-                avg_wind = float(parts[1].split("=")[1])
-                samples = int(parts[2].split("=")[1])
-                results.append({
-                    "timestamp": timestamp,
-                    "avg_wind": avg_wind,
-                    "samples": samples
-                })
-            except Exception as e:
-                continue  # skip malformed lines
-        return jsonify(results)
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    return latest_response("wind")
 
 @app.route("/flow-avg-latest", methods=["GET"])
 def get_recent_avg_flow():
     """
     Returns the n most recent average flow readings from avg_flow_log.txt.
-    Query param: n (default 5)
+    Query params: n (default 5), or start/end (ISO 8601 or epoch seconds) and limit for a time range;
+    points (and downsample=lttb|minmax) to downsample
     """
-    n = request.args.get("n", default=5, type=int)
-    if n < 1 or n > 500:
-        return jsonify({"error": "n must be between 1 and 500"}), 400
-    if not os.path.exists(AVG_FLOW_LOG_FILE):
-        return jsonify([])
-    try:
-        with open(AVG_FLOW_LOG_FILE, "r") as f:
-            lines = f.readlines()
-        lines = [line.strip() for line in lines if line.strip()][-n:]
-        results = []
-        for line in lines:
-            # Example line: 2025-06-27T12:00:00.000000, avg_flow=1.23, samples=300
-            try:
-                parts = line.split(",")
-                timestamp = parts[0].strip()
-                avg_flow = float(parts[1].split("=")[1])
-                samples = int(parts[2].split("=")[1])
-                results.append({
-                    "timestamp": timestamp,
-                    "avg_flow": avg_flow,
-                    "samples": samples
-                })
-            except Exception as e:
-                continue  # skip malformed lines
-        return jsonify(results)
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    return latest_response("flow")
 
 @app.route("/temperature-avg-latest", methods=["GET"])
 def get_recent_avg_temperature():
     """
     Returns the n most recent average temperature readings from avg_temperature_log.txt.
-    Query param: n (default 5)
+    Query params: n (default 5), or start/end (ISO 8601 or epoch seconds) and limit for a time range;
+    points (and downsample=lttb|minmax) to downsample
     """
-    n = request.args.get("n", default=5, type=int)
-    if n < 1 or n > 500:
-        return jsonify({"error": "n must be between 1 and 500"}), 400
-    if not os.path.exists(AVG_TEMPERATURE_LOG_FILE):
-        return jsonify([])
-    try:
-        with open(AVG_TEMPERATURE_LOG_FILE, "r") as f:
-            lines = f.readlines()
-        lines = [line.strip() for line in lines if line.strip()][-n:]
-        results = []
-        for line in lines:
-            # Example line: 2025-06-27T12:00:00.000000, avg_temp=22.5, samples=300
-            try:
-                parts = line.split(",")
-                timestamp = parts[0].strip()
-                avg_temp = float(parts[1].split("=")[1])
-                samples = int(parts[2].split("=")[1])
-                results.append({
-                    "timestamp": timestamp,
-                    "avg_temp": avg_temp,
-                    "samples": samples
-                })
-            except Exception as e:
-                continue  # skip malformed lines
-        return jsonify(results)
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    return latest_response("temperature")
 
 @app.route("/moisture-avg-latest", methods=["GET"])
 def get_recent_color_moisture():
     """
     Returns the n most recent color/moisture readings from color_log.txt.
-    Query param: n (default 5)
+    Query params: n (default 5), or start/end (ISO 8601 or epoch seconds) and limit for a time range;
+    points (and downsample=lttb|minmax) to downsample
     Output: List of dicts with timestamp (ISO8601) and value (moisture as double)
     Handles both legacy plain text and new JSON lines.
     """
-    n = request.args.get("n", default=5, type=int)
-    if n < 1 or n > 500:
-        return jsonify({"error": "n must be between 1 and 500"}), 400
-    if not os.path.exists(COLOR_LOG_FILE):
-        return jsonify([])
-    try:
-        with open(COLOR_LOG_FILE, "r") as f:
-            lines = f.readlines()
-        # Only keep lines that are not AVG or [INFO]
-        data_lines = [line.strip() for line in lines if line.strip() and not line.startswith("AVG") and not line.startswith("[INFO]")]
-        # Parse from the end, newest first
-        results = []
-        for line in reversed(data_lines):
-            try:
-                if line.startswith("{"):
-                    # JSON line
-                    obj = json.loads(line)
-                    ts = obj.get("timestamp")
-                    val = obj.get("moisture")
-                    if ts is not None and val is not None:
-                        results.append({"timestamp": ts, "value": float(val)})
-                else:
-                    # Legacy plain text line
-                    parts = line.split()
-                    ts = parts[0]
-                    b = float(parts[3].split(":")[1])
-                    results.append({"timestamp": ts, "value": b})
-            except Exception:
-                continue
-            if len(results) >= n:
-                break
-        results.reverse()  # Return in chronological order
-        return jsonify(results)
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    return latest_response("moisture")
 
 @app.route("/wind-direction-avg-latest", methods=["GET"])
 def get_recent_avg_wind_direction():
     """
     Returns the n most recent average wind direction readings from avg_wind_direction_log.txt.
-    Query param: n (default 5)
+    Query params: n (default 5), or start/end (ISO 8601 or epoch seconds) and limit for a time range;
+    points (and downsample=lttb|minmax) to downsample
+    """
+    return latest_response("wind_direction")
+
+@app.route("/rollup-latest", methods=["GET"])
+def get_recent_rollups():
+    """
+    Returns the n most recent rollup buckets of one metric from rollup_<tier>_log.txt.
+    Query params: tier (default 1h, e.g. 1day), metric (default pressure), n (default 24),
+    or start/end (ISO 8601 or epoch seconds) and limit for a time range;
+    points (and downsample=lttb|minmax) to downsample
     """
-    n = request.args.get("n", default=5, type=int)
-    if n < 1 or n > 500:
-        return jsonify({"error": "n must be between 1 and 500"}), 400
-    if not os.path.exists(AVG_WIND_DIRECTION_LOG_FILE):
-        return jsonify([])
+    tier = request.args.get("tier", default="1h")
+    metric = request.args.get("metric", default="pressure")
+    if not tier.replace("_", "").isalnum():
+        return jsonify({"error": "invalid tier"}), 400
+    if metric not in SERIES:
+        return jsonify({"error": "invalid metric"}), 400
+    return latest_response(f"{metric}@{tier}", default_n=24)
+
+@app.route("/series", methods=["GET"])
+def get_series_batch():
+    """
+    Returns several series in one response, read concurrently.
+    Query params: names (comma-separated, e.g. pressure,flow,wind_direction; default all,
+    "<metric>@<tier>" for a rollup tier), plus the same n / start / end / limit / points /
+    downsample params as the single-series endpoints, applied to every series
+    Output: {name: [records...]}, with {"error": ...} in place of a series that failed
+    """
+    names = [name.strip() for name in request.args.get("names", ",".join(SERIES)).split(",") if name.strip()]
+    for name in names:
+        metric, _, tier = name.partition("@")
+        if metric not in SERIES or (tier and not tier.replace("_", "").isalnum()):
+            return jsonify({"error": f"unknown series: {name}"}), 400
+    if not names:
+        return jsonify({"error": "names must list at least one series"}), 400
     try:
-        with open(AVG_WIND_DIRECTION_LOG_FILE, "r") as f:
-            lines = f.readlines()
-        lines = [line.strip() for line in lines if line.strip()][-n:]
-        results = []
-        for line in lines:
-            # Example: 2025-07-03T12:00:00.000000, avg_wind_direction=123.45,NW, samples=300
+        fetch = series_query()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    names = list(dict.fromkeys(names))
+
+    def build():
+        futures = {name: _series_pool.submit(fetch, name) for name in names}
+        result = {}
+        for name, future in futures.items():
             try:
-                parts = line.split(",")
-                timestamp = parts[0].strip()
-                deg_and_compass = parts[1].split("=")[1].split(";") if ";" in parts[1] else parts[1].split("=")[1].split(",")
-                avg_deg = float(deg_and_compass[0])
-                compass = deg_and_compass[1].strip() if len(deg_and_compass) > 1 else None
-                samples = int(parts[2].split("=")[1])
-                results.append({
-                    "timestamp": timestamp,
-                    "avg_wind_direction_deg": avg_deg,
-                    "avg_wind_direction_compass": compass,
-                    "samples": samples
-                })
-            except Exception:
-                continue
-        return jsonify(results)
+                result[name] = future.result()
+            except Exception as e:
+                result[name] = {"error": str(e)}
+        return result
+    try:
+        return conditional_response(names, build)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def live_record(frame, now):
+    """A snapshot frame as an API record: ISO timestamp, age and compass added."""
+    frame = dict(frame)
+    ts = frame["timestamp"]
+    # Age from the real write time: under the sim backend the frame timestamp runs ahead of real time
+    written_at = frame.pop("written_at")
+    deg = frame["wind_direction_deg"]
+    return {**frame, "timestamp": datetime.fromtimestamp(ts).isoformat(), "age_s": round(now - written_at, 3),
+            "wind_direction_compass": degrees_to_compass(deg % 360) if deg is not None else None}
+
+@app.route("/live", methods=["GET"])
+def get_live():
+    """
+    Returns SensorMonitor's latest per-second frame (flow, pressure, wind, DHT22) from shared memory.
+    Query params: n (default 1; up to the ring size, e.g. 300) for the n latest frames, oldest first
+    Output: a frame dict without n, else a list; age_s is the frame's age in seconds
+    """
+    if snapshot is None:
+        return jsonify({"error": "live snapshot disabled (live_snapshot_file)"}), 404
+    n = request.args.get("n", default=1, type=int)
+    if n < 1 or n > MAX_N:
+        return jsonify({"error": f"n must be between 1 and {MAX_N}"}), 400
+    frames = snapshot.recent(n)
+    if not frames:
+        return jsonify({"error": "no live data (is SensorMonitor running?)"}), 503
+    now = time.time()
+    records = [live_record(frame, now) for frame in frames]
+    return jsonify(records[0] if "n" not in request.args else records)
+
+@app.route("/stream", methods=["GET"])
+def stream_live():
+    """
+    Server-Sent Events stream of the per-second payloads (the same JSON as the
+    MQTT topics), one event per payload, named after its topic.
+    Query params: topics (comma-separated, default all, e.g. sensors/sets,sensors/environment)
+    Reconnecting clients resume after the Last-Event-ID header while the events are still buffered.
+    """
+    if live is None:
+        return jsonify({"error": "live feed disabled (live_feed_port)"}), 404
+    topics = {t.strip() for t in request.args.get("topics", "").split(",") if t.strip()}
+    try:
+        after = int(request.headers.get("Last-Event-ID", ""))
+    except ValueError:
+        after = None
+    with _stream_lock:
+        if live.clients >= MAX_STREAM_CLIENTS:
+            return jsonify({"error": "too many stream clients"}), 503
+        try:
+            live.start()
+        except OSError as e:
+            return jsonify({"error": f"live feed unavailable: {e}"}), 503
+        live.clients += 1
+
+    def events(after):
+        if after is None:
+            after = live.seq  # new clients start with the next payload
+        yield b"retry: 2000\n\n"
+        while True:
+            after, batch = live.wait(after, STREAM_KEEPALIVE_S)
+            if not batch:
+                yield b": keepalive\n\n"
+            for topic, event in batch:
+                if not topics or topic in topics:
+                    yield event
+
+    def release():
+        with _stream_lock:
+            live.clients -= 1
+    response = Response(events(after), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    # The server closes the response even when the client left before the
+    # first chunk, when a finally in events() would never run.
+    response.call_on_close(release)
+    return response
+
+@app.route("/stats/<series>", methods=["GET"])
+def get_series_stats(series):
+    """
+    Returns summary statistics of one series (pressure, wind, flow, temperature,
+    moisture, wind_direction) over a time range.
+    Query params: start/end (ISO 8601 or epoch seconds, either optional; default the whole series)
+    Output: count, min, max, mean, std, p50, p95, p99; for wind_direction count,
+    mean_deg (circular mean), resultant and dominant_sector
+    """
+    if series not in SERIES:
+        return jsonify({"error": "unknown series"}), 404
+    try:
+        start, end = parse_range_params()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    def build():
+        values = range_values(series, start, end)
+        stats = circular_stats(values) if series == "wind_direction" else linear_stats(values)
+        return {"series": series, "start": start and start[0], "end": end and end[0], **stats}
+    try:
+        return conditional_response([series], build)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5001, debug=False)
+    app.run(host="0.0.0.0", port=5001, debug=False, threaded=True)
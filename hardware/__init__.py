@@ -0,0 +1,85 @@
+"""
+Hardware backend selection.
+Sensor drivers import GPIO, board pins, the I2C/ADC/DHT/colour drivers and the
+clock from here instead of from RPi.GPIO and the Adafruit libraries directly,
+so the whole pipeline can run against simulated hardware on any Linux box.
+
+Backends:
+    "pi"  - real hardware (RPi.GPIO, Blinka, Adafruit drivers); see hardware/pi.py
+    "sim" - synthetic waveforms, optionally faster than real time; see hardware/sim.py
+
+Usage:
+    import hardware
+    hardware.select_backend(config.get("hardware_backend", "pi"), config.get("sim"))
+    from hardware import GPIO, clock
+    GPIO.setup(pin, GPIO.IN)
+
+The names below are proxies that resolve against the selected backend on
+first use, so importing a driver module never touches the hardware libraries.
+If nothing was selected, the "pi" backend is used.
+"""
+
+# ADS1115 single-ended inputs (same values as adafruit_ads1x15.ads1115.P0..P3)
+P0, P1, P2, P3 = 0, 1, 2, 3
+
+_backend = None
+
+def select_backend(name="pi", options=None):
+    """Select and initialize the hardware backend. Returns the backend module."""
+    global _backend
+    if name == "pi":
+        from hardware import pi as backend
+    elif name == "sim":
+        from hardware import sim as backend
+    else:
+        raise ValueError(f"Unknown hardware backend: {name}")
+    backend.configure(options or {})
+    _backend = backend
+    return backend
+
+def get_backend():
+    if _backend is None:
+        select_backend("pi")
+    return _backend
+
+class _BackendProxy:
+    """Forwards attribute access and calls to an attribute of the selected backend."""
+    def __init__(self, attr):
+        self._attr = attr
+
+    def _target(self):
+        return getattr(get_backend(), self._attr)
+
+    def __getattr__(self, name):
+        return getattr(self._target(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self._target()(*args, **kwargs)
+
+GPIO = _BackendProxy("GPIO")            # RPi.GPIO-compatible module
+board = _BackendProxy("board")          # pin objects: board.D4, board.SCL, ...
+I2C = _BackendProxy("I2C")              # hardware I2C bus: I2C(board.SCL, board.SDA)
+BitbangI2C = _BackendProxy("BitbangI2C")  # software I2C: BitbangI2C(scl=..., sda=...)
+ADS1115 = _BackendProxy("ADS1115")
+ADSMode = _BackendProxy("ADSMode")      # ADSMode.SINGLE / ADSMode.CONTINUOUS
+AnalogIn = _BackendProxy("AnalogIn")
+DHT22 = _BackendProxy("DHT22")
+TCS34725 = _BackendProxy("TCS34725")
+
+_clock_override = None
+
+def set_clock(new_clock):
+    """
+    Drive every hardware.clock user from new_clock instead of the backend's
+    clock (the replayer uses this to run on recorded time). None restores it.
+    """
+    global _clock_override
+    _clock_override = new_clock
+
+class _ClockProxy(_BackendProxy):
+    def _target(self):
+        if _clock_override is not None:
+            return _clock_override
+        return super()._target()
+
+clock = _ClockProxy("clock")            # monotonic(), time(), now(), sleep(s), wait(event, s)
@@ -0,0 +1,58 @@
+"""
+Real Raspberry Pi backend: thin re-exports of RPi.GPIO, Blinka and the
+Adafruit drivers used by the sensor modules.
+"""
+import time
+from datetime import datetime
+
+GPIO = None
+board = None
+I2C = None
+BitbangI2C = None
+ADS1115 = None
+ADSMode = None
+AnalogIn = None
+DHT22 = None
+TCS34725 = None
+
+class RealClock:
+    """Wall/monotonic clock passthrough; the sim backend provides a scaled one."""
+    def monotonic(self):
+        return time.monotonic()
+
+    def time(self):
+        return time.time()
+
+    def now(self):
+        return datetime.now()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+    def wait(self, event, timeout):
+        """threading.Event.wait() measured on this clock."""
+        return event.wait(timeout)
+
+clock = RealClock()
+
+def configure(options):
+    """Import the hardware libraries. Only called when this backend is selected."""
+    global GPIO, board, I2C, BitbangI2C, ADS1115, ADSMode, AnalogIn, DHT22, TCS34725
+    import RPi.GPIO
+    import board as blinka_board
+    import busio
+    import adafruit_bitbangio
+    import adafruit_ads1x15.ads1115 as ADS
+    import adafruit_ads1x15.ads1x15 as ADS1x15
+    from adafruit_ads1x15.analog_in import AnalogIn as AdafruitAnalogIn
+    import adafruit_dht
+    import adafruit_tcs34725
+    GPIO = RPi.GPIO
+    board = blinka_board
+    I2C = busio.I2C
+    BitbangI2C = adafruit_bitbangio.I2C
+    ADS1115 = ADS.ADS1115
+    ADSMode = ADS1x15.Mode
+    AnalogIn = AdafruitAnalogIn
+    DHT22 = adafruit_dht.DHT22
+    TCS34725 = adafruit_tcs34725.TCS34725
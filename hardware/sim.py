@@ -0,0 +1,362 @@
+"""
+Simulated hardware backend: GPIO pulse inputs, ADS1115 voltages, a DHT22 and a
+TCS34725 driven by configurable synthetic waveforms, so SensorMonitor, the
+aggregations and MQTT publishing can run and be profiled on any Linux box.
+
+Select it with "hardware_backend": "sim" in the config file. The optional
+"sim" section overrides the defaults below, e.g.:
+
+    "sim": {
+        "speed": 100,
+        "pulse_inputs": {"25": {"type": "square", "low": 0, "high": 75, "period_s": 600, "duty": 0.5}},
+        "ads_channels": {"0": {"type": "sine", "mean": 2.0, "amplitude": 0.3, "period_s": 120, "noise": 0.01}},
+        "dht22": {"failure_rate": 0.3}
+    }
+
+"speed" runs the simulated clock faster than real time: every sensor, the
+scheduler and reading timestamps use it, so a speed of 60 produces an hour
+of 1 Hz frames (and twelve 5-minute averages) per real minute.
+
+A waveform spec is either a number (constant) or a dict with "type":
+    constant: value
+    sine:     mean + amplitude * sin(2*pi*t / period_s)
+    square:   high for the first duty*period_s of each period, else low
+plus optional "noise" (Gaussian sigma) and "min"/"max" clamps.
+"""
+import math
+import random
+import threading
+import time
+from datetime import datetime
+
+DEFAULTS = {
+    "speed": 1.0,
+    "seed": None,
+    # GPIO input pin (BCM) -> pulse frequency in Hz
+    "pulse_inputs": {
+        # Flow meter: irrigation runs 15 min per hour at ~10 L/min (450 pulses/L)
+        "25": {"type": "square", "low": 0, "high": 75, "period_s": 3600, "duty": 0.25, "noise": 2, "min": 0},
+        # Anemometer: gusting around 1.75 m/s (20 pulses/s)
+        "13": {"type": "sine", "mean": 20, "amplitude": 15, "period_s": 900, "noise": 3, "min": 0},
+    },
+    # ADS1115 input -> volts
+    "ads_channels": {
+        # Pressure transducer: ~37 psi idle, ~50 psi while irrigating
+        "0": {"type": "square", "low": 1.98, "high": 2.5, "period_s": 3600, "duty": 0.25, "noise": 0.01},
+        # Wind vane: swings between roughly N and SE
+        "1": {"type": "sine", "mean": 2.2, "amplitude": 0.4, "period_s": 1800, "noise": 0.02},
+        "2": 0.0,
+        "3": 0.0,
+    },
+    "dht22": {
+        "temperature": {"type": "sine", "mean": 20, "amplitude": 6, "period_s": 86400, "noise": 0.1},
+        "humidity": {"type": "sine", "mean": 50, "amplitude": -15, "period_s": 86400, "noise": 0.5, "min": 0, "max": 100},
+        "failure_rate": 0.1,  # real DHT22s fail a checksum on a fair share of reads
+    },
+    "tcs34725": {
+        "r": 3, "g": 18,
+        "b": {"type": "sine", "mean": 20, "amplitude": 8, "period_s": 43200, "noise": 0.5, "min": 0, "max": 255},
+        "lux": {"type": "sine", "mean": 1200, "amplitude": 400, "period_s": 86400, "min": 0},
+    },
+}
+
+_options = dict(DEFAULTS)
+_random = random.Random()
+
+class Waveform:
+    """Synthetic signal; value(t) for t in simulated seconds since start."""
+    def __init__(self, spec):
+        if not isinstance(spec, dict):
+            spec = {"type": "constant", "value": spec}
+        self.spec = spec
+        self.kind = spec.get("type", "constant")
+
+    def value(self, t):
+        s = self.spec
+        if self.kind == "constant":
+            v = s.get("value", 0.0)
+        elif self.kind == "sine":
+            v = s.get("mean", 0.0) + s.get("amplitude", 1.0) * math.sin(2 * math.pi * t / s.get("period_s", 60.0))
+        elif self.kind == "square":
+            period = s.get("period_s", 60.0)
+            v = s.get("high", 1.0) if (t % period) < s.get("duty", 0.5) * period else s.get("low", 0.0)
+        else:
+            raise ValueError(f"Unknown waveform type: {self.kind}")
+        if s.get("noise"):
+            v += _random.gauss(0, s["noise"])
+        if "min" in s:
+            v = max(s["min"], v)
+        if "max" in s:
+            v = min(s["max"], v)
+        return v
+
+class SimClock:
+    """Clock running `speed` times faster than real time, starting at the real wall time."""
+    def __init__(self, speed=1.0):
+        self.speed = float(speed)
+        self._real_start = time.monotonic()
+        self._wall_start = time.time()
+
+    def elapsed(self):
+        """Simulated seconds since the backend was configured."""
+        return (time.monotonic() - self._real_start) * self.speed
+
+    def monotonic(self):
+        return self._real_start + self.elapsed()
+
+    def time(self):
+        return self._wall_start + self.elapsed()
+
+    def now(self):
+        return datetime.fromtimestamp(self.time())
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds / self.speed)
+
+    def wait(self, event, timeout):
+        return event.wait(None if timeout is None else timeout / self.speed)
+
+clock = SimClock()
+
+# --- GPIO ---
+
+class _PulseInput:
+    def __init__(self, waveform):
+        self.waveform = waveform
+        self.phase = 0.0  # cycles generated so far
+        self.callback = None
+
+class SimGPIO:
+    """RPi.GPIO stand-in. Configured pulse inputs generate falling edges at their waveform's frequency."""
+    BCM = 11
+    BOARD = 10
+    IN = 1
+    OUT = 0
+    HIGH = 1
+    LOW = 0
+    PUD_UP = 22
+    PUD_DOWN = 21
+    PUD_OFF = 20
+    RISING = 31
+    FALLING = 32
+    BOTH = 33
+    TICK_S = 0.005  # real seconds between edge-generator passes
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._outputs = {}
+        self._inputs = {}
+        self._thread = None
+        self._stop = threading.Event()
+
+    def setwarnings(self, flag):
+        pass
+
+    def setmode(self, mode):
+        pass
+
+    def setup(self, pin, direction, pull_up_down=None, initial=None):
+        with self._lock:
+            if direction == self.OUT:
+                self._outputs[pin] = initial if initial is not None else self.LOW
+            elif pin not in self._inputs:
+                spec = _options["pulse_inputs"].get(str(pin), 0)
+                self._inputs[pin] = _PulseInput(Waveform(spec))
+        self._ensure_thread()
+
+    def output(self, pin, value):
+        self._outputs[pin] = value
+
+    def input(self, pin):
+        if pin in self._outputs:
+            return self._outputs[pin]
+        inp = self._inputs.get(pin)
+        if inp is None:
+            return self.HIGH
+        # High for the first half of each cycle; the falling edge is the wrap.
+        return self.HIGH if (inp.phase % 1.0) < 0.5 else self.LOW
+
+    def add_event_detect(self, pin, edge, callback=None, bouncetime=None):
+        with self._lock:
+            inp = self._inputs.get(pin)
+            if inp is None:
+                raise RuntimeError("You must setup() the GPIO channel as an input first")
+            if inp.callback is not None:
+                raise RuntimeError("Conflicting edge detection already enabled for this GPIO channel")
+            inp.callback = callback
+
+    def remove_event_detect(self, pin):
+        with self._lock:
+            if pin in self._inputs:
+                self._inputs[pin].callback = None
+
+    def cleanup(self, pin=None):
+        self._stop.set()
+        with self._lock:
+            self._outputs.clear()
+            self._inputs.clear()
+        self._thread = None
+
+    def _ensure_thread(self):
+        if self._thread is None and self._inputs:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sim-gpio", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        last = clock.elapsed()
+        while not self._stop.wait(self.TICK_S):
+            now = clock.elapsed()
+            dt = now - last
+            last = now
+            with self._lock:
+                inputs = list(self._inputs.items())
+            for pin, inp in inputs:
+                freq = max(0.0, inp.waveform.value(now))
+                before = int(inp.phase)
+                inp.phase += freq * dt
+                edges = int(inp.phase) - before
+                callback = inp.callback
+                if callback is not None:
+                    for _ in range(edges):
+                        callback(pin)
+
+GPIO = SimGPIO()
+
+# --- Boards / buses ---
+
+class _Board:
+    """Pin namespace: board.D4 -> "D4"."""
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return name
+
+board = _Board()
+
+class I2C:
+    """busio.I2C / adafruit_bitbangio.I2C stand-in."""
+    def __init__(self, scl=None, sda=None, frequency=100000):
+        self.scl = scl
+        self.sda = sda
+
+    def try_lock(self):
+        return True
+
+    def unlock(self):
+        pass
+
+    def scan(self):
+        return [0x29, 0x48]
+
+    def deinit(self):
+        pass
+
+BitbangI2C = I2C
+
+# --- ADS1115 ---
+
+class ADSMode:
+    CONTINUOUS = 0x0000
+    SINGLE = 0x0100
+
+PGA_RANGE = {2 / 3: 6.144, 1: 4.096, 2: 2.048, 4: 1.024, 8: 0.512, 16: 0.256}
+
+class ADS1115:
+    """ADS1115 stand-in; each conversion takes 1/data_rate simulated seconds."""
+    rates = [8, 16, 32, 64, 128, 250, 475, 860]
+
+    def __init__(self, i2c, gain=1, data_rate=128, mode=ADSMode.SINGLE, address=0x48):
+        self.i2c = i2c
+        self.gain = gain
+        self.data_rate = data_rate
+        self.mode = mode
+        self.address = address
+        self._waveforms = {int(pin): Waveform(spec) for pin, spec in _options["ads_channels"].items()}
+        self._last_pin = None
+
+    def read_voltage(self, pin):
+        if self.mode == ADSMode.SINGLE or pin != self._last_pin:
+            clock.sleep(1.0 / self.data_rate)
+        self._last_pin = pin
+        waveform = self._waveforms.get(pin)
+        return waveform.value(clock.elapsed()) if waveform else 0.0
+
+class AnalogIn:
+    def __init__(self, ads, positive_pin, negative_pin=None):
+        self._ads = ads
+        self._pin = positive_pin
+
+    @property
+    def value(self):
+        fsr = PGA_RANGE[self._ads.gain]
+        raw = int(self._ads.read_voltage(self._pin) / fsr * 32768)
+        return max(-32768, min(32767, raw))
+
+    @property
+    def voltage(self):
+        return self.value * PGA_RANGE[self._ads.gain] / 32768
+
+# --- DHT22 ---
+
+class DHT22:
+    """adafruit_dht.DHT22 stand-in; fails like the real one on a fraction of reads."""
+    def __init__(self, pin, use_pulseio=True):
+        self.pin = pin
+        opts = _options["dht22"]
+        self._temperature = Waveform(opts["temperature"])
+        self._humidity = Waveform(opts["humidity"])
+        self._failure_rate = opts.get("failure_rate", 0.0)
+
+    def _maybe_fail(self):
+        if _random.random() < self._failure_rate:
+            raise RuntimeError("Checksum did not validate. Try again.")
+
+    @property
+    def temperature(self):
+        self._maybe_fail()
+        return round(self._temperature.value(clock.elapsed()), 1)
+
+    @property
+    def humidity(self):
+        self._maybe_fail()
+        return round(self._humidity.value(clock.elapsed()), 1)
+
+    def exit(self):
+        pass
+
+# --- TCS34725 ---
+
+class TCS34725:
+    """adafruit_tcs34725.TCS34725 stand-in."""
+    def __init__(self, i2c, address=0x29):
+        self.i2c = i2c
+        self.address = address
+        self.integration_time = 2.4
+        self.gain = 1
+        opts = _options["tcs34725"]
+        self._channels = {key: Waveform(opts[key]) for key in ("r", "g", "b", "lux")}
+
+    @property
+    def color_rgb_bytes(self):
+        t = clock.elapsed()
+        return tuple(int(max(0, min(255, self._channels[c].value(t)))) for c in ("r", "g", "b"))
+
+    @property
+    def lux(self):
+        return self._channels["lux"].value(clock.elapsed())
+
+def configure(options):
+    """Apply the "sim" config section on top of DEFAULTS and reset the simulated clock."""
+    global _options, clock
+    merged = dict(DEFAULTS)
+    for key, value in options.items():
+        if isinstance(value, dict) and isinstance(DEFAULTS.get(key), dict):
+            merged[key] = dict(DEFAULTS[key], **value)
+        else:
+            merged[key] = value
+    _options = merged
+    if merged.get("seed") is not None:
+        _random.seed(merged["seed"])
+    clock = SimClock(merged.get("speed", 1.0))
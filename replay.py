@@ -0,0 +1,263 @@
+"""
+Replay a raw-sample recording through the SensorMonitor pipeline.
+
+Feeds every recorded frame and colour cycle (see services/recorder.py and
+"record_file" in config.json) back through SensorMonitor.run_pipeline on a
+virtual clock that starts at the recording's wall time. It then reports
+throughput and checks the averages the replay logged against the ones
+production logged while recording.
+
+Usage:
+    python replay.py raw_samples_20250704T034500.bin              # as fast as possible
+    python replay.py raw_samples_20250704T034500.bin --speed 100  # 100x real time
+    python replay.py raw_samples_20250704T034500.bin --speed 1 --out replay_out
+
+Averages and the error log are written to --out (a temporary directory by
+default), never to the live log files. MQTT messages are serialized but not
+sent. Each frame moves the virtual clock to the time it was recorded at, so
+ticks production skipped (scheduler overruns) are skipped in the replay too
+and every sample lands in the same window; frames without a usable
+timestamp fall back to the scheduler's 1 s tick. Every average and rollup
+the replay logs is compared with the one production logged; mismatches and
+missing ones are reported, and the exit status is 1 if there are any.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import deque, defaultdict
+from datetime import datetime
+import hardware
+import SensorMonitor as monitor
+from services import recorder as rec
+from services.log_manager import LogManager
+from services.scheduler import Scheduler
+from sensors.pressure_sensor import voltage_to_psi
+from sensors.wind_sensor import pulses_to_speed
+from sensors.wind_direction_sensor import raw_to_degrees, degrees_to_compass
+from logging_utils import calculate_flow_rate
+
+class ReplayClock:
+    """
+    Virtual clock starting at the recording's start time. sleep() advances it
+    instantly; with a speed it also sleeps 1/speed of that in real time.
+    """
+    def __init__(self, start_wall, speed=None, elapsed=0.0):
+        self.start_wall = start_wall
+        self.speed = speed
+        self._elapsed = elapsed
+        self._lock = threading.Lock()
+
+    def monotonic(self):
+        return self._elapsed
+
+    def time(self):
+        return self.start_wall + self._elapsed
+
+    def now(self):
+        return datetime.fromtimestamp(self.time())
+
+    def sleep(self, seconds):
+        if seconds <= 0:
+            return
+        if self.speed:
+            time.sleep(seconds / self.speed)
+        with self._lock:
+            self._elapsed += seconds
+
+    def wait(self, event, timeout):
+        self.sleep(timeout)
+        return event.is_set()
+
+    def advance_to(self, elapsed):
+        """Move forward to `elapsed` seconds after the start (never backward)."""
+        self.sleep(elapsed - self._elapsed)
+
+class ReplayPublisher:
+    """Stands in for MqttPublisher: serializes payloads like it would, sends nothing."""
+    def __init__(self):
+        self.published = 0
+        self.bytes = 0
+
+    def publish(self, topic, payload, qos=0, retain=False):
+        if isinstance(payload, (dict, list)):
+            payload = json.dumps(payload)
+        self.published += 1
+        self.bytes += len(payload)
+
+class AggregateCollector:
+    """Recorder interface for run_pipeline that keeps only the averages the replay logs."""
+    def __init__(self):
+        self.aggregates = []
+
+    def record_frame(self, frame):
+        pass
+
+    def record_color(self, readings):
+        pass
+
+    def record_aggregate(self, label, value, samples):
+        self.aggregates.append({"label": label, "value": str(value), "samples": samples})
+
+class RecordingSource:
+    """
+    Turns recorded records back into the per-tick readings the drivers returned,
+    moving the clock to each frame's recorded time first.
+    """
+    def __init__(self, records, color_cycles, clock, start_ns):
+        self._records = records
+        self._color_cycles = deque(color_cycles)
+        self._clock = clock
+        self._start_ns = start_ns
+        self._started = False
+        self._done = False
+        self._frame_ns = None  # FRAME timestamp of the next frame (its marker ended the previous one)
+        self._last_ns = None
+        self.frames = 0
+
+    def read_frame(self):
+        if self._done:
+            raise StopIteration
+        raw = {}
+        frame_ns = self._frame_ns
+        for ts_ns, kind, data in self._records:
+            if kind == rec.FRAME:
+                if self._started:
+                    self._frame_ns = ts_ns
+                    break
+                self._started = True
+                frame_ns = ts_ns
+            elif self._started:
+                raw[kind] = data
+        else:
+            self._done = True
+            if not raw:
+                raise StopIteration
+        if frame_ns is not None and (self._last_ns is None or frame_ns > self._last_ns):
+            self._clock.advance_to((frame_ns - self._start_ns) / 1e9)
+            self._last_ns = frame_ns
+        # else: no usable timestamp, the scheduler's 1 s tick stands
+        self.frames += 1
+        return self._to_frame(raw)
+
+    def _to_frame(self, raw):
+        ts = self._clock.now().isoformat()
+        frame = {}
+        flow = raw.get(rec.FLOW)
+        if flow and flow["pulses"] is not None:
+            litres = flow["pulses"] / monitor.FLOW_PULSES_PER_LITRE
+            frame["flow"] = {"timestamp": ts, "flow_pulses": flow["pulses"], "flow_litres": litres,
+                             "elapsed_s": flow["elapsed_s"],
+                             "flow_rate_lpm": calculate_flow_rate(litres, flow["elapsed_s"])}
+        wind = raw.get(rec.WIND)
+        if wind and wind["pulses"] is not None:
+            frame["wind"] = {"timestamp": ts, "wind_pulses": wind["pulses"], "elapsed_s": wind["elapsed_s"],
+                             "wind_speed": pulses_to_speed(wind["pulses"], wind["elapsed_s"])}
+        pressure = raw.get(rec.PRESSURE)
+        if pressure and pressure["voltage"] is not None:
+            psi = voltage_to_psi(pressure["voltage"])
+            frame["pressure"] = {"timestamp": ts, "pressure_psi": psi, "pressure_kpa": psi * 6.89476,
+                                 "pressure_voltage": pressure["voltage"], "samples": pressure["samples"]}
+        wind_dir = raw.get(rec.WIND_DIRECTION)
+        if wind_dir and wind_dir["raw"] is not None:
+            deg = raw_to_degrees(wind_dir["raw"])
+            frame["wind_direction"] = {"timestamp": ts, "wind_direction_raw": wind_dir["raw"],
+                                       "wind_direction_deg": deg, "wind_direction_compass": degrees_to_compass(deg)}
+        dht = raw.get(rec.DHT22)
+        if dht:
+            frame["dht22"] = dict(dht, timestamp=ts)
+        return frame
+
+    def read_color(self):
+        if not self._color_cycles:
+            return []
+        ts = self._clock.now().isoformat()
+        return [dict(reading, timestamp=ts) for reading in self._color_cycles.popleft()]
+
+def scan(path):
+    """
+    First pass: collect colour cycles, production-logged averages (both small)
+    and the timestamp of the first frame (None if there is none).
+    """
+    color_cycles, expected, first_frame_ns = [], [], None
+    _, records = rec.read_recording(path)
+    for ts_ns, kind, data in records:
+        if kind == rec.FRAME and first_frame_ns is None:
+            first_frame_ns = ts_ns
+        elif kind == rec.COLOR:
+            color_cycles.append(data)
+        elif kind == rec.AGGREGATE:
+            expected.append(data)
+    return color_cycles, expected, first_frame_ns
+
+def compare_aggregates(expected, produced):
+    """Compare averages per label, in order. Returns (per-label summary, mismatch list)."""
+    by_label = defaultdict(lambda: ([], []))
+    for agg in expected:
+        by_label[agg["label"]][0].append(agg)
+    for agg in produced:
+        by_label[agg["label"]][1].append(agg)
+    summary, mismatches = {}, []
+    for label, (exp, got) in sorted(by_label.items()):
+        matched = 0
+        for i, (e, g) in enumerate(zip(exp, got)):
+            if e["value"] == g["value"] and e["samples"] == g["samples"]:
+                matched += 1
+            else:
+                mismatches.append((label, i, e, g))
+        for i in range(len(got), len(exp)):
+            mismatches.append((label, i, exp[i], None))
+        summary[label] = {"expected": len(exp), "replayed": len(got), "matched": matched}
+    return summary, mismatches
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a raw-sample recording through the SensorMonitor pipeline.")
+    parser.add_argument("recording")
+    parser.add_argument("--speed", type=float, default=None,
+                        help="replay speed relative to real time (default: as fast as possible)")
+    parser.add_argument("--out", default=None, help="directory for replayed logs (default: a temp dir)")
+    args = parser.parse_args()
+
+    path = os.path.abspath(args.recording)
+    (start_ns, start_wall), records = rec.read_recording(path)
+    color_cycles, expected, first_frame_ns = scan(path)
+    out_dir = args.out or tempfile.mkdtemp(prefix="replay_")
+    os.makedirs(out_dir, exist_ok=True)
+    os.chdir(out_dir)
+
+    # Start the tick grid half a tick before the first frame: each frame then moves the clock
+    # forward to its recorded time, whichever way production's acquisition latency jittered.
+    first_s = 0.0 if first_frame_ns is None else (first_frame_ns - start_ns) / 1e9
+    clock = ReplayClock(start_wall, args.speed, elapsed=max(0.0, first_s - 0.5))
+    hardware.set_clock(clock)
+    source = RecordingSource(records, color_cycles, clock, start_ns)
+    publisher = ReplayPublisher()
+    collector = AggregateCollector()
+    log_mgr = LogManager(monitor.ERROR_LOG_FILE)
+    scheduler = Scheduler(clock=clock.monotonic, sleep=clock.sleep, wall_clock=clock.time, log_mgr=log_mgr)
+    read_color = source.read_color if color_cycles else None
+
+    started = time.perf_counter()
+    monitor.run_pipeline(scheduler, source.read_frame, read_color, publisher, log_mgr, collector)
+    scheduler.join_background()
+    real_s = time.perf_counter() - started
+
+    summary, mismatches = compare_aggregates(expected, collector.aggregates)
+    print(f"Replayed {source.frames} frames ({clock.monotonic():.0f} s of recorded time) in {real_s:.2f} s: "
+          f"{source.frames / real_s:.0f} frames/s, {clock.monotonic() / real_s:.1f}x real time")
+    print(f"MQTT: {publisher.published} messages, {publisher.bytes} bytes serialized")
+    print(f"Output: {out_dir}")
+    for label, s in summary.items():
+        print(f"  {label:<20} production={s['expected']:<6} replay={s['replayed']:<6} matched={s['matched']}")
+    for label, i, e, g in mismatches[:20]:
+        replayed = "missing" if g is None else f"{g['value']} ({g['samples']} samples)"
+        print(f"  MISMATCH {label}[{i}]: production {e['value']} ({e['samples']} samples), replay {replayed}")
+    if len(mismatches) > 20:
+        print(f"  ... {len(mismatches) - 20} more mismatches")
+    return 1 if mismatches else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+from collections import deque
+import threading
+from hardware import AnalogIn, ADSMode, clock
+
+# Full-scale voltage for each PGA gain setting (ADS1115 datasheet, table 3).
+PGA_RANGE = {2 / 3: 6.144, 1: 4.096, 2: 2.048, 4: 1.024, 8: 0.512, 16: 0.256}
+
+class ChannelBuffer:
+    """Fixed-size ring of (monotonic_ts, raw, voltage) samples for one ADC channel."""
+    def __init__(self, name, ads, pin, size):
+        self.name = name
+        self.ads = ads
+        self.pin = pin
+        self.chan = AnalogIn(ads, pin)
+        self.samples = deque(maxlen=size)
+        self.seq = 0  # total samples ever appended
+        self.errors = 0
+
+class ADS1115Engine:
+    """
+    Owns one or more ADS1115 boards and samples their channels round-robin on
+    a background thread, so drivers never touch the I2C bus themselves.
+
+    Each channel keeps a ring buffer; drivers pull every sample taken since
+    their last read with read_since(), which lets them oversample cheaply.
+    A board with a single channel is put in continuous mode, so each sample
+    is a single conversion-register read instead of config write + poll.
+
+    Conversion errors are counted per channel and, given a log_mgr, logged
+    (LogManager coalesces the repeats of a failing channel).
+
+    Usage:
+        engine = ADS1115Engine(data_rate=128, scan_interval_s=0.1, log_mgr=log_mgr)
+        engine.add_channel("pressure", ads, P0)
+        engine.add_channel("wind_direction", ads, P1)
+        engine.start()
+        samples, cursor = engine.read_since("pressure", cursor)
+    """
+    def __init__(self, data_rate=128, scan_interval_s=0.1, buffer_size=256, log_mgr=None):
+        self.data_rate = data_rate
+        self.scan_interval_s = scan_interval_s
+        self.buffer_size = buffer_size
+        self.log_mgr = log_mgr
+        self._channels = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add_channel(self, name, ads, pin):
+        """Register ADC input `pin` (P0..P3) on board `ads` under `name`."""
+        ads.data_rate = self.data_rate
+        self._channels[name] = ChannelBuffer(name, ads, pin, self.buffer_size)
+        self._configure_modes()
+
+    def _configure_modes(self):
+        per_board = {}
+        for buf in self._channels.values():
+            per_board.setdefault(id(buf.ads), []).append(buf)
+        for bufs in per_board.values():
+            # Continuous conversion only pays off when the mux never switches.
+            bufs[0].ads.mode = ADSMode.CONTINUOUS if len(bufs) == 1 else ADSMode.SINGLE
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="ads1115-engine", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+
+    def _run(self):
+        next_sweep = clock.monotonic()
+        while not self._stop.is_set():
+            for buf in list(self._channels.values()):
+                try:
+                    raw = buf.chan.value
+                    voltage = raw * PGA_RANGE[buf.ads.gain] / 32768
+                except Exception as e:
+                    buf.errors += 1
+                    if self.log_mgr is not None:
+                        self.log_mgr.log_error(f"ADS1115 {buf.name} read error: {e}")
+                    continue
+                with self._lock:
+                    buf.samples.append((clock.monotonic(), raw, voltage))
+                    buf.seq += 1
+            # One sweep every scan_interval_s; the conversions themselves are
+            # paced by the ADC's data rate.
+            next_sweep += self.scan_interval_s
+            delay = next_sweep - clock.monotonic()
+            if delay < 0:
+                next_sweep = clock.monotonic()
+                delay = 0
+            clock.wait(self._stop, delay)
+
+    def read_since(self, name, cursor=0):
+        """
+        Return (samples, new_cursor): every buffered sample of channel `name`
+        taken after `cursor`. Pass the returned cursor back on the next call.
+        Samples that fell out of the ring before being read are lost.
+        """
+        buf = self._channels[name]
+        with self._lock:
+            new = min(buf.seq - cursor, len(buf.samples))
+            samples = list(buf.samples)[-new:] if new > 0 else []
+            return samples, buf.seq
+
+    def latest(self, name):
+        """Most recent (monotonic_ts, raw, voltage) sample of `name`, or None."""
+        buf = self._channels[name]
+        with self._lock:
+            return buf.samples[-1] if buf.samples else None
+
+    def channels(self):
+        return list(self._channels)
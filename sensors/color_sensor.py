@@ -1,9 +1,4 @@
-import time
-from datetime import datetime
-import adafruit_tcs34725
-from adafruit_bitbangio import I2C
-from board import D22, D27
-import RPi.GPIO as GPIO
+from hardware import GPIO, board, BitbangI2C, TCS34725, clock
 
 class ColorSensor:
     """Encapsulates TCS34725 color sensor logic."""
@@ -15,16 +10,16 @@ class ColorSensor:
         self._init_sensor()
 
     def _init_sensor(self):
-        i2c = I2C(scl=D22, sda=D27)
+        i2c = BitbangI2C(scl=board.D22, sda=board.D27)
         while not i2c.try_lock():
-            time.sleep(0.1)
+            clock.sleep(0.1)
         devices = i2c.scan()
         i2c.unlock()
         addr = 0x29 if 0x29 in devices else (0x2A if 0x2A in devices else None)
         if addr is None:
             GPIO.output(self.led_pin, GPIO.LOW)
             raise RuntimeError("Color sensor not found on I2C")
-        self.sensor = adafruit_tcs34725.TCS34725(i2c, address=addr)
+        self.sensor = TCS34725(i2c, address=addr)
         self.sensor.integration_time = 100
         self.sensor.gain = 4
 
@@ -32,17 +27,17 @@ class ColorSensor:
         readings = []
         for i in range(self.num_readings):
             GPIO.output(self.led_pin, GPIO.HIGH)
-            time.sleep(0.3)
+            clock.sleep(0.3)
             r, g, b = self.sensor.color_rgb_bytes
             lux = self.sensor.lux
             GPIO.output(self.led_pin, GPIO.LOW)
             readings.append({
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": clock.now().isoformat(),
                 "r": int(r),
                 "g": int(g),
                 "b": int(b),
                 "lux": float(lux)
             })
             if i < self.num_readings - 1:
-                time.sleep(self.read_spacing)
+                clock.sleep(self.read_spacing)
         return readings
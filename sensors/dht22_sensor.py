@@ -1,11 +1,19 @@
-import adafruit_dht
-from datetime import datetime
-import time
+import threading
+from hardware import DHT22, clock
+
+# The DHT22 needs ~2 s between conversions; reading faster returns stale
+# data or checksum errors.
+DHT22_MIN_INTERVAL_S = 2.0
+
+def is_valid_reading(temperature, humidity):
+    """DHT22 spec range: -40..80 °C, 0..100 %RH."""
+    return (temperature is not None and humidity is not None
+            and -40 <= temperature <= 80 and 0 <= humidity <= 100)
 
 class DHT22Sensor:
     """Encapsulates DHT22 temperature/humidity sensor logic."""
     def __init__(self, pin):
-        self.device = adafruit_dht.DHT22(pin)
+        self.device = DHT22(pin)
 
     def read(self, retries=3):
         for attempt in range(retries):
@@ -13,14 +21,83 @@ class DHT22Sensor:
                 temperature = self.device.temperature
                 humidity = self.device.humidity
                 return {
-                    "timestamp": datetime.now().isoformat(),
+                    "timestamp": clock.now().isoformat(),
                     "temperature": temperature,
                     "humidity": humidity
                 }
             except Exception:
-                time.sleep(0.3)
+                if attempt < retries - 1:
+                    clock.sleep(0.3)
         return {
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": clock.now().isoformat(),
             "temperature": None,
             "humidity": None
         }
+
+class DHT22Sampler:
+    """
+    Polls a DHT22Sensor on a background thread at a safe rate and keeps the
+    latest valid reading, so callers never block on the sensor.
+
+    latest() adds "age_s" (seconds since the reading was taken, None if there
+    is none yet) and "stale" (True when there is no reading or it is older
+    than stale_after_s). Failed polls are logged through log_mgr, which
+    coalesces the repeats of a dead sensor.
+    """
+    def __init__(self, sensor, interval_s=2.5, stale_after_s=30, log_mgr=None):
+        self.sensor = sensor
+        self.log_mgr = log_mgr
+        self.interval_s = max(interval_s, DHT22_MIN_INTERVAL_S)
+        self.stale_after_s = stale_after_s
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_good = None
+        self._last_good_time = None
+        self.failures = 0
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="dht22-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval_s + 1)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                # One attempt per poll; a failed read is simply retried on
+                # the next poll instead of sleeping here.
+                reading = self.sensor.read(retries=1)
+                error = ""
+            except Exception as e:
+                reading = None
+                error = f" {e}"
+            if reading and is_valid_reading(reading["temperature"], reading["humidity"]):
+                with self._lock:
+                    self._last_good = reading
+                    self._last_good_time = clock.monotonic()
+            else:
+                self.failures += 1
+                if self.log_mgr is not None:
+                    self.log_mgr.log_error(f"DHT22: No valid reading.{error}")
+            clock.wait(self._stop, self.interval_s)
+
+    def latest(self):
+        """Return the last good reading with its age and a stale flag. Never blocks on I/O."""
+        with self._lock:
+            reading = self._last_good
+            taken_at = self._last_good_time
+        if reading is None:
+            return {
+                "timestamp": clock.now().isoformat(),
+                "temperature": None,
+                "humidity": None,
+                "age_s": None,
+                "stale": True
+            }
+        age = clock.monotonic() - taken_at
+        return dict(reading, age_s=age, stale=age > self.stale_after_s)
@@ -1,27 +1,36 @@
-import RPi.GPIO as GPIO
-import time
-from datetime import datetime
+from hardware import GPIO, clock
+from sensors.pulse_counter import PulseCounter, poll_pulses
 
 class FlowSensor:
-    """Encapsulates flow sensor logic (YF-S201 or similar)."""
-    def __init__(self, pin, pulses_per_litre):
+    """
+    Encapsulates flow sensor logic (YF-S201 or similar).
+
+    By default pulses are counted continuously by an edge-triggered callback,
+    so read() returns immediately with the pulses seen since the previous read.
+    With use_interrupts=False (or if edge detection cannot be registered) read()
+    polls the pin for duration_s seconds as before.
+    """
+    def __init__(self, pin, pulses_per_litre, use_interrupts=True):
         self.pin = pin
         self.pulses_per_litre = pulses_per_litre
         GPIO.setup(self.pin, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+        self.counter = PulseCounter(self.pin)
+        self.interrupt_mode = use_interrupts and self.counter.start()
 
     def read(self, duration_s=1.0):
-        pulse_count = 0
-        last_state = GPIO.input(self.pin)
-        start = time.time()
-        while time.time() - start < duration_s:
-            current_state = GPIO.input(self.pin)
-            if last_state == 1 and current_state == 0:
-                pulse_count += 1
-            last_state = current_state
-            time.sleep(0.001)
+        if self.interrupt_mode:
+            pulse_count, elapsed = self.counter.take()
+        else:
+            pulse_count = poll_pulses(self.pin, duration_s)
+            elapsed = duration_s
         litres = pulse_count / self.pulses_per_litre
         return {
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": clock.now().isoformat(),
             "flow_pulses": pulse_count,
-            "flow_litres": litres
+            "flow_litres": litres,
+            "elapsed_s": elapsed
         }
+
+    def close(self):
+        """Stop background pulse counting."""
+        self.counter.stop()
@@ -1,35 +1,59 @@
-import adafruit_ads1x15.ads1115 as ADS
-from adafruit_ads1x15.analog_in import AnalogIn
-from datetime import datetime
+from hardware import AnalogIn, P0, clock
+
+def voltage_to_psi(voltage):
+    """0.5-4.5 V ratiometric transducer, 0-100 psi."""
+    psi = (voltage - 0.5) * (100 / (4.5 - 0.5))
+    return max(0, min(psi, 100))
 
 class PressureSensor:
-    """Encapsulates pressure sensor logic using ADS1115 ADC."""
-    def __init__(self, ads, channel=ADS.P0):
+    """
+    Encapsulates pressure sensor logic using ADS1115 ADC.
+
+    With an ADS1115Engine, read() averages every sample the engine took since
+    the previous read (oversampling) instead of doing its own one-shot read.
+    """
+    def __init__(self, ads, channel=P0, engine=None, channel_name="pressure"):
         self.ads = ads
         self.channel = channel
-        self.chan = AnalogIn(self.ads, self.channel)
+        self.engine = engine
+        self.channel_name = channel_name
+        self._cursor = 0
+        if engine is not None:
+            engine.add_channel(channel_name, ads, channel)
+            self.chan = None
+        else:
+            self.chan = AnalogIn(self.ads, self.channel)
+
+    def _read_voltage(self):
+        if self.engine is None:
+            return self.chan.voltage, 1
+        samples, self._cursor = self.engine.read_since(self.channel_name, self._cursor)
+        if not samples:
+            return None, 0
+        return sum(s[2] for s in samples) / len(samples), len(samples)
 
     def read(self):
         try:
-            voltage = self.chan.voltage
+            voltage, sample_count = self._read_voltage()
             if voltage is not None:
-                psi = (voltage - 0.5) * (100 / (4.5 - 0.5))
-                psi = max(0, min(psi, 100))
+                psi = voltage_to_psi(voltage)
                 kpa = psi * 6.89476
                 return {
-                    "timestamp": datetime.now().isoformat(),
+                    "timestamp": clock.now().isoformat(),
                     "pressure_psi": psi,
-                    "pressure_kpa": kpa
+                    "pressure_kpa": kpa,
+                    "pressure_voltage": voltage,
+                    "samples": sample_count
                 }
             else:
                 return {
-                    "timestamp": datetime.now().isoformat(),
+                    "timestamp": clock.now().isoformat(),
                     "pressure_psi": None,
                     "pressure_kpa": None
                 }
         except Exception:
             return {
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": clock.now().isoformat(),
                 "pressure_psi": None,
                 "pressure_kpa": None
             }
@@ -0,0 +1,71 @@
+import threading
+from hardware import GPIO, clock
+
+class PulseCounter:
+    """
+    Counts falling edges on a GPIO input from an edge-triggered callback.
+
+    RPi.GPIO calls _on_edge from its own event thread, so pulses keep being
+    counted while the main loop is busy elsewhere. take() returns the pulses
+    seen since the previous take() and how long that window was.
+    """
+    def __init__(self, pin, bouncetime_ms=None):
+        self.pin = pin
+        self.bouncetime_ms = bouncetime_ms
+        self._lock = threading.Lock()
+        self._count = 0
+        self._window_start = clock.monotonic()
+        self.running = False
+
+    def start(self):
+        """Register the edge callback. Returns False if edge detection is unavailable."""
+        kwargs = {"callback": self._on_edge}
+        if self.bouncetime_ms:
+            kwargs["bouncetime"] = self.bouncetime_ms
+        try:
+            GPIO.add_event_detect(self.pin, GPIO.FALLING, **kwargs)
+        except (RuntimeError, ValueError):
+            # "Failed to add edge detection" happens when another process or a
+            # stale registration owns the pin; callers fall back to polling.
+            return False
+        with self._lock:
+            self._count = 0
+            self._window_start = clock.monotonic()
+        self.running = True
+        return True
+
+    def stop(self):
+        """Unregister the edge callback."""
+        if self.running:
+            try:
+                GPIO.remove_event_detect(self.pin)
+            except Exception:
+                pass
+            self.running = False
+
+    def _on_edge(self, channel):
+        with self._lock:
+            self._count += 1
+
+    def take(self):
+        """Return (pulse_count, elapsed_s) since the last call and start a new window."""
+        with self._lock:
+            now = clock.monotonic()
+            count = self._count
+            elapsed = now - self._window_start
+            self._count = 0
+            self._window_start = now
+        return count, elapsed
+
+def poll_pulses(pin, duration_s):
+    """Count falling edges by polling the pin every 1 ms for duration_s seconds."""
+    pulse_count = 0
+    last_state = GPIO.input(pin)
+    start = clock.monotonic()
+    while clock.monotonic() - start < duration_s:
+        current_state = GPIO.input(pin)
+        if last_state == 1 and current_state == 0:
+            pulse_count += 1
+        last_state = current_state
+        clock.sleep(0.001)
+    return pulse_count
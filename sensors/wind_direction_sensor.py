@@ -1,6 +1,4 @@
-import adafruit_ads1x15.ads1115 as ADS
-from adafruit_ads1x15.analog_in import AnalogIn
-from datetime import datetime
+from hardware import AnalogIn, P1, clock
 
 # Calibration constants (adjust as needed)
 CAL_N_RAW = 14350  # North
@@ -33,26 +31,55 @@ def degrees_to_compass(degrees):
     return COMPASS_LABELS[idx]
 
 class WindDirectionSensor:
-    """Encapsulates wind direction sensor logic using ADS1115 ADC."""
-    def __init__(self, ads, channel=ADS.P1):
+    """
+    Encapsulates wind direction sensor logic using ADS1115 ADC.
+
+    With an ADS1115Engine, read() uses the engine's latest sample. Raw values
+    are not averaged: the scale wraps at north, so a mean of raw readings
+    either side of it would point south. A sample older than max_age_s
+    (default: STALE_SWEEPS engine sweeps) means the engine has stalled or is
+    failing, and reads as no reading rather than as the current direction.
+    """
+    STALE_SWEEPS = 5
+
+    def __init__(self, ads, channel=P1, engine=None, channel_name="wind_direction", max_age_s=None):
         self.ads = ads
         self.channel = channel
-        self.chan = AnalogIn(self.ads, self.channel)
+        self.engine = engine
+        self.channel_name = channel_name
+        if max_age_s is None and engine is not None:
+            max_age_s = engine.scan_interval_s * self.STALE_SWEEPS
+        self.max_age_s = max_age_s
+        if engine is not None:
+            engine.add_channel(channel_name, ads, channel)
+            self.chan = None
+        else:
+            self.chan = AnalogIn(self.ads, self.channel)
+
+    def _read_raw(self):
+        if self.engine is None:
+            return self.chan.value
+        sample = self.engine.latest(self.channel_name)
+        if sample is None:
+            raise RuntimeError("no wind direction sample yet")
+        if clock.monotonic() - sample[0] > self.max_age_s:
+            raise RuntimeError("wind direction sample is stale")
+        return sample[1]
 
     def read(self):
         try:
-            raw = self.chan.value
+            raw = self._read_raw()
             deg = raw_to_degrees(raw)
             compass = degrees_to_compass(deg)
             return {
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": clock.now().isoformat(),
                 "wind_direction_raw": raw,
                 "wind_direction_deg": deg,
                 "wind_direction_compass": compass
             }
         except Exception:
             return {
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": clock.now().isoformat(),
                 "wind_direction_raw": None,
                 "wind_direction_deg": None,
                 "wind_direction_compass": None
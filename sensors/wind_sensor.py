@@ -1,26 +1,40 @@
-import RPi.GPIO as GPIO
-import time
-from datetime import datetime
+from hardware import GPIO, clock
+from sensors.pulse_counter import PulseCounter, poll_pulses
+
+# The reed switch can chatter on closing; ignore edges closer than this.
+WIND_BOUNCETIME_MS = 1
+
+def pulses_to_speed(pulse_count, elapsed_s):
+    """Wind speed for pulse_count pulses over elapsed_s; 20 pulses/s is 1.75 m/s."""
+    return (pulse_count / elapsed_s / 20) * 1.75 if elapsed_s > 0 else 0.0
 
 class WindSensor:
-    """Encapsulates wind speed sensor logic (reed switch anemometer)."""
-    def __init__(self, pin):
+    """
+    Encapsulates wind speed sensor logic (reed switch anemometer).
+
+    Pulses are counted in the background by an edge-triggered callback when
+    available (see FlowSensor); otherwise read() polls for duration_s seconds.
+    """
+    def __init__(self, pin, use_interrupts=True):
         self.pin = pin
         GPIO.setup(self.pin, GPIO.IN)
+        self.counter = PulseCounter(self.pin, bouncetime_ms=WIND_BOUNCETIME_MS)
+        self.interrupt_mode = use_interrupts and self.counter.start()
 
     def read(self, duration_s=1.0):
-        pulse_count = 0
-        last_state = GPIO.input(self.pin)
-        start = time.time()
-        while time.time() - start < duration_s:
-            current_state = GPIO.input(self.pin)
-            if last_state == 1 and current_state == 0:
-                pulse_count += 1
-            last_state = current_state
-            time.sleep(0.001)
-        speed = (pulse_count / 20) * 1.75
+        if self.interrupt_mode:
+            pulse_count, elapsed = self.counter.take()
+        else:
+            pulse_count = poll_pulses(self.pin, duration_s)
+            elapsed = duration_s
+        speed = pulses_to_speed(pulse_count, elapsed)
         return {
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": clock.now().isoformat(),
             "wind_pulses": pulse_count,
-            "wind_speed": speed
+            "wind_speed": speed,
+            "elapsed_s": elapsed
         }
+
+    def close(self):
+        """Stop background pulse counting."""
+        self.counter.stop()
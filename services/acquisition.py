@@ -0,0 +1,92 @@
+"""
+AcquisitionEngine: Concurrent per-tick sensor acquisition.
+Runs every registered sensor read on its own worker thread and gathers the
+results into one frame, so the slowest sensor no longer sets the loop period.
+
+Usage:
+    engine = AcquisitionEngine(log_mgr)
+    engine.register("flow", flow_sensor.read, timeout=1.5, fallback=empty_flow_reading)
+    frame = engine.acquire()  # {"flow": {...}, ...}
+    engine.shutdown()
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from hardware import clock
+
+class AcquisitionEngine:
+    def __init__(self, log_mgr=None):
+        self.log_mgr = log_mgr
+        self._sensors = {}
+        self._in_flight = {}  # name -> (future, Event set when it completes)
+        self._executor = None
+        self.timeouts = {}
+        self.errors = {}
+
+    def register(self, name, read_fn, timeout, fallback, lock=None):
+        """
+        Register a sensor read.
+        read_fn: callable returning the reading dict.
+        timeout: seconds to wait for the reading each tick.
+        fallback: callable returning the reading to use on timeout or error.
+        lock: optional lock held around read_fn, for sensors that share a bus
+              transaction (e.g. two channels of one ADS1115).
+        """
+        self._sensors[name] = (read_fn, timeout, fallback, lock)
+        self.timeouts[name] = 0
+        self.errors[name] = 0
+
+    def _run(self, name):
+        read_fn, _, _, lock = self._sensors[name]
+        if lock is None:
+            return read_fn()
+        with lock:
+            return read_fn()
+
+    def acquire(self):
+        """Read all registered sensors concurrently and return {name: reading}."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=max(1, len(self._sensors)), thread_name_prefix="acquire")
+        start = clock.monotonic()
+        frame = {}
+        for name in self._sensors:
+            # A read that overran a previous tick is still occupying its
+            # worker; don't queue another one behind it.
+            in_flight = self._in_flight.get(name)
+            if in_flight is None or in_flight[0].done():
+                self._in_flight[name] = self._submit(name)
+        for name, (_, timeout, fallback, _) in self._sensors.items():
+            future, done = self._in_flight[name]
+            remaining = max(0.0, start + timeout - clock.monotonic())
+            try:
+                # Waited on the hardware clock (simulated seconds under sim)
+                clock.wait(done, remaining)
+                frame[name] = future.result(timeout=0)
+                del self._in_flight[name]
+            except FutureTimeoutError:
+                self.timeouts[name] += 1
+                self._log(f"{name} read timed out after {timeout}s (total timeouts: {self.timeouts[name]})")
+                frame[name] = fallback()
+            except Exception as e:
+                self.errors[name] += 1
+                self._log(f"{name} read error: {e}")
+                frame[name] = fallback()
+                del self._in_flight[name]
+        return frame
+
+    def _submit(self, name):
+        """Start a read; the Event is registered once per read, however many ticks it stays hung."""
+        future = self._executor.submit(self._run, name)
+        done = threading.Event()
+        future.add_done_callback(lambda _: done.set())
+        return future, done
+
+    def _log(self, msg):
+        if self.log_mgr is not None:
+            self.log_mgr.log_error(msg)
+
+    def shutdown(self):
+        """Stop the worker threads without waiting for hung reads."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
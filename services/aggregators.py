@@ -0,0 +1,121 @@
+"""
+Aggregators: Constant-memory streaming statistics for averaging windows.
+Each add() is O(1) and nothing is buffered, so a window costs the same
+whether it holds 5 samples or a day's worth. merge() combines two windows
+(e.g. twelve 5-second windows into a minute) without revisiting samples.
+
+RunningStats keeps count, mean, min, max and variance (Welford's algorithm).
+CircularStats averages angles in degrees as unit vectors, so 350 and 10
+average to 0 rather than 180, and tallies compass labels for the mode.
+
+Usage:
+    stats = RunningStats()
+    stats.add(12.5)
+    stats.mean, stats.min, stats.max, stats.stddev
+    direction = CircularStats()
+    direction.add(350.0, "N")
+    direction.mean, direction.most_common()
+    stats.reset()
+"""
+import math
+from collections import Counter
+
+class RunningStats:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.mean = None
+        self.min = None
+        self.max = None
+        self._m2 = 0.0  # sum of squared deviations from the mean
+
+    def add(self, value):
+        self.count += 1
+        if self.count == 1:
+            self.mean = self.min = self.max = float(value)
+            return
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        """Fold another RunningStats into this one (Chan et al. parallel update)."""
+        if not other.count:
+            return
+        if not self.count:
+            self.count, self.mean, self.min, self.max, self._m2 = other.count, other.mean, other.min, other.max, other._m2
+            return
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / total
+        self._m2 += other._m2 + delta * delta * self.count * other.count / total
+        self.count = total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def variance(self):
+        """Population variance, or None for an empty window."""
+        return self._m2 / self.count if self.count else None
+
+    @property
+    def stddev(self):
+        return math.sqrt(self.variance) if self.count else None
+
+    def __bool__(self):
+        return self.count > 0
+
+    def __len__(self):
+        return self.count
+
+class CircularStats:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self._sin = 0.0
+        self._cos = 0.0
+        self._labels = Counter()  # bounded by the number of compass points
+
+    def add(self, degrees, label=None):
+        rad = math.radians(degrees)
+        self._sin += math.sin(rad)
+        self._cos += math.cos(rad)
+        self.count += 1
+        if label is not None:
+            self._labels[label] += 1
+
+    def merge(self, other):
+        self.count += other.count
+        self._sin += other._sin
+        self._cos += other._cos
+        self._labels.update(other._labels)
+
+    @property
+    def mean(self):
+        """Circular mean in [0, 360), or None for an empty window or cancelling directions."""
+        if not self.count or (abs(self._sin) < 1e-12 and abs(self._cos) < 1e-12):
+            return None
+        return math.degrees(math.atan2(self._sin, self._cos)) % 360.0
+
+    @property
+    def resultant(self):
+        """Mean resultant length: 1.0 for a steady direction, near 0 for scattered ones."""
+        return math.hypot(self._sin, self._cos) / self.count if self.count else None
+
+    def most_common(self):
+        """Most frequent label, or None if no labels were added."""
+        return self._labels.most_common(1)[0][0] if self._labels else None
+
+    def __bool__(self):
+        return self.count > 0
+
+    def __len__(self):
+        return self.count
@@ -0,0 +1,157 @@
+"""
+BatchWriter: Write-behind text file output on one background thread.
+write() only puts (path, text) on a queue, so a slow SD card (writes can
+stall for hundreds of milliseconds while the card erases a block) never
+holds up the caller. The writer thread batches everything queued per file,
+keeps each file open between batches, and writes a batch when it is
+flush_interval_s old or max_batch_bytes large, optionally with fsync.
+Files are reopened if they were renamed or deleted underneath (checked
+once per batch), and after_write(path, size) can rotate a file: if it
+returns True the handle is closed and the next batch opens the new file.
+
+If the queue is full the text is dropped and counted rather than blocking;
+flush() and close() wait at most their timeout. After close(), write()
+appends synchronously, so late writers (daemon threads logging during
+shutdown) are not lost. Readers see new lines up to flush_interval_s late.
+
+Usage:
+    writer = BatchWriter(flush_interval_s=2.0, max_batch_bytes=65536)
+    writer.write("avg_flow_log.txt", "2025-07-01T00:00:00, avg_flow=0.1000, samples=300\n")
+    writer.flush()   # blocks until everything queued so far is written
+    writer.close()
+"""
+import os
+import queue
+import threading
+import time
+
+class BatchWriter:
+    def __init__(self, flush_interval_s=2.0, max_batch_bytes=65536, fsync=False, max_queue=10000,
+                 after_write=None):
+        self.flush_interval_s = flush_interval_s
+        self.max_batch_bytes = max_batch_bytes
+        self.fsync = fsync
+        self.after_write = after_write
+        self.dropped = 0
+        self.batches = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._pending = {}  # path -> [text, ...] not yet written
+        self._pending_bytes = 0
+        self._handles = {}  # path -> open file
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="batch-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, path, text):
+        """Queue text to be appended to path; never blocks (after close(), appends directly)."""
+        if self._closed:
+            self._write_direct(path, text)
+            return
+        try:
+            self._queue.put_nowait((path, text))
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self, timeout=None):
+        """Write everything queued so far; returns False on timeout or if the writer has stopped."""
+        if self._closed or not self._thread.is_alive():
+            return False
+        done = threading.Event()
+        try:
+            self._queue.put((None, done), timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self, timeout=10.0):
+        """Flush, close the files and stop the thread, waiting at most timeout seconds."""
+        if self._closed:
+            return
+        self._closed = True
+        deadline = time.monotonic() + timeout
+        try:
+            self._queue.put((None, None), timeout=timeout)
+        except queue.Full:
+            print(f"[DEBUG] BatchWriter queue still full after {timeout}s; closing without draining it")
+            return
+        self._thread.join(max(0.0, deadline - time.monotonic()))
+
+    @staticmethod
+    def _write_direct(path, text):
+        try:
+            with open(path, "a") as f:
+                f.write(text)
+        except Exception as e:
+            print(f"[DEBUG] BatchWriter failed to write {path}: {e}")
+
+    def _run(self):
+        oldest = None  # monotonic time of the oldest pending text
+        reported_drops = 0
+        while True:
+            timeout = None if oldest is None else max(0.0, oldest + self.flush_interval_s - time.monotonic())
+            try:
+                path, text = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                path, text = None, False  # batch is due
+            if path is not None:
+                self._pending.setdefault(path, []).append(text)
+                self._pending_bytes += len(text)
+                if oldest is None:
+                    oldest = time.monotonic()
+                if self._pending_bytes < self.max_batch_bytes:
+                    continue
+            self._write_pending()
+            oldest = None
+            if self.dropped != reported_drops:
+                print(f"[DEBUG] BatchWriter queue full: {self.dropped - reported_drops} writes dropped")
+                reported_drops = self.dropped
+            if text is None:  # close()
+                for f in self._handles.values():
+                    f.close()
+                self._handles.clear()
+                return
+            if isinstance(text, threading.Event):  # flush()
+                text.set()
+
+    def _write_pending(self):
+        pending, self._pending, self._pending_bytes = self._pending, {}, 0
+        for path, texts in pending.items():
+            try:
+                f = self._handle(path)
+                f.write("".join(texts))
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+                size = f.tell()
+            except Exception as e:
+                print(f"[DEBUG] BatchWriter failed to write {path}: {e}")
+                self._close(path)
+                continue
+            try:
+                if self.after_write is not None and self.after_write(path, size):
+                    self._close(path)
+            except Exception as e:
+                print(f"[DEBUG] BatchWriter after_write failed for {path}: {e}")
+        if pending:
+            self.batches += 1
+
+    def _handle(self, path):
+        """The open file for path, reopened if it was renamed or deleted since the last batch."""
+        f = self._handles.get(path)
+        if f is not None:
+            try:
+                if os.stat(path).st_ino == os.fstat(f.fileno()).st_ino:
+                    return f
+            except FileNotFoundError:
+                pass
+            self._close(path)
+        f = self._handles[path] = open(path, "a")
+        return f
+
+    def _close(self, path):
+        f = self._handles.pop(path, None)
+        if f is not None:
+            try:
+                f.close()
+            except Exception:
+                pass
@@ -0,0 +1,171 @@
+"""
+BinarySeries: Fixed-width append-only series files with a memory-mapped reader.
+Alternative to the avg_*_log.txt files for long-retention nodes, selected
+with "series_backend": "binary". Each metric gets <dir>/<metric>.series:
+
+    header:  b"SMSER1\\0\\0", uint32 record size, uint32 reserved   (16 bytes)
+    record:  int64 epoch ns, float32 value, uint32 samples        (16 bytes)
+
+A record is about a quarter of the equivalent text line. Readers map the
+file and view it as a NumPy structured array without copying, so the latest
+n records or a time range are a slice (ranges are found by binary search
+on the timestamps, which are in append order). A partially written final
+record is ignored until it is complete.
+
+Min/max are not kept. For circular metrics the compass label is derived
+from the mean direction when read.
+
+Usage:
+    series = BinarySeries("series")
+    series.append("pressure", ts, 37.12, samples=300)      # writer (SensorMonitor)
+    series.latest("pressure", 5)                           # dicts, like SeriesStore
+    view = series.view("pressure")                         # zero-copy ndarray
+    view["ts_ns"], view["value"], view["samples"]
+"""
+import mmap
+import os
+import struct
+import threading
+import numpy as np
+from sensors.wind_direction_sensor import degrees_to_compass
+
+MAGIC = b"SMSER1\0\0"
+HEADER = struct.Struct("<8sII")
+RECORD_DTYPE = np.dtype([("ts_ns", "<i8"), ("value", "<f4"), ("samples", "<u4")])
+RECORD = struct.Struct("<qfI")
+CIRCULAR_METRICS = ("wind_direction",)
+
+class _Mapping:
+    """A read-only mapping of one series file, remapped when the file grows or is replaced."""
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.stat = None
+        self.mm = None
+        self.count = 0
+
+    def refresh(self):
+        st = os.stat(self.path)
+        if self.stat is not None and st.st_ino != self.stat.st_ino:
+            # File was replaced: reopen (the old mapping stays valid for views still using it)
+            self.file.close()
+            self.file = open(self.path, "rb")
+        elif self.stat is not None and st.st_size == self.stat.st_size:
+            return
+        self.stat = st
+        if st.st_size < HEADER.size:
+            self.mm, self.count = None, 0  # header not written yet
+            return
+        # Not closed explicitly: views handed out earlier may still reference it
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, record_size, _ = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or record_size != RECORD_DTYPE.itemsize:
+            raise ValueError(f"{self.path}: not a series file")
+        self.count = (len(self.mm) - HEADER.size) // RECORD_DTYPE.itemsize
+
+    def view(self):
+        if self.mm is None:
+            return np.empty(0, dtype=RECORD_DTYPE)
+        return np.frombuffer(self.mm, dtype=RECORD_DTYPE, count=self.count, offset=HEADER.size)
+
+    def close(self):
+        self.mm = None
+        self.file.close()
+
+class BinarySeries:
+    def __init__(self, directory="series", log_mgr=None):
+        self.directory = directory
+        self.log_mgr = log_mgr
+        self._writers = {}
+        self._mappings = {}
+        self._lock = threading.Lock()
+
+    def path(self, metric):
+        return os.path.join(self.directory, f"{metric}.series")
+
+    # --- Writer ---
+    def append(self, metric, ts, value, samples=None, min=None, max=None, label=None):
+        """Append one record; min, max and label are accepted for SeriesStore compatibility and not kept."""
+        record = RECORD.pack(int(ts * 1e9), value, samples or 0)
+        with self._lock:
+            try:
+                f = self._writers.get(metric)
+                if f is None:
+                    f = self._open_writer(metric)
+                f.write(record)
+                f.flush()
+            except Exception as e:
+                if self.log_mgr is not None:
+                    self.log_mgr.log_error(f"Binary series append failed ({metric}): {e}")
+
+    def _open_writer(self, metric):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(metric)
+        f = open(path, "ab")
+        if f.tell() == 0:
+            f.write(HEADER.pack(MAGIC, RECORD_DTYPE.itemsize, 0))
+            f.flush()
+        else:
+            # Drop a record torn by a crash mid-write, so later records stay aligned
+            torn = (f.tell() - HEADER.size) % RECORD_DTYPE.itemsize
+            if torn:
+                f.truncate(f.tell() - torn)
+                f.seek(0, os.SEEK_END)
+        self._writers[metric] = f
+        return f
+
+    def flush_if_due(self, now=None):
+        pass  # every append is flushed
+
+    # --- Reader ---
+    def view(self, metric):
+        """Zero-copy structured array (ts_ns, value, samples) of every complete record, or None."""
+        path = self.path(metric)
+        if not os.path.exists(path):
+            return None
+        with self._lock:
+            mapping = self._mappings.get(metric)
+            if mapping is None:
+                mapping = self._mappings[metric] = _Mapping(path)
+            mapping.refresh()
+            return mapping.view()
+
+    def range_view(self, metric, start=None, end=None):
+        """Records with start <= ts <= end (epoch seconds, either optional) as a zero-copy slice."""
+        view = self.view(metric)
+        if view is None:
+            return None
+        ts = view["ts_ns"]
+        lo = 0 if start is None else np.searchsorted(ts, int(start * 1e9), side="left")
+        hi = len(view) if end is None else np.searchsorted(ts, int(end * 1e9), side="right")
+        return view[lo:hi]
+
+    def to_rows(self, metric, records):
+        """Convert records (a slice of view()) to SeriesStore-style row dicts."""
+        circular = metric.split("@")[0] in CIRCULAR_METRICS
+        rows = []
+        for ts_ns, value, samples in records.tolist():
+            value = float(f"{value:.7g}")  # float32 precision, without the binary noise digits
+            rows.append({"metric": metric, "ts": ts_ns / 1e9, "value": value, "min": None, "max": None,
+                         "samples": samples, "label": degrees_to_compass(value % 360) if circular else None})
+        return rows
+
+    def latest(self, metric, n):
+        """The n most recent records of `metric` as dicts (SeriesStore row format), oldest first."""
+        view = self.view(metric)
+        return [] if view is None else self.to_rows(metric, view[-n:])
+
+    def range(self, metric, start=None, end=None, limit=None):
+        records = self.range_view(metric, start, end)
+        if records is None:
+            return []
+        return self.to_rows(metric, records[:limit] if limit else records)
+
+    def close(self):
+        with self._lock:
+            for f in self._writers.values():
+                f.close()
+            self._writers = {}
+            for mapping in self._mappings.values():
+                mapping.close()
+            self._mappings = {}
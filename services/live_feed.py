@@ -0,0 +1,95 @@
+"""
+LiveFeed: Per-second frames from SensorMonitor to the API process, for streaming.
+SensorMonitor sends each published payload as one UDP datagram to a local
+port (fire-and-forget: a missing or slow listener never stalls the 1 Hz
+loop, and no broker is involved). In the API, a single LiveBroadcaster
+thread receives the datagrams, formats each one once as a Server-Sent Event
+and appends it to a shared ring; every streaming client waits on the same
+condition and takes the events newer than the last one it sent, so one
+producer fans out to any number of connections without per-client queues
+or polling. Event ids are sequence numbers, so a reconnecting client
+(Last-Event-ID) resumes without gaps while the ring still holds its events.
+
+Usage:
+    feed = LiveFeedSender(("127.0.0.1", 5002))       # SensorMonitor
+    feed.publish("sensors/sets", sets_data)
+
+    broadcaster = LiveBroadcaster(("127.0.0.1", 5002))   # API
+    seq, events = broadcaster.wait(seq, timeout=15)      # [(topic, sse_bytes), ...]
+"""
+import json
+import socket
+import threading
+from collections import deque
+
+MAX_DATAGRAM = 65507
+
+class LiveFeedSender:
+    def __init__(self, address):
+        self.address = address
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.setblocking(False)
+        self.dropped = 0
+
+    def publish(self, topic, payload):
+        try:
+            # Datagram: topic, newline, the payload's JSON (which has no raw newlines)
+            self._sock.sendto(topic.encode() + b"\n" + json.dumps(payload).encode(), self.address)
+        except OSError:
+            self.dropped += 1  # nobody listening, or the socket buffer is full
+
+    def close(self):
+        self._sock.close()
+
+class LiveBroadcaster:
+    def __init__(self, address, history=120, log_mgr=None):
+        self.address = address
+        self.log_mgr = log_mgr
+        self._events = deque(maxlen=history)  # (seq, topic, sse bytes), oldest first
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._thread = None
+        self.clients = 0
+
+    def start(self):
+        """Bind the feed port and start the receiver thread (idempotent)."""
+        with self._cond:
+            if self._thread is not None:
+                return
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.bind(self.address)
+            self._thread = threading.Thread(target=self._receive, args=(sock,), name="live-feed", daemon=True)
+            self._thread.start()
+
+    def _receive(self, sock):
+        while True:
+            datagram = sock.recv(MAX_DATAGRAM)
+            topic, _, data = datagram.partition(b"\n")
+            if not topic or not data or b"\n" in data:
+                if self.log_mgr:
+                    self.log_mgr.log_error(f"Live feed: malformed datagram ({len(datagram)} bytes)")
+                continue
+            topic = topic.decode("utf-8", errors="replace")
+            with self._cond:
+                self._seq += 1
+                # The payload is already JSON: it becomes the event's data line as is
+                event = f"id: {self._seq}\nevent: {topic}\ndata: ".encode() + data + b"\n\n"
+                self._events.append((self._seq, topic, event))
+                self._cond.notify_all()
+
+    @property
+    def seq(self):
+        return self._seq
+
+    def wait(self, after, timeout=None):
+        """
+        (last seq, [(topic, event bytes), ...]) of the events newer than seq
+        `after`, blocking up to `timeout` seconds for one; empty on timeout.
+        An `after` from before a restart (larger than the current seq) starts
+        from the newest event.
+        """
+        with self._cond:
+            if after > self._seq:
+                after = self._seq
+            self._cond.wait_for(lambda: self._seq > after, timeout)
+            return self._seq, [(topic, event) for seq, topic, event in self._events if seq > after]
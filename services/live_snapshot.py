@@ -0,0 +1,175 @@
+"""
+LiveSnapshot: The latest sensor frames in shared memory, readable by other processes without locks.
+SensorMonitor (the only writer) stores each per-second frame in a ring of
+fixed-width slots in a memory-mapped file, normally on /dev/shm (tmpfs, so
+nothing reaches the SD card). The API maps the same file and copies slots
+out with a seqlock check instead of a lock: each slot starts with a
+sequence number that is odd while the slot is being written and 2 * frame
+number once it is complete, so a reader retries a torn copy and skips a
+slot that has already been overwritten by a newer frame.
+
+Layout (little-endian):
+    header:  b"SMLIVE1\\0", uint32 slots, uint32 fields, uint64 frames written
+    slot:    uint64 sequence, float64 x len(FIELDS) (NaN for a missing reading)
+
+The writer reuses an existing file with the same layout, so readers keep a
+valid mapping across SensorMonitor restarts. A file with another layout is
+never resized in place (a reader touching a mapped page past a shrunk end
+gets SIGBUS, which kills the whole API process): the writer clears its
+magic, unlinks it and creates a new file, and readers, which check the
+magic and the file size before indexing slots, map the new one.
+
+Usage:
+    snapshot = LiveSnapshotWriter("/dev/shm/sensor_monitor_live")   # SensorMonitor
+    snapshot.write({"timestamp": time.time(), "pressure_psi": 37.1, ...})
+
+    reader = LiveSnapshotReader("/dev/shm/sensor_monitor_live")     # API
+    reader.latest()      # frame dict, or None
+    reader.recent(60)    # up to 60 frames, oldest first
+"""
+import math
+import mmap
+import os
+import struct
+import time
+
+MAGIC = b"SMLIVE1\0"
+HEADER = struct.Struct("<8sIIQ")
+SEQUENCE = struct.Struct("<Q")
+HEAD = struct.Struct("<Q")
+HEAD_OFFSET = 16  # frames written, after magic, slots and fields
+# "written_at" is the real wall time of the write, stamped by the writer: "timestamp" is the
+# hardware clock's, which under the sim backend runs faster than real time, so only
+# written_at can be compared with the reader's time.time() (e.g. for a frame's age).
+FIELDS = ("timestamp", "flow_pulses", "flow_litres", "flow_rate_lpm", "pressure_psi", "pressure_kpa",
+          "wind_speed", "wind_direction_deg", "temperature", "humidity", "dht_age_s", "dht_stale",
+          "written_at")
+RECORD = struct.Struct("<" + "d" * len(FIELDS))
+SLOT_SIZE = SEQUENCE.size + RECORD.size
+READ_RETRIES = 100
+
+def _size(slots):
+    return HEADER.size + slots * SLOT_SIZE
+
+def _slot_offset(slots, frame):
+    return HEADER.size + ((frame - 1) % slots) * SLOT_SIZE
+
+class LiveSnapshotWriter:
+    def __init__(self, path, slots=300):
+        self.path = path
+        self.slots = slots
+        fd = self._open(path, slots)
+        try:
+            self._map = mmap.mmap(fd, _size(slots))
+        finally:
+            os.close(fd)
+        # Zero every slot before publishing the header, so no reader trusts an old frame
+        self._map[HEADER.size:] = bytes(slots * SLOT_SIZE)
+        HEADER.pack_into(self._map, 0, MAGIC, slots, len(FIELDS), 0)
+        self.frames = 0
+
+    @staticmethod
+    def _open(path, slots):
+        """Descriptor of a snapshot file of _size(slots) bytes, replacing one with another layout."""
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        size = os.fstat(fd).st_size
+        if size == _size(slots) and HEADER.unpack(os.pread(fd, HEADER.size, 0))[:3] == (MAGIC, slots, len(FIELDS)):
+            return fd
+        if size:
+            # Readers may have it mapped: retire it (they remap on the magic change) instead of resizing it
+            os.pwrite(fd, bytes(len(MAGIC)), 0)
+            os.close(fd)
+            os.unlink(path)
+            fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o644)
+        os.ftruncate(fd, _size(slots))
+        return fd
+
+    def write(self, frame):
+        """Store a frame (dict with FIELDS keys; missing or None values become NaN; written_at is set here)."""
+        frame = dict(frame, written_at=time.time())
+        values = [frame.get(name) for name in FIELDS]
+        values = [math.nan if v is None else float(v) for v in values]
+        self.frames += 1
+        offset = _slot_offset(self.slots, self.frames)
+        SEQUENCE.pack_into(self._map, offset, 2 * self.frames - 1)  # odd: being written
+        RECORD.pack_into(self._map, offset + SEQUENCE.size, *values)
+        SEQUENCE.pack_into(self._map, offset, 2 * self.frames)
+        HEAD.pack_into(self._map, HEAD_OFFSET, self.frames)
+
+    def close(self):
+        self._map.close()
+
+class LiveSnapshotReader:
+    def __init__(self, path):
+        self.path = path
+        # (mmap, slots), replaced as a whole so concurrent API threads always see a matching pair;
+        # a replaced mapping is dropped rather than closed while another thread may still read it
+        self._mapping = None
+
+    def _map(self):
+        """(mmap, slots) of the current snapshot, or None if there is none."""
+        mapping = self._mapping
+        if mapping is not None:
+            buf, slots = mapping
+            # size() is the file's current length: never index a mapping the file no longer covers
+            if buf.size() >= _size(slots) and HEADER.unpack_from(buf, 0)[:2] == (MAGIC, slots):
+                return mapping
+            # Retired by a restarted writer with another layout: map the new file
+        try:
+            with open(self.path, "rb") as f:
+                header = f.read(HEADER.size)
+                if len(header) < HEADER.size:
+                    return None
+                magic, slots, fields, _ = HEADER.unpack(header)
+                if magic != MAGIC or fields != len(FIELDS) or os.fstat(f.fileno()).st_size < _size(slots):
+                    return None
+                mapping = self._mapping = (mmap.mmap(f.fileno(), _size(slots), access=mmap.ACCESS_READ), slots)
+        except FileNotFoundError:
+            return None
+        return mapping
+
+    @staticmethod
+    def _read(mapping, frame):
+        """Frame number `frame` as a dict, or None if its slot now holds another frame."""
+        buf, slots = mapping
+        offset = _slot_offset(slots, frame)
+        for _ in range(READ_RETRIES):
+            before, = SEQUENCE.unpack_from(buf, offset)
+            if before != 2 * frame:
+                if before == 2 * frame - 1:
+                    continue  # being written right now
+                return None
+            values = RECORD.unpack_from(buf, offset + SEQUENCE.size)
+            if SEQUENCE.unpack_from(buf, offset)[0] == before:
+                return LiveSnapshotReader._frame(values)
+        return None
+
+    @staticmethod
+    def _frame(values):
+        frame = {name: (None if math.isnan(v) else v) for name, v in zip(FIELDS, values)}
+        if frame["flow_pulses"] is not None:
+            frame["flow_pulses"] = int(frame["flow_pulses"])
+        if frame["dht_stale"] is not None:
+            frame["dht_stale"] = bool(frame["dht_stale"])
+        return frame
+
+    def available(self):
+        return self._map() is not None
+
+    def recent(self, n):
+        """Up to the n newest frames (at most the ring size), oldest first."""
+        mapping = self._map()
+        if mapping is None:
+            return []
+        head, = HEAD.unpack_from(mapping[0], HEAD_OFFSET)
+        frames = []
+        for frame in range(max(1, head - min(n, mapping[1]) + 1), head + 1):
+            value = self._read(mapping, frame)
+            if value is not None:
+                frames.append(value)
+        return frames
+
+    def latest(self):
+        """The newest frame, or None if there is none yet."""
+        frames = self.recent(1)
+        return frames[0] if frames else None
@@ -0,0 +1,118 @@
+"""
+LogCache: Incrementally parsed, bounded view of the newest records of a text log.
+Keeps up to `maxlen` parsed records of one log in a ring. Each refresh
+stats the file (inode, size, mtime) and does nothing if it is unchanged;
+otherwise only the bytes appended since the previous refresh are parsed. A
+rotation (new inode, or no active file yet after one), a truncation, or an
+in-place rewrite such as LogManager.trim_log_file (detected by checking the
+bytes just before the parsed offset) discards the ring and rebuilds it from
+the log's tail, reading back into closed segments when the active file
+holds fewer than `maxlen` records.
+
+Usage:
+    cache = LogCache("avg_pressure_log.txt", parse_line, maxlen=500)
+    cache.latest(5)   # refreshes, then returns the last 5 parsed records
+
+parse_line(line) returns a record, or None to skip the line; exceptions
+count as None.
+"""
+import os
+import threading
+from collections import deque
+from itertools import islice
+from services.log_tail import complete_end, reverse_log_lines
+
+FINGERPRINT_BYTES = 64
+MISSING = "missing"  # _stat while the log has no active file
+
+class LogCache:
+    def __init__(self, path, parse_line, maxlen=500):
+        self.path = path
+        self.parse_line = parse_line
+        self.maxlen = maxlen
+        self.records = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+        self._inode = None
+        self._stat = None         # (size, mtime_ns) at the last refresh
+        self._offset = 0          # bytes parsed so far (always at a line boundary)
+        self._fingerprint = b""   # the bytes just before _offset
+        self.rebuilds = 0
+
+    def _parse(self, line):
+        try:
+            return self.parse_line(line)
+        except Exception:
+            return None
+
+    def refresh(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            # Between a rotation and the next write only closed segments exist
+            if self._stat != MISSING:
+                self._rebuild()
+                self._stat = MISSING
+            return
+        if st.st_ino != self._inode or st.st_size < self._offset:
+            self._rebuild()
+        elif (st.st_size, st.st_mtime_ns) != self._stat:
+            self._read_appended()
+        self._stat = (st.st_size, st.st_mtime_ns)
+
+    def _reset(self):
+        self.records.clear()
+        self._inode = None
+        self._stat = None
+        self._offset = 0
+        self._fingerprint = b""
+
+    def _rebuild(self):
+        self._reset()
+        self.rebuilds += 1
+        try:
+            with open(self.path, "rb") as f:
+                self._inode = os.fstat(f.fileno()).st_ino
+                end = complete_end(f)
+        except FileNotFoundError:
+            end = 0
+        # Only the tail is parsed: walk backward until the ring is full
+        parsed = (self._parse(line) for line in reverse_log_lines(self.path, end=end))
+        records = list(islice((r for r in parsed if r is not None), self.maxlen))
+        records.reverse()
+        self.records.extend(records)
+        if self._inode is not None:
+            self._advance_to(end)
+
+    def _read_appended(self):
+        with open(self.path, "rb") as f:
+            if self._fingerprint:
+                f.seek(self._offset - len(self._fingerprint))
+                if f.read(len(self._fingerprint)) != self._fingerprint:
+                    self._rebuild()
+                    return
+            f.seek(self._offset)
+            data = f.read()
+        # Anything after the last newline is a line still being written
+        complete = data[:data.rfind(b"\n") + 1]
+        for line in complete.split(b"\n"):
+            line = line.strip()
+            if line:
+                record = self._parse(line.decode("utf-8", errors="replace"))
+                if record is not None:
+                    self.records.append(record)
+        self._advance_to(self._offset + len(complete))
+
+    def _advance_to(self, offset):
+        self._offset = offset
+        start = max(0, offset - FINGERPRINT_BYTES)
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            self._fingerprint = f.read(offset - start)
+
+    def latest(self, n):
+        """The last n parsed records, oldest first (refreshing first)."""
+        with self._lock:
+            self.refresh()
+            if n >= len(self.records):
+                return list(self.records)
+            return list(islice(self.records, len(self.records) - n, None))
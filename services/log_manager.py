@@ -1,40 +1,232 @@
 """
 LogManager: Centralized log file management for the sensor system.
-Handles error logging, log trimming, and debug/info logging.
+Handles error logging, segmented log rotation, and debug/info logging.
+
+Coalescing: log_error/log_info/log write the first occurrence of a message
+and then, for `coalesce_window_s`, only count identical repeats; when the
+window ends a single "(repeated N more times ...)" line is written. A
+broker outage that fails several times a second so costs two lines per
+message per window instead of thousands. Totals per message are kept in
+counts() (up to MAX_COUNTED_MESSAGES distinct messages; the rest are
+counted under "(other)"). Call flush() periodically so the last summary is
+written even when the errors stop.
+
+Write-behind: given a BatchWriter, append() and the error log only queue
+their text, and the writer thread does the file I/O (and the rotation
+check, through after_write); close() drains it.
+
+Rotation: append() writes to the active file (its name never changes, so
+tools tailing it keep working). When it exceeds a size or age limit it is
+renamed to a closed segment, "<log file>.<YYYYmmddTHHMMSSffffff>", and a
+new active file starts on the next write. Files are never rewritten or
+truncated in place, so a reader holding one open keeps a consistent view.
+Segments beyond `keep` are deleted oldest first; with compress, closed
+segments are gzipped ("<segment>.gz") on a background thread. Readers list
+the pieces with log_segments().
 
 Usage:
     log_mgr = LogManager("error_log.txt")
+    log_mgr.set_rotation("avg_flow_log.txt", max_bytes=1048576, keep=50)
+    log_mgr.append("avg_flow_log.txt", "2025-07-01T00:00:00, avg_flow=0.1000, samples=300\n")
     log_mgr.log_error("message")
-    log_mgr.trim_log_file("log.txt", max_lines=1000)
+    log_mgr.log("MQTT", "MQTT connect error: timed out")   # "[MQTT][...] ..." line
+    log_segments("avg_flow_log.txt")   # closed segments oldest first, then the active file
+    log_mgr = LogManager("error_log.txt", writer=BatchWriter())   # write-behind; log_mgr.close() at exit
 """
+import glob
+import gzip
+import math
+import os
+import shutil
 import time
 import threading
+from datetime import datetime
+
+SEGMENT_STAMP = "%Y%m%dT%H%M%S%f"  # fixed width, so names sort chronologically
+MAX_COUNTED_MESSAGES = 256
+
+def log_segments(log_file):
+    """
+    Existing pieces of a rotated log, oldest first: closed segments (plain or
+    .gz; plain wins while a segment is being compressed), then the active file.
+    """
+    segments = {}
+    for path in glob.glob(glob.escape(log_file) + ".*"):
+        base = path[:-3] if path.endswith(".gz") else path
+        stamp = base[len(log_file) + 1:]
+        if len(stamp) != 21 or not stamp[:8].isdigit():
+            continue  # not a segment (e.g. a .gz.tmp being written)
+        if base not in segments or path == base:
+            segments[base] = path
+    ordered = [segments[base] for base in sorted(segments)]
+    if os.path.exists(log_file):
+        ordered.append(log_file)
+    return ordered
 
 class LogManager:
-    def __init__(self, error_log_file="error_log.txt"):
+    def __init__(self, error_log_file="error_log.txt", coalesce_window_s=60.0, writer=None):
         self.error_log_file = error_log_file
+        self.coalesce_window_s = coalesce_window_s
+        self.writer = writer
+        if writer is not None:
+            writer.after_write = self._after_write
         self._lock = threading.Lock()
+        self._rotation = {}  # log file -> (max_bytes, max_age_s, keep, compress)
+        self._started = {}   # log file -> wall-clock start of its active segment
+        self._repeats = {}   # (tag, msg) -> [monotonic start of its window, repeats suppressed]
+        self._counts = {}    # (tag, msg) -> occurrences since start
 
-    def log_error(self, msg):
-        """Log a critical error message to the error log file with timestamp."""
+    def set_rotation(self, log_file, max_bytes=None, max_age_s=None, keep=None, compress=False):
+        """Rotate `log_file` past max_bytes or max_age_s, keeping `keep` closed segments (None: all)."""
+        with self._lock:
+            self._rotation[log_file] = (max_bytes, max_age_s, keep, compress)
+
+    def append(self, log_file, text):
+        """Append text to log_file, then rotate it if it is due."""
+        with self._lock:
+            self._append(log_file, text)
+
+    def _append(self, log_file, text):
+        if self.writer is not None:
+            self.writer.write(log_file, text)
+            return
+        with open(log_file, "a") as f:
+            f.write(text)
+            size = f.tell()
+        self._rotate_if_due(log_file, size)
+
+    def _after_write(self, log_file, size):
+        """BatchWriter hook: rotate after a batch; True if log_file was rotated."""
+        with self._lock:
+            return self._rotate_if_due(log_file, size)
+
+    def close(self):
+        """
+        Write pending repeat summaries and drain the write-behind queue (repeat
+        calls are harmless). Later writes, e.g. errors from daemon threads
+        during shutdown, go to the files directly.
+        """
+        self.flush(force=True)
+        with self._lock:
+            writer, self.writer = self.writer, None
+        if writer is not None:
+            writer.close()
+
+    def _rotate_if_due(self, log_file, size):
+        policy = self._rotation.get(log_file)
+        if policy is None:
+            return False
+        max_bytes, max_age_s, keep, compress = policy
+        now = time.time()
+        if log_file not in self._started:
+            self._started[log_file] = self._segment_start(log_file, now)
+        started = self._started[log_file]
+        if not ((max_bytes and size >= max_bytes) or (max_age_s and now - started >= max_age_s)):
+            return False
+        segment = f"{log_file}.{datetime.now().strftime(SEGMENT_STAMP)}"
+        os.replace(log_file, segment)
+        self._started[log_file] = now
+        if keep is not None:
+            closed = log_segments(log_file)  # the active file was just renamed, so all are closed
+            for old in closed[:max(0, len(closed) - keep)]:
+                try:
+                    os.remove(old)
+                except FileNotFoundError:
+                    pass
+        if compress:
+            threading.Thread(target=self._compress, args=(segment,), name="log-compress", daemon=True).start()
+        return True
+
+    @staticmethod
+    def _segment_start(log_file, now):
+        """When the active segment began: the previous rotation (the newest segment's stamp), else now."""
+        closed = log_segments(log_file)
+        if closed and closed[-1] == log_file:
+            closed.pop()
+        if not closed:
+            return now
+        stamp = closed[-1][len(log_file) + 1:].split(".")[0]
+        return datetime.strptime(stamp, SEGMENT_STAMP).timestamp()
+
+    def _compress(self, segment):
+        try:
+            with open(segment, "rb") as src, gzip.open(segment + ".gz.tmp", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.replace(segment + ".gz.tmp", segment + ".gz")
+            os.remove(segment)
+        except FileNotFoundError:
+            pass  # dropped by a later rotation meanwhile
+        except Exception as e:
+            self.log_error(f"Failed to compress log segment {segment}: {e}")
+
+    def log(self, tag, msg):
+        """Write "[tag][time] msg" to the error log, coalescing repeats of the same message."""
+        now = time.monotonic()
+        key = (tag, msg)
         try:
             with self._lock:
-                with open(self.error_log_file, "a") as f:
-                    f.write(f"[ERROR][{time.strftime('%Y-%m-%d %H:%M:%S')}] {msg}\n")
+                self._count(key)
+                lines = self._expired_summaries(now)
+                entry = self._repeats.get(key)
+                if entry is not None:
+                    entry[1] += 1
+                else:
+                    if self.coalesce_window_s:
+                        self._repeats[key] = [now, 0]
+                    lines.append(self._line(tag, msg))
+                if lines:
+                    self._append(self.error_log_file, "".join(lines))
         except Exception:
             pass
 
+    def log_error(self, msg):
+        """Log a critical error message to the error log file with timestamp."""
+        self.log("ERROR", msg)
+
     def log_info(self, msg):
         """Log an info/debug message to the error log file with timestamp."""
+        self.log("INFO", msg)
+
+    def flush(self, force=False):
+        """Write the summaries of ended coalescing windows (all pending ones with force)."""
         try:
             with self._lock:
-                with open(self.error_log_file, "a") as f:
-                    f.write(f"[INFO][{time.strftime('%Y-%m-%d %H:%M:%S')}] {msg}\n")
+                lines = self._expired_summaries(math.inf if force else time.monotonic())
+                if lines:
+                    self._append(self.error_log_file, "".join(lines))
         except Exception:
             pass
 
+    def counts(self):
+        """Occurrences per "[tag] message" since start, most frequent first."""
+        with self._lock:
+            return dict(sorted(((f"[{tag}] {msg}", n) for (tag, msg), n in self._counts.items()),
+                               key=lambda item: -item[1]))
+
+    @staticmethod
+    def _line(tag, msg):
+        return f"[{tag}][{time.strftime('%Y-%m-%d %H:%M:%S')}] {msg}\n"
+
+    def _count(self, key):
+        if key not in self._counts and len(self._counts) >= MAX_COUNTED_MESSAGES:
+            key = (key[0], "(other)")
+        self._counts[key] = self._counts.get(key, 0) + 1
+
+    def _expired_summaries(self, now):
+        lines = []
+        for key, (start, repeats) in list(self._repeats.items()):
+            if now - start >= self.coalesce_window_s:
+                del self._repeats[key]
+                if repeats:
+                    tag, msg = key
+                    lines.append(self._line(tag, f"{msg} (repeated {repeats} more times within {self.coalesce_window_s:g} s)"))
+        return lines
+
     def trim_log_file(self, log_file, max_lines=1000):
-        """Trim a log file to the last max_lines lines."""
+        """
+        Trim a log file to the last max_lines lines. Rewrites the whole file in
+        place; prefer set_rotation() for logs that other processes read.
+        """
         try:
             with self._lock:
                 with open(log_file, "r") as f:
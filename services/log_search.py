@@ -0,0 +1,143 @@
+"""
+LogSearch: Time-range reads from timestamp-ordered text logs by binary search.
+Logs are appended in time order, so the first record at or after `start` is
+found by bisecting byte offsets (seek to the middle, skip the partial line,
+parse the next one) until the window is one block wide; only that block and
+the records inside the range are then read. The file is never scanned from
+the beginning. For a rotated log (see LogManager) the first record of each
+segment picks the segment the range starts in; gzipped segments are
+scanned linearly.
+
+Usage:
+    records = read_range("avg_flow_log.txt", parse_line, "2025-07-01T00:00:00", "2025-07-02T00:00:00")
+
+parse_line(line) returns a record dict with a "timestamp" (ISO 8601, compared
+as a string), or None / raises to skip the line. A final line that is still
+being written is ignored.
+"""
+import gzip
+from services.log_tail import complete_end
+from services.log_manager import log_segments
+
+BLOCK_SIZE = 4096
+MAX_PROBE_LINES = 50  # unparseable lines skipped per probe before giving up on it
+
+def _parse(parse_line, raw):
+    line = raw.strip()
+    if not line:
+        return None
+    try:
+        return parse_line(line.decode("utf-8", errors="replace"))
+    except Exception:
+        return None
+
+def _probe(f, pos, end, parse_line):
+    """Timestamp of the first parseable line starting after `pos` (and before `end`), or None."""
+    f.seek(pos)
+    f.readline()  # skip the line containing pos
+    for _ in range(MAX_PROBE_LINES):
+        if f.tell() >= end:
+            return None
+        record = _parse(parse_line, f.readline())
+        if record is not None:
+            return record["timestamp"]
+    return None
+
+def find_start(f, end, parse_line, start):
+    """Byte offset from which a forward scan reaches the first record with timestamp >= start."""
+    lo, hi = 0, end
+    while hi - lo > BLOCK_SIZE:
+        mid = (lo + hi) // 2
+        ts = _probe(f, mid, end, parse_line)
+        if ts is None or ts >= start:
+            hi = mid
+        else:
+            lo = mid
+    return lo
+
+def _open_segment(path):
+    """Open a log piece; a closed segment compressed since it was listed is read from its .gz."""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    try:
+        return open(path, "rb")
+    except FileNotFoundError:
+        return gzip.open(path + ".gz", "rb")
+
+def first_timestamp(path, parse_line):
+    """Timestamp of the first parseable record of a file or segment, or None."""
+    with _open_segment(path) as f:
+        for _ in range(MAX_PROBE_LINES):
+            raw = f.readline()
+            if not raw:
+                return None
+            record = _parse(parse_line, raw)
+            if record is not None:
+                return record["timestamp"]
+    return None
+
+def read_range(path, parse_line, start=None, end=None, limit=None):
+    """
+    Records with start <= timestamp <= end (either bound optional), oldest
+    first, up to limit, across every segment of the log `path`.
+    """
+    segments = []
+    # Newest first, until the segment that starts at or before `start`
+    for segment in reversed(log_segments(path)):
+        try:
+            first = first_timestamp(segment, parse_line)
+        except FileNotFoundError:
+            continue  # removed by a rotation since it was listed
+        segments.append((segment, first))
+        if start is not None and first is not None and first <= start:
+            break
+    results = []
+    for segment, first in reversed(segments):
+        if end is not None and first is not None and first > end:
+            break
+        try:
+            results += _read_segment(segment, parse_line, start, end,
+                                     None if limit is None else limit - len(results))
+        except FileNotFoundError:
+            continue
+        if limit is not None and len(results) >= limit:
+            break
+    return results
+
+def _read_segment(path, parse_line, start, end, limit):
+    results = []
+    f = _open_segment(path)
+    if isinstance(f, gzip.GzipFile):
+        # No cheap seeking in a gzip stream: scan it
+        with f:
+            for raw in f:
+                record = _parse(parse_line, raw)
+                if record is None or (start is not None and record["timestamp"] < start):
+                    continue
+                if end is not None and record["timestamp"] > end:
+                    break
+                results.append(record)
+                if limit is not None and len(results) >= limit:
+                    break
+        return results
+    with f:
+        stop = complete_end(f)
+        pos = 0
+        if start is not None:
+            pos = find_start(f, stop, parse_line, start)
+        f.seek(pos)
+        if pos > 0:
+            f.readline()  # partial line; its record is before start
+        while f.tell() < stop:
+            record = _parse(parse_line, f.readline())
+            if record is None:
+                continue
+            ts = record["timestamp"]
+            if start is not None and ts < start:
+                continue
+            if end is not None and ts > end:
+                break
+            results.append(record)
+            if limit is not None and len(results) >= limit:
+                break
+    return results
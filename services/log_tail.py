@@ -0,0 +1,92 @@
+"""
+LogTail: Read the last lines of an append-only log without reading the whole file.
+Seeks backward from the end in fixed-size blocks until enough complete lines
+have been seen, so the cost depends on how many lines are wanted, not on the
+file size. A final line without its newline (still being written) is skipped.
+reverse_log_lines() continues into the closed segments of a rotated log
+(see LogManager), newest first; gzipped segments are decompressed whole.
+
+Usage:
+    for line in reverse_lines("avg_flow_log.txt"):   # newest first, active file only
+        ...
+    for line in reverse_log_lines("avg_flow_log.txt"):   # newest first, every segment
+        ...
+    tail_lines("avg_flow_log.txt", 5)                 # oldest first
+"""
+import gzip
+import os
+from itertools import islice
+from services.log_manager import log_segments
+
+BLOCK_SIZE = 8192
+
+def complete_end(f, block_size=BLOCK_SIZE):
+    """
+    Offset just after the last newline of open binary file `f`: anything
+    beyond it is a line still being written.
+    """
+    f.seek(0, os.SEEK_END)
+    end = f.tell()
+    while end > 0:
+        size = min(block_size, end)
+        f.seek(end - size)
+        newline = f.read(size).rfind(b"\n")
+        if newline >= 0:
+            return end - size + newline + 1
+        end -= size
+    return 0
+
+def reverse_lines(path, block_size=BLOCK_SIZE, end=None):
+    """
+    Yield the complete, non-empty lines of `path` newest first, stripped.
+    If given, `end` (a complete_end() offset) is where reading starts.
+    """
+    with open(path, "rb") as f:
+        if end is None:
+            end = complete_end(f, block_size)
+        pos = end
+        tail = b""
+        while pos > 0:
+            size = min(block_size, pos)
+            pos -= size
+            f.seek(pos)
+            lines = (f.read(size) + tail).split(b"\n")
+            # The first piece may continue in the previous block
+            tail = lines.pop(0)
+            for line in reversed(lines):
+                line = line.strip()
+                if line:
+                    yield line.decode("utf-8", errors="replace")
+        if tail.strip():
+            yield tail.strip().decode("utf-8", errors="replace")
+
+def _reverse_gzip_lines(path):
+    with gzip.open(path, "rb") as f:
+        lines = f.read().split(b"\n")
+    for line in reversed(lines):
+        line = line.strip()
+        if line:
+            yield line.decode("utf-8", errors="replace")
+
+def reverse_log_lines(log_file, block_size=BLOCK_SIZE, end=None):
+    """
+    reverse_lines() over every segment of a (possibly rotated) log: the active
+    file, from `end` if given, then the closed segments, newest first.
+    """
+    for path in reversed(log_segments(log_file)):
+        if not path.endswith(".gz"):
+            try:
+                yield from reverse_lines(path, block_size, end if path == log_file else None)
+                continue
+            except FileNotFoundError:
+                path += ".gz"  # compressed since it was listed
+        try:
+            yield from _reverse_gzip_lines(path)
+        except FileNotFoundError:
+            continue  # removed by a rotation since it was listed
+
+def tail_lines(path, n, block_size=BLOCK_SIZE):
+    """The last n complete, non-empty lines of the log `path` (across segments), oldest first."""
+    lines = list(islice(reverse_log_lines(path, block_size), n))
+    lines.reverse()
+    return lines
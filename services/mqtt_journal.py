@@ -0,0 +1,290 @@
+"""
+MqttJournal: Disk-backed outbound queue for MQTT messages (store-and-forward).
+Messages that cannot be published are appended to journal segments in a
+directory; when the broker is back they are read out in order, published
+with QoS 1, and committed once acknowledged. The committed position is
+kept in a small "offset" file, replaced atomically at most once per
+commit_interval_s, so after a restart delivery resumes there (messages
+sent but not yet committed are sent again: at-least-once).
+
+Segment files "<seq>.jnl" (seq zero-padded, so names sort in order) hold
+records of:
+    uint32 length, uint32 crc32 of the body, uint8 retain, body
+with body = topic utf-8, b"\\n", payload utf-8. Appends go to the newest
+segment until it reaches segment_bytes. A torn record at the end of a
+segment (power loss mid-write) fails its length or crc check and ends that
+segment for the reader; after a restart new records go to a new segment,
+so nothing is ever rewritten in place.
+
+Threads: append(), ack() and drained() only touch memory, so neither the
+per-second acquisition job nor paho's network thread waits on the disk.
+All file I/O (writing the queued records, reading, the disk budget,
+deleting delivered segments, saving the commit) happens in read() and
+checkpoint(), which the publisher's drain thread calls at least once a
+second. The one exception is backpressure: once segment_bytes are queued,
+append() writes them itself. Messages still queued when the process dies
+are lost, like the page cache (there is no fsync).
+
+Disk budget: when the segments exceed max_bytes the oldest segment is
+deleted (oldest-first drop) and its undelivered messages are counted in
+`dropped`. Fully committed segments are deleted as the commit passes them.
+
+Usage:
+    journal = MqttJournal("mqtt_journal", max_bytes=16 * 1024 * 1024)
+    journal.append("sensors/sets", '{"flow_litres": 0.1}')   # queued in memory
+    for pos, topic, payload, retain in journal.read(10):   # writes the queue, advances the read cursor
+        ...publish with QoS 1 (the client resends it after a reconnect), then on PUBACK:
+        journal.ack(pos)
+    journal.checkpoint()   # periodically: saves the commit, deletes delivered segments
+    journal.close()
+"""
+import os
+import struct
+import threading
+import time
+import zlib
+
+RECORD = struct.Struct("<IIB")
+OFFSET_FILE = "offset"
+SEGMENT_SUFFIX = ".jnl"
+
+class MqttJournal:
+    def __init__(self, directory="mqtt_journal", max_bytes=16 * 1024 * 1024, segment_bytes=256 * 1024,
+                 commit_interval_s=1.0, log_mgr=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.segment_bytes = segment_bytes
+        self.commit_interval_s = commit_interval_s
+        self.log_mgr = log_mgr
+        self.dropped = 0
+        self._lock = threading.Lock()     # in-memory state; never held for file I/O
+        self._io_lock = threading.Lock()  # file I/O, one thread at a time
+        self._pending = []  # records appended but not yet written
+        self._pending_bytes = 0
+        self._released = []  # segments the commit has passed, deleted by the next checkpoint()
+        os.makedirs(directory, exist_ok=True)
+        # Segment seq -> size in bytes, oldest first
+        self._segments = {}
+        for name in sorted(os.listdir(directory)):
+            if name.endswith(SEGMENT_SUFFIX) and name[:-len(SEGMENT_SUFFIX)].isdigit():
+                self._segments[int(name[:-len(SEGMENT_SUFFIX)])] = os.path.getsize(os.path.join(directory, name))
+        if self._segments:
+            # The newest segment may end in a record torn by a crash: count only its valid prefix
+            newest = max(self._segments)
+            self._segments[newest] = max((end for end, *_ in self._records(newest, 0)), default=0)
+        # Appends always start a new segment, so a torn tail from a crash is never extended
+        self._write_seq = max(self._segments, default=0) + 1
+        self._writer = None
+        self._commit = self._load_commit()
+        self._read = self._commit
+        self._unacked = []  # end positions of read records, in read order
+        self._acked = set()
+        self._committed_at = 0.0
+        self._saved_commit = self._commit
+
+    # --- Positions are (segment seq, byte offset) tuples ---
+    def _path(self, seq):
+        return os.path.join(self.directory, f"{seq:020d}{SEGMENT_SUFFIX}")
+
+    def _load_commit(self):
+        first = min(self._segments, default=self._write_seq)
+        try:
+            with open(os.path.join(self.directory, OFFSET_FILE)) as f:
+                seq, offset = (int(v) for v in f.read().split())
+        except (FileNotFoundError, ValueError):
+            return (first, 0)
+        return max((seq, offset), (first, 0))
+
+    def _end(self):
+        """Position after the last record written."""
+        if self._segments:
+            seq = max(self._segments)
+            return (seq, self._segments[seq])
+        return (self._write_seq, 0)
+
+    # --- Writer ---
+    def append(self, topic, payload, retain=False):
+        """Queue a message for the journal; no file I/O unless segment_bytes are already queued."""
+        body = topic.encode() + b"\n" + (payload if isinstance(payload, bytes) else str(payload).encode())
+        record = RECORD.pack(len(body), zlib.crc32(body), 1 if retain else 0) + body
+        with self._lock:
+            self._pending.append(record)
+            self._pending_bytes += len(record)
+            backpressure = self._pending_bytes >= self.segment_bytes
+        if backpressure:
+            with self._io_lock:
+                self._persist()
+
+    def _persist(self):
+        """Write the queued records (caller holds _io_lock). Sizes count only what was flushed."""
+        with self._lock:
+            records, self._pending, self._pending_bytes = self._pending, [], 0
+        if not records:
+            return
+        written = {}  # segment seq -> bytes flushed to it
+        size = 0      # bytes written to the current segment, not yet flushed
+        try:
+            for record in records:
+                if self._writer is None or self._segments[self._write_seq] + size >= self.segment_bytes:
+                    if self._writer is not None:
+                        self._writer.flush()
+                        written[self._write_seq] = size
+                    self._open_segment()
+                    size = 0
+                self._writer.write(record)
+                size += len(record)
+            self._writer.flush()
+            written[self._write_seq] = size
+        except OSError as e:
+            # The segment may now end in a torn record: the next write starts a new one
+            self._close_writer()
+            if self.log_mgr:
+                self.log_mgr.log_error(f"MQTT journal write failed, up to {len(records)} messages lost: {e}")
+        with self._lock:
+            for seq, grown in written.items():
+                if seq in self._segments:
+                    self._segments[seq] += grown
+
+    def _open_segment(self):
+        self._close_writer()
+        writer = open(self._path(self._write_seq), "ab")
+        with self._lock:
+            self._segments[self._write_seq] = 0
+        self._writer = writer
+
+    def _close_writer(self):
+        if self._writer is not None:
+            try:
+                self._writer.close()
+            except OSError:
+                pass
+            self._writer = None
+            self._write_seq += 1
+
+    def _enforce_budget(self):
+        """Drop the oldest segments while over max_bytes (caller holds _io_lock)."""
+        while True:
+            with self._lock:
+                if sum(self._segments.values()) <= self.max_bytes or len(self._segments) <= 1:
+                    return
+                seq = min(self._segments)
+                offset = self._commit[1] if self._commit[0] == seq else 0
+                del self._segments[seq]
+                start = (min(self._segments), 0)
+                self._commit = max(self._commit, start)
+                self._read = max(self._read, start)
+                # Acks for dropped messages still in flight are ignored (they are <= the commit)
+                self._unacked = [pos for pos in self._unacked if pos > start]
+                self._acked = {pos for pos in self._acked if pos > start}
+            unsent = sum(1 for _ in self._records(seq, offset))
+            self.dropped += unsent
+            self._remove_segment(seq)
+            if self.log_mgr:
+                self.log_mgr.log_error(f"MQTT journal over {self.max_bytes} bytes: dropped {unsent} oldest messages")
+
+    def _remove_segment(self, seq):
+        try:
+            os.remove(self._path(seq))
+        except OSError:
+            pass
+
+    # --- Reader ---
+    def _records(self, seq, offset):
+        """Yield (end offset, topic, payload, retain) of the valid records of segment seq from offset."""
+        try:
+            with open(self._path(seq), "rb") as f:
+                f.seek(offset)
+                while True:
+                    header = f.read(RECORD.size)
+                    if len(header) < RECORD.size:
+                        return
+                    length, crc, retain = RECORD.unpack(header)
+                    body = f.read(length)
+                    if len(body) < length or zlib.crc32(body) != crc:
+                        return  # torn tail
+                    offset += RECORD.size + length
+                    topic, _, payload = body.partition(b"\n")
+                    yield offset, topic.decode(), payload.decode(), bool(retain)
+        except FileNotFoundError:
+            return
+
+    def read(self, n):
+        """Up to n unsent messages as (position, topic, payload, retain), advancing the read cursor."""
+        with self._io_lock:
+            self._persist()
+            self._enforce_budget()
+            with self._lock:
+                pos, end = self._read, self._end()
+                segments = sorted(self._segments)
+            out = []
+            while len(out) < n and pos < end:
+                seq, offset = pos
+                for record_end, topic, payload, retain in self._records(seq, offset):
+                    pos = (seq, record_end)
+                    out.append((pos, topic, payload, retain))
+                    if len(out) >= n:
+                        break
+                else:
+                    # End of this segment (or a torn tail): continue with the next one
+                    later = [s for s in segments if s > seq]
+                    if not later:
+                        break
+                    pos = (later[0], 0)
+            with self._lock:
+                self._read = pos
+                self._unacked.extend(record[0] for record in out)
+        return out
+
+    def ack(self, pos):
+        """Mark the message ending at pos delivered; commits the acknowledged prefix."""
+        with self._lock:
+            if pos <= self._commit:
+                return  # dropped or already committed
+            self._acked.add(pos)
+            while self._unacked and self._unacked[0] in self._acked:
+                self._acked.discard(self._unacked[0])
+                self._commit = self._unacked.pop(0)
+            for seq in [s for s in self._segments if s < self._commit[0]]:
+                del self._segments[seq]
+                self._released.append(seq)
+
+    def checkpoint(self, force=False):
+        """
+        Write the queued messages, apply the disk budget, delete delivered
+        segments and save the commit (at most once per commit_interval_s
+        unless force). The drain loop calls this on every pass.
+        """
+        with self._io_lock:
+            self._persist()
+            self._enforce_budget()
+            with self._lock:
+                released, self._released = self._released, []
+                commit = self._commit
+            for seq in released:
+                self._remove_segment(seq)
+            if commit != self._saved_commit and (
+                    force or time.monotonic() - self._committed_at >= self.commit_interval_s):
+                self._save_commit(commit)
+
+    def _save_commit(self, commit):
+        tmp = os.path.join(self.directory, OFFSET_FILE + ".tmp")
+        try:
+            with open(tmp, "w") as f:
+                f.write(f"{commit[0]} {commit[1]}\n")
+            os.replace(tmp, os.path.join(self.directory, OFFSET_FILE))
+        except OSError as e:
+            if self.log_mgr:
+                self.log_mgr.log_error(f"MQTT journal could not save its offset: {e}")
+            return
+        self._saved_commit = commit
+        self._committed_at = time.monotonic()
+
+    def drained(self):
+        """True if every journaled message has been delivered."""
+        with self._lock:
+            return not self._pending and self._commit >= self._end()
+
+    def close(self):
+        self.checkpoint(force=True)
+        with self._io_lock:
+            self._close_writer()
@@ -1,24 +1,48 @@
 """
 MqttPublisher: Centralized MQTT connection and publishing for sensor data.
 Handles connection, reconnection, and error logging for robust operation.
+Errors go through a LogManager (pass the application's to share its
+coalescing), so an unreachable broker logs each distinct message once per
+coalescing window instead of on every publish.
+
+Connecting and reconnecting (with backoff) happen on paho's loop thread,
+so publish() never blocks on an unreachable broker.
+
+Store-and-forward: with an MqttJournal, a message that cannot be published
+(not connected, or the publish fails) is queued in the journal instead of
+being lost, and so is every message while a backlog exists, to keep them
+in order. A drain thread sends the backlog with QoS 1 once connected, at
+most drain_rate messages per second (0 or None: unthrottled) and
+max_inflight unacknowledged at a time, and commits each one on its PUBACK.
+It also does all of the journal's file I/O (see MqttJournal). paho keeps the unacknowledged
+QoS 1 messages (its queue is bounded to max_inflight) and resends them,
+under the same mid, after a reconnect, so the drain thread never resends
+them itself. Messages acknowledged by the broker but not yet committed
+when the process stops are sent again after a restart (at-least-once).
 
 Usage:
-    mqtt = MqttPublisher(broker, port, topic_prefix)
+    mqtt = MqttPublisher(broker, port, topic_prefix, log_mgr=log_mgr,
+                         journal=MqttJournal("mqtt_journal"), drain_rate=20)
     mqtt.publish(topic, payload)
+    mqtt.close()   # stops the drain thread, saves the journal position and disconnects
 """
 import time
 import json
-import logging
 import threading
 import paho.mqtt.client as mqtt
+from services.log_manager import LogManager
+
+RECONNECT_DELAY_S = (1, 60)  # paho's reconnect backoff, min and max
 
 class MqttPublisher:
-    def __init__(self, broker, port=1883, topic_prefix=None, client_id=None, log_file="error_log.txt"):
+    def __init__(self, broker, port=1883, topic_prefix=None, client_id=None, log_file="error_log.txt",
+                 log_mgr=None, journal=None, drain_rate=20.0, max_inflight=20):
         self.broker = broker
         self.port = port
         self.topic_prefix = topic_prefix or ""
         self.client_id = client_id or f"SensorPublisher-{int(time.time())}"
         self.log_file = log_file
+        self.log_mgr = log_mgr or LogManager(log_file)
         self._lock = threading.Lock()
         self._connected = False
         self._client = mqtt.Client(client_id=self.client_id)
@@ -26,11 +50,34 @@ class MqttPublisher:
         self._client.on_disconnect = self._on_disconnect
         self._client.on_log = self._on_log
         self._client.on_publish = self._on_publish
+        self._client.reconnect_delay_set(*RECONNECT_DELAY_S)
+        self.journal = journal
+        self.drain_rate = drain_rate
+        self.max_inflight = max_inflight
+        if journal is not None:
+            # Every QoS 1 message paho holds is one the drain thread tracks in _inflight
+            self._client.max_inflight_messages_set(max_inflight)
+            self._client.max_queued_messages_set(max_inflight)
+        # Journal messages awaiting PUBACK. Never held while calling the client:
+        # paho runs on_publish under its own outgoing-message lock.
+        self._ack_lock = threading.Lock()
+        self._inflight = {}  # mid -> journal position
+        # PUBACKs of unknown mids seen while the drain thread is inside publish(), which
+        # can be the ack of the message being published before its mid is registered
+        self._sending = False
+        self._early_acks = set()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._drain_thread = None
         self._connect()
+        if journal is not None:
+            self._drain_thread = threading.Thread(target=self._drain, name="mqtt-drain", daemon=True)
+            self._drain_thread.start()
 
     def _connect(self):
+        """Start paho's loop thread, which connects and keeps reconnecting with backoff."""
         try:
-            self._client.connect(self.broker, self.port, keepalive=60)
+            self._client.connect_async(self.broker, self.port, keepalive=60)
             self._client.loop_start()
         except Exception as e:
             self._log_error(f"MQTT connect error: {e}")
@@ -39,6 +86,7 @@ class MqttPublisher:
     def _on_connect(self, client, userdata, flags, rc):
         if rc == 0:
             self._connected = True
+            self._wake.set()
         else:
             self._log_error(f"MQTT connection failed with code {rc}")
             self._connected = False
@@ -47,7 +95,6 @@ class MqttPublisher:
         self._connected = False
         if rc != 0:
             self._log_error(f"Unexpected MQTT disconnect (rc={rc}), reconnecting...")
-            self._connect()
 
     def _on_log(self, client, userdata, level, buf):
         # Only log errors and warnings to the error log
@@ -56,14 +103,76 @@ class MqttPublisher:
         # Optionally, handle info/debug elsewhere or ignore
 
     def _on_publish(self, client, userdata, mid):
-        pass  # Could add debug logging here if needed
+        if self.journal is None:
+            return
+        with self._ack_lock:
+            pos = self._inflight.pop(mid, None)
+            if pos is None:
+                if self._sending:
+                    self._early_acks.add(mid)
+                return
+        self.journal.ack(pos)
+        self._wake.set()
+
+    def _drain(self):
+        record = None  # read from the journal but not yet taken by the client
+        while not self._stop.is_set():
+            self._wake.clear()
+            try:
+                # Writes what publish() queued, deletes delivered segments, saves the commit
+                self.journal.checkpoint()
+                with self._ack_lock:
+                    ready = self._connected and len(self._inflight) < self.max_inflight
+                if ready and record is None:
+                    records = self.journal.read(1)
+                    record = records[0] if records else None
+                if not ready or record is None:
+                    self._wake.wait(1.0)
+                    continue
+                if self._send(record):
+                    record = None
+            except Exception as e:
+                # Keep draining: a dead drain thread would journal everything from now on
+                self._log_error(f"MQTT journal drain error: {e}")
+                self._stop.wait(1.0)
+                continue
+            if self.drain_rate and self.drain_rate > 0:
+                self._stop.wait(1.0 / self.drain_rate)
+
+    def _send(self, record):
+        """Publish a journal record with QoS 1; False if the client did not take it (try again later)."""
+        pos, topic, payload, retain = record
+        with self._ack_lock:
+            self._sending = True
+            self._early_acks.clear()
+        try:
+            result = self._client.publish(topic, payload, qos=1, retain=retain)
+        except (ValueError, TypeError) as e:
+            # Never publishable (e.g. an invalid topic): skip it instead of retrying it forever
+            with self._ack_lock:
+                self._sending = False
+            self._log_error(f"Dropping unpublishable journaled message on {topic}: {e}")
+            self.journal.ack(pos)
+            return True
+        with self._ack_lock:
+            self._sending = False
+            # With MQTT_ERR_NO_CONN paho still holds the message and sends it on reconnect
+            if result.rc not in (mqtt.MQTT_ERR_SUCCESS, mqtt.MQTT_ERR_NO_CONN):
+                return False
+            acked = result.mid in self._early_acks
+            if not acked:
+                self._inflight[result.mid] = pos
+        if acked:
+            self.journal.ack(pos)
+        return True
 
     def publish(self, topic, payload, qos=0, retain=False):
         full_topic = f"{self.topic_prefix}{topic}" if self.topic_prefix else topic
+        if self.journal is not None:
+            self._publish_or_journal(full_topic, payload, qos, retain)
+            return
         try:
             with self._lock:
-                if not self._connected:
-                    self._connect()
                 if isinstance(payload, (dict, list)):
                     payload = json.dumps(payload)
                 result = self._client.publish(full_topic, payload, qos=qos, retain=retain)
@@ -72,9 +181,41 @@ class MqttPublisher:
         except Exception as e:
             self._log_error(f"MQTT publish exception: {e}")
 
-    def _log_error(self, msg):
+    def _publish_or_journal(self, full_topic, payload, qos, retain):
+        if isinstance(payload, (dict, list)):
+            payload = json.dumps(payload)
+        try:
+            with self._lock:
+                # While a backlog exists new messages queue behind it, to stay in order
+                if not self._connected:
+                    self._log_error("MQTT not connected; journaling messages")
+                elif self.journal.drained():
+                    result = self._client.publish(full_topic, payload, qos=qos, retain=retain)
+                    if result.rc == mqtt.MQTT_ERR_SUCCESS:
+                        return
+                    self._log_error(f"MQTT publish failed: rc={result.rc}, topic={full_topic}; journaled")
+        except Exception as e:
+            self._log_error(f"MQTT publish exception: {e}; journaled")
         try:
-            with open(self.log_file, "a") as f:
-                f.write(f"[MQTT][{time.strftime('%Y-%m-%d %H:%M:%S')}] {msg}\n")
-        except Exception:
-            pass
+            # Only queued in memory; the drain thread writes it out
+            self.journal.append(full_topic, payload, retain)
+        except Exception as e:
+            self._log_error(f"MQTT journal append failed, message lost: {e}")
+        self._wake.set()
+
+    def close(self):
+        """Stop the journal drain thread, save the journal position and disconnect."""
+        self._stop.set()
+        self._wake.set()
+        if self._drain_thread is not None:
+            self._drain_thread.join(timeout=5)
+        if self.journal is not None:
+            self.journal.close()
+        try:
+            self._client.disconnect()
+            self._client.loop_stop()
+        except Exception as e:
+            self._log_error(f"MQTT disconnect error: {e}")
+
+    def _log_error(self, msg):
+        self.log_mgr.log("MQTT", msg)
@@ -0,0 +1,53 @@
+"""
+RangeStats: Summary statistics of a series over a time range, in NumPy.
+Works on a contiguous float array of values (a column of a BinarySeries
+view, or the values of a store/log query) with no per-sample Python code,
+so a month of readings summarizes in milliseconds.
+
+    linear_stats    count, min, max, mean, std (population), p50/p95/p99
+    circular_stats  count, circular mean, mean resultant length and the
+                    dominant compass sector, for directions in degrees
+
+Usage:
+    linear_stats(view["value"])
+    circular_stats(degrees)   # {"count": ..., "mean_deg": ..., "dominant_sector": "NW", ...}
+"""
+import numpy as np
+from sensors.wind_direction_sensor import COMPASS_LABELS
+
+PERCENTILES = (50, 95, 99)
+SECTORS = COMPASS_LABELS[:-1]  # the table repeats "N" for the wrap-around
+
+def linear_stats(values):
+    values = np.asarray(values, dtype=np.float64)
+    values = values[np.isfinite(values)]
+    result = {"count": int(values.size)}
+    if not values.size:
+        result.update(dict.fromkeys(["min", "max", "mean", "std"] + [f"p{p}" for p in PERCENTILES]))
+        return result
+    result.update({
+        "min": float(values.min()),
+        "max": float(values.max()),
+        "mean": float(values.mean()),
+        "std": float(values.std()),
+    })
+    for p, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+        result[f"p{p}"] = float(value)
+    return result
+
+def circular_stats(degrees):
+    degrees = np.asarray(degrees, dtype=np.float64)
+    degrees = degrees[np.isfinite(degrees)] % 360.0
+    result = {"count": int(degrees.size), "mean_deg": None, "resultant": None, "dominant_sector": None}
+    if not degrees.size:
+        return result
+    rad = np.radians(degrees)
+    s, c = np.sin(rad).sum(), np.cos(rad).sum()
+    result["resultant"] = float(np.hypot(s, c) / degrees.size)
+    # Same convention as CircularStats: no mean when the directions cancel out
+    if abs(s) >= 1e-12 or abs(c) >= 1e-12:
+        result["mean_deg"] = float(np.degrees(np.arctan2(s, c)) % 360.0) % 360.0  # -1e-15 % 360 rounds to 360
+    width = 360.0 / len(SECTORS)
+    sectors = ((degrees + width / 2) // width).astype(np.int64) % len(SECTORS)
+    result["dominant_sector"] = SECTORS[int(np.bincount(sectors, minlength=len(SECTORS)).argmax())]
+    return result
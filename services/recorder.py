@@ -0,0 +1,174 @@
+"""
+SampleRecorder: Compact binary capture of every raw per-tick sensor sample.
+Records what each driver returned to the main loop (pulse counts, ADC
+voltage/raw values, DHT22 and colour readings) plus every average the
+pipeline logged, with monotonic timestamps, so a field problem can be
+replayed through the pipeline later (see replay.py).
+
+File layout (little-endian):
+    header:  b"SMRAW1", int64 start monotonic ns, float64 start wall-clock epoch
+    record:  int64 monotonic ns, uint8 kind, uint16 payload length, payload
+
+Usage:
+    recorder = SampleRecorder("raw_samples_{start}.bin")
+    recorder.record_frame(frame)           # once per acquisition tick
+    recorder.record_color(color_readings)  # once per colour cycle
+    recorder.record_aggregate("avg_psi", "37.12", 300)
+    for ts_ns, kind, payload in read_recording("raw_samples.bin")[1]: ...
+"""
+import math
+import struct
+import threading
+from hardware import clock
+
+MAGIC = b"SMRAW1"
+HEADER = struct.Struct("<6sqd")
+RECORD = struct.Struct("<qBH")
+
+# Record kinds
+FRAME = 0            # marks the start of an acquisition tick; no payload
+FLOW = 1             # pulses (uint32), elapsed_s (float64)
+WIND = 2             # pulses (uint32), elapsed_s (float64)
+PRESSURE = 3         # mean voltage (float64), samples averaged (uint16)
+WIND_DIRECTION = 4   # raw ADC value (int32)
+DHT22 = 5            # temperature, humidity (float64), age_s (float32), stale (uint8)
+COLOR = 6            # count (uint8), then count x (r, g, b uint8, lux float64)
+AGGREGATE = 7        # label, value (uint8-length-prefixed utf-8), samples (uint32)
+
+PULSES = struct.Struct("<Id")
+PRESSURE_FMT = struct.Struct("<dH")
+WIND_DIRECTION_FMT = struct.Struct("<i")
+DHT22_FMT = struct.Struct("<ddfB")
+COLOR_READING = struct.Struct("<BBBd")
+
+NO_COUNT = 0xFFFFFFFF   # uint32 stand-in for None
+NO_RAW = -2 ** 31       # int32 stand-in for None
+
+def _f(value):
+    return math.nan if value is None else float(value)
+
+def _none_if_nan(value):
+    return None if math.isnan(value) else value
+
+def _pack_str(text):
+    data = str(text).encode("utf-8")[:255]
+    return bytes([len(data)]) + data
+
+class SampleRecorder:
+    def __init__(self, path, flush_interval_s=5.0):
+        # One file per run: monotonic timestamps restart with each boot, so
+        # sessions must not be appended to each other. "{start}" in the path
+        # is replaced with the start time.
+        self.path = path.format(start=clock.now().strftime("%Y%m%dT%H%M%S"))
+        self.flush_interval_s = flush_interval_s
+        self._lock = threading.Lock()
+        self._file = open(self.path, "wb")
+        self._last_flush = clock.monotonic()
+        self._file.write(HEADER.pack(MAGIC, int(clock.monotonic() * 1e9), clock.time()))
+        self.records = 0
+
+    def _write(self, kind, payload=b""):
+        ts_ns = int(clock.monotonic() * 1e9)
+        with self._lock:
+            self._file.write(RECORD.pack(ts_ns, kind, len(payload)) + payload)
+            self.records += 1
+            now = clock.monotonic()
+            if now - self._last_flush >= self.flush_interval_s:
+                self._file.flush()
+                self._last_flush = now
+
+    def record_frame(self, frame):
+        """Record one acquisition tick: {"flow": ..., "pressure": ..., "wind": ..., "wind_direction": ..., "dht22": ...}."""
+        self._write(FRAME)
+        flow = frame.get("flow")
+        if flow is not None:
+            pulses = flow.get("flow_pulses")
+            self._write(FLOW, PULSES.pack(NO_COUNT if pulses is None else pulses, _f(flow.get("elapsed_s"))))
+        wind = frame.get("wind")
+        if wind is not None:
+            pulses = wind.get("wind_pulses")
+            self._write(WIND, PULSES.pack(NO_COUNT if pulses is None else pulses, _f(wind.get("elapsed_s"))))
+        pressure = frame.get("pressure")
+        if pressure is not None:
+            self._write(PRESSURE, PRESSURE_FMT.pack(_f(pressure.get("pressure_voltage")), pressure.get("samples") or 0))
+        wind_dir = frame.get("wind_direction")
+        if wind_dir is not None:
+            raw = wind_dir.get("wind_direction_raw")
+            self._write(WIND_DIRECTION, WIND_DIRECTION_FMT.pack(NO_RAW if raw is None else raw))
+        dht = frame.get("dht22")
+        if dht is not None:
+            self._write(DHT22, DHT22_FMT.pack(_f(dht.get("temperature")), _f(dht.get("humidity")),
+                                              _f(dht.get("age_s")), 1 if dht.get("stale") else 0))
+
+    def record_color(self, readings):
+        readings = (readings or [])[:255]
+        payload = bytes([len(readings)]) + b"".join(
+            COLOR_READING.pack(r["r"], r["g"], r["b"], _f(r["lux"])) for r in readings)
+        self._write(COLOR, payload)
+
+    def record_aggregate(self, label, value, samples):
+        self._write(AGGREGATE, _pack_str(label) + _pack_str(value) + struct.pack("<I", samples))
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+def decode(kind, payload):
+    """Decode a record payload into plain values (None where the reading was missing)."""
+    if kind == FRAME:
+        return None
+    if kind in (FLOW, WIND):
+        pulses, elapsed = PULSES.unpack(payload)
+        return {"pulses": None if pulses == NO_COUNT else pulses, "elapsed_s": _none_if_nan(elapsed)}
+    if kind == PRESSURE:
+        voltage, samples = PRESSURE_FMT.unpack(payload)
+        return {"voltage": _none_if_nan(voltage), "samples": samples}
+    if kind == WIND_DIRECTION:
+        (raw,) = WIND_DIRECTION_FMT.unpack(payload)
+        return {"raw": None if raw == NO_RAW else raw}
+    if kind == DHT22:
+        temperature, humidity, age, stale = DHT22_FMT.unpack(payload)
+        return {"temperature": _none_if_nan(temperature), "humidity": _none_if_nan(humidity),
+                "age_s": _none_if_nan(age), "stale": bool(stale)}
+    if kind == COLOR:
+        count = payload[0]
+        return [dict(zip(("r", "g", "b", "lux"), COLOR_READING.unpack_from(payload, 1 + i * COLOR_READING.size)))
+                for i in range(count)]
+    if kind == AGGREGATE:
+        label_len = payload[0]
+        label = payload[1:1 + label_len].decode("utf-8")
+        value_len = payload[1 + label_len]
+        value = payload[2 + label_len:2 + label_len + value_len].decode("utf-8")
+        (samples,) = struct.unpack_from("<I", payload, 2 + label_len + value_len)
+        return {"label": label, "value": value, "samples": samples}
+    raise ValueError(f"Unknown record kind {kind}")
+
+def read_recording(path):
+    """
+    Return ((start_mono_ns, start_wall), records) where records yields
+    (ts_ns, kind, decoded_payload). A truncated final record (e.g. the
+    recorder was killed mid-write) is ignored.
+    """
+    f = open(path, "rb")
+    header = f.read(HEADER.size)
+    if len(header) < HEADER.size:
+        f.close()
+        raise ValueError(f"{path}: not a raw sample recording")
+    magic, start_ns, start_wall = HEADER.unpack(header)
+    if magic != MAGIC:
+        f.close()
+        raise ValueError(f"{path}: not a raw sample recording")
+
+    def records():
+        with f:
+            while True:
+                head = f.read(RECORD.size)
+                if len(head) < RECORD.size:
+                    return
+                ts_ns, kind, length = RECORD.unpack(head)
+                payload = f.read(length)
+                if len(payload) < length:
+                    return
+                yield ts_ns, kind, decode(kind, payload)
+
+    return (start_ns, start_wall), records()
@@ -0,0 +1,135 @@
+"""
+RollupEngine: Cascading multi-resolution downsampling of per-second readings.
+Samples go into the finest tier; when a tier's bucket closes (on wall-clock
+multiples of its width) its statistics are handed to that tier's sinks and
+merged into the next tier's open bucket, so each tier is built from the one
+below without revisiting raw samples. Closed buckets are kept per tier, up to
+its retention, for in-process consumers.
+
+Usage:
+    engine = RollupEngine({"pressure": LINEAR, "wind_direction": CIRCULAR}, log_mgr=log_mgr)
+    engine.add_tier("1s", 1, retention=300)
+    engine.add_tier("5min", 300, retention=2016, sinks=[write_avg_log])
+    engine.add(clock.time(), {"pressure": 37.2, "wind_direction": (350.0, "N")})
+    engine.advance(clock.time())     # closes every bucket whose end has passed
+    engine.history("5min", "pressure", n=12)
+
+A sink is called as sink(tier, metric, bucket) with a Bucket tuple; tier is
+the Tier object (tier.name, tier.seconds).
+"""
+import math
+from collections import deque, namedtuple
+from services.aggregators import RunningStats, CircularStats
+
+LINEAR = "linear"
+CIRCULAR = "circular"
+
+# start/end are wall-clock epoch seconds. For circular metrics mean is the
+# circular mean, spread the mean resultant length and label the dominant
+# compass label; min/max are None. For linear metrics spread is the stddev.
+Bucket = namedtuple("Bucket", "start end count mean min max spread label")
+
+class Tier:
+    def __init__(self, name, seconds, retention=0, sinks=()):
+        self.name = name
+        self.seconds = seconds
+        self.retention = retention
+        self.sinks = list(sinks)
+        self.start = None  # start of the open bucket, None until the first sample
+        self.stats = {}
+        self.history = {}
+
+    def bucket_start(self, ts):
+        return math.floor(ts / self.seconds) * self.seconds
+
+class RollupEngine:
+    def __init__(self, metrics, log_mgr=None):
+        self.metrics = dict(metrics)
+        self.log_mgr = log_mgr
+        self.tiers = []
+
+    def add_tier(self, name, seconds, retention=0, sinks=()):
+        """Append a tier; each must be a whole multiple of the previous one."""
+        if self.tiers and (seconds <= self.tiers[-1].seconds or seconds % self.tiers[-1].seconds):
+            raise ValueError(f"Tier {name} ({seconds} s) is not a multiple of {self.tiers[-1].name}")
+        tier = Tier(name, seconds, retention, sinks)
+        for metric, kind in self.metrics.items():
+            tier.stats[metric] = CircularStats() if kind == CIRCULAR else RunningStats()
+            tier.history[metric] = deque(maxlen=retention) if retention else None
+        self.tiers.append(tier)
+        return tier
+
+    def tier(self, name):
+        for tier in self.tiers:
+            if tier.name == name:
+                return tier
+        raise KeyError(name)
+
+    def add(self, ts, values):
+        """
+        Add one frame. values maps metric -> number (None is skipped); circular
+        metrics take (degrees, label) or just degrees.
+        """
+        tier = self.tiers[0]
+        self._open(0, tier.bucket_start(ts))
+        for metric, value in values.items():
+            if value is None:
+                continue
+            stats = tier.stats[metric]
+            if self.metrics[metric] == CIRCULAR:
+                degrees, label = value if isinstance(value, tuple) else (value, None)
+                if degrees is not None:
+                    stats.add(degrees, label)
+            else:
+                stats.add(value)
+
+    def advance(self, now):
+        """Close, emit and cascade every bucket that ended at or before `now`."""
+        for i, tier in enumerate(self.tiers):
+            if tier.start is not None and now >= tier.start + tier.seconds:
+                self._close(i)
+
+    def _open(self, i, start):
+        tier = self.tiers[i]
+        if tier.start is not None and start >= tier.start + tier.seconds:
+            # Data arrived for a later bucket before advance() closed this one
+            self._close(i)
+        if tier.start is None:
+            tier.start = start
+
+    def _close(self, i):
+        tier = self.tiers[i]
+        start = tier.start
+        parent = self.tiers[i + 1] if i + 1 < len(self.tiers) else None
+        if parent is not None:
+            self._open(i + 1, parent.bucket_start(start))
+        for metric, stats in tier.stats.items():
+            if stats:
+                bucket = self._bucket(start, tier.seconds, stats)
+                if tier.history[metric] is not None:
+                    tier.history[metric].append(bucket)
+                for sink in tier.sinks:
+                    try:
+                        sink(tier, metric, bucket)
+                    except Exception as e:
+                        if self.log_mgr is not None:
+                            self.log_mgr.log_error(f"Rollup sink error ({tier.name}/{metric}): {e}")
+                if parent is not None:
+                    parent.stats[metric].merge(stats)
+            stats.reset()
+        tier.start = None
+
+    def _bucket(self, start, seconds, stats):
+        if isinstance(stats, CircularStats):
+            return Bucket(start, start + seconds, stats.count, stats.mean, None, None,
+                          stats.resultant, stats.most_common())
+        return Bucket(start, start + seconds, stats.count, stats.mean, stats.min, stats.max,
+                      stats.stddev, None)
+
+    def history(self, tier_name, metric, n=None):
+        """Closed buckets of `metric` in tier `tier_name`, oldest first (last n if given)."""
+        buckets = self.tier(tier_name).history[metric]
+        if buckets is None:
+            return []
+        buckets = list(buckets)
+        return buckets[-n:] if n else buckets
@@ -0,0 +1,153 @@
+"""
+Scheduler: Fixed-rate, drift-compensated periodic job runner.
+Deadlines are kept on the monotonic clock, so the period does not drift with
+job latency and NTP wall-clock steps do not stretch or shrink intervals.
+
+Usage:
+    scheduler = Scheduler(log_mgr=log_mgr)
+    scheduler.add_job("acquire", 1.0, acquire_and_publish)
+    scheduler.add_job("pressure_avg", 300, log_pressure_avg, align=True)
+    scheduler.add_job("color", 300, report_plant, background=True)
+    scheduler.run_forever()
+"""
+import math
+import threading
+import time
+
+SKIP = "skip"            # missed deadlines are dropped; run once and resume on the grid
+CATCH_UP = "catch_up"    # missed deadlines are run back-to-back (up to max_catch_up)
+
+class Job:
+    def __init__(self, name, interval_s, fn, on_miss, next_due, max_catch_up, background=False):
+        self.name = name
+        self.interval_s = interval_s
+        self.fn = fn
+        self.on_miss = on_miss
+        self.next_due = next_due
+        self.max_catch_up = max_catch_up
+        self.background = background
+        self.thread = None
+        self.runs = 0
+        self.overruns = 0
+        self.skipped = 0
+        self.last_duration = 0.0
+        self.max_lateness = 0.0
+
+class Scheduler:
+    def __init__(self, clock=time.monotonic, sleep=time.sleep, wall_clock=time.time, log_mgr=None):
+        self.clock = clock
+        self.sleep = sleep
+        self.wall_clock = wall_clock
+        self.log_mgr = log_mgr
+        self.jobs = []
+        self._running = False
+        # Capture one (monotonic, wall) pair so every aligned job shares the
+        # same reference and boundaries of different intervals coincide.
+        self._base_mono = clock()
+        self._base_wall = wall_clock()
+
+    def add_job(self, name, interval_s, fn, on_miss=SKIP, align=False, max_catch_up=10, background=False):
+        """
+        Register fn() to run every interval_s seconds.
+        align: first run on the next wall-clock multiple of interval_s (e.g.
+               :00, :05, :10 for 300 s), instead of immediately.
+        on_miss: SKIP or CATCH_UP, see module constants.
+        background: run fn() on its own thread so a slow job (e.g. the colour
+                    sensor's LED/settle cycle) never delays the other jobs.
+                    A run is skipped if the previous one is still going.
+        """
+        if align:
+            offset = math.ceil(self._base_wall / interval_s) * interval_s - self._base_wall
+            next_due = self._base_mono + offset
+        else:
+            next_due = self.clock()
+        job = Job(name, interval_s, fn, on_miss, next_due, max_catch_up, background)
+        self.jobs.append(job)
+        return job
+
+    def run_pending(self):
+        """Run every job whose deadline has passed, in registration order."""
+        for job in self.jobs:
+            now = self.clock()
+            if now < job.next_due:
+                continue
+            lateness = now - job.next_due
+            job.max_lateness = max(job.max_lateness, lateness)
+            self._run_job(job)
+            job.next_due += job.interval_s
+            now = self.clock()
+            if now < job.next_due:
+                continue
+            # Deadline(s) missed: the job (or something before it) overran.
+            job.overruns += 1
+            missed = int((now - job.next_due) // job.interval_s) + 1
+            if job.on_miss == CATCH_UP and missed <= job.max_catch_up:
+                # Leave next_due in the past; the next passes run it back-to-back.
+                continue
+            job.skipped += missed
+            job.next_due += missed * job.interval_s
+            self._log(f"Scheduler: job '{job.name}' overran (took {job.last_duration:.3f}s, "
+                      f"interval {job.interval_s}s); skipped {missed} run(s), {job.skipped} total")
+
+    def _run_job(self, job):
+        if not job.background:
+            self._call(job)
+            return
+        if job.thread is not None and job.thread.is_alive():
+            job.skipped += 1
+            self._log(f"Scheduler: background job '{job.name}' still running; skipped this run ({job.skipped} total)")
+            return
+        job.thread = threading.Thread(target=self._call, args=(job,), name=f"job-{job.name}", daemon=True)
+        job.thread.start()
+
+    def _call(self, job):
+        start = self.clock()
+        try:
+            job.fn()
+        except Exception as e:
+            self._log(f"Scheduler: job '{job.name}' raised: {e}")
+        job.last_duration = self.clock() - start
+        job.runs += 1
+
+    def time_until_next(self):
+        """Seconds until the earliest deadline (0 if one is already due)."""
+        if not self.jobs:
+            return None
+        return max(0.0, min(job.next_due for job in self.jobs) - self.clock())
+
+    def run_forever(self):
+        """Run jobs at their deadlines until stop() is called."""
+        self._running = True
+        while self._running:
+            self.run_pending()
+            delay = self.time_until_next()
+            if delay is None:
+                break
+            if delay > 0:
+                self.sleep(delay)
+
+    def stop(self):
+        self._running = False
+
+    def join_background(self, timeout=None):
+        """Wait for running background jobs to finish (e.g. before GPIO cleanup)."""
+        for job in self.jobs:
+            if job.thread is not None:
+                job.thread.join(timeout)
+
+    def stats(self):
+        """Per-job run/overrun counters, for diagnostics."""
+        return {
+            job.name: {
+                "runs": job.runs,
+                "overruns": job.overruns,
+                "skipped": job.skipped,
+                "last_duration_s": job.last_duration,
+                "max_lateness_s": job.max_lateness,
+            }
+            for job in self.jobs
+        }
+
+    def _log(self, msg):
+        if self.log_mgr is not None:
+            self.log_mgr.log_error(msg)
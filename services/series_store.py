@@ -0,0 +1,188 @@
+"""
+SeriesStore: Embedded SQLite (WAL) time-series store for averaged readings.
+Replaces the per-metric avg_*_log.txt files when "series_backend" is
+"sqlite": SensorMonitor appends rows, which are inserted in batched
+transactions, and the API reads them through the (metric, ts) index, so
+lookups cost the same whatever the history size. WAL mode lets the API
+process read while SensorMonitor writes. Old rows are pruned per metric.
+
+Usage:
+    store = SeriesStore("series.db", retention_days={"default": 365, "flow": 90})
+    store.append("pressure", ts, 37.12, samples=300)
+    store.flush_if_due(clock.time())          # from a periodic job
+    store.latest("pressure", 5)
+    store.range("pressure", start_ts, end_ts)
+    store.close()
+
+Rows: metric, ts (epoch seconds), value, min, max, samples, label (e.g. the
+compass sector of a wind direction average).
+"""
+import sqlite3
+import threading
+from hardware import clock
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS readings (
+    metric TEXT NOT NULL,
+    ts REAL NOT NULL,
+    value REAL,
+    min REAL,
+    max REAL,
+    samples INTEGER,
+    label TEXT
+);
+CREATE INDEX IF NOT EXISTS readings_metric_ts ON readings (metric, ts);
+"""
+COLUMNS = ("metric", "ts", "value", "min", "max", "samples", "label")
+PRUNE_INTERVAL_S = 3600
+
+class SeriesStore:
+    def __init__(self, path="series.db", batch_size=50, flush_interval_s=30.0, retention_days=None,
+                 readonly=False, log_mgr=None):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        # metric -> days to keep; "default" covers metrics not listed; None keeps everything
+        self.retention_days = retention_days or {}
+        self.readonly = readonly
+        self.log_mgr = log_mgr
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pending = []
+        # On hardware.clock, like the scheduler, so flushes and pruning follow sim/replay time.
+        # A read-only store (the API) never flushes, and never touches the hardware backend.
+        self._last_flush = None if readonly else clock.monotonic()
+        self._last_prune = None
+        if not readonly:
+            conn = self._conn()
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _conn(self):
+        # One connection per thread: the API serves requests on several threads.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if self.readonly:
+                conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+            else:
+                conn = sqlite3.connect(self.path)
+                # WAL + NORMAL: durable across power loss up to the last checkpoint, no fsync per commit
+                conn.execute("PRAGMA synchronous=NORMAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def append(self, metric, ts, value, samples=None, min=None, max=None, label=None):
+        """Buffer one row; written with the next batch."""
+        with self._lock:
+            self._pending.append((metric, ts, value, min, max, samples, label))
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush_if_due(self, now=None):
+        """Flush if flush_interval_s has passed, and prune hourly. `now` is the writer's wall clock."""
+        if clock.monotonic() - self._last_flush >= self.flush_interval_s:
+            self.flush()
+        if self.retention_days and (self._last_prune is None
+                                    or clock.monotonic() - self._last_prune >= PRUNE_INTERVAL_S):
+            self.prune(now)
+
+    def flush(self):
+        """Insert every buffered row in one transaction."""
+        with self._lock:
+            rows, self._pending = self._pending, []
+            self._last_flush = clock.monotonic()
+            if not rows:
+                return
+            try:
+                conn = self._conn()
+                with conn:
+                    conn.executemany(f"INSERT INTO readings ({', '.join(COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            except Exception as e:
+                if self.log_mgr is not None:
+                    self.log_mgr.log_error(f"Series store insert failed ({len(rows)} rows dropped): {e}")
+
+    def prune(self, now=None):
+        """Delete rows older than each metric's retention."""
+        now = clock.time() if now is None else now
+        self._last_prune = clock.monotonic()
+        listed = [m for m in self.retention_days if m != "default"]
+        with self._lock:
+            try:
+                conn = self._conn()
+                with conn:
+                    for metric in listed:
+                        conn.execute("DELETE FROM readings WHERE metric = ? AND ts < ?",
+                                     (metric, now - self.retention_days[metric] * 86400))
+                    default = self.retention_days.get("default")
+                    if default is not None:
+                        placeholders = ", ".join("?" for _ in listed)
+                        conn.execute(f"DELETE FROM readings WHERE ts < ? AND metric NOT IN ({placeholders})",
+                                     [now - default * 86400] + listed)
+            except Exception as e:
+                if self.log_mgr is not None:
+                    self.log_mgr.log_error(f"Series store prune failed: {e}")
+
+    def latest(self, metric, n):
+        """The n most recent rows of `metric` as dicts, oldest first."""
+        rows = self._conn().execute(
+            "SELECT * FROM readings WHERE metric = ? ORDER BY ts DESC LIMIT ?", (metric, n)).fetchall()
+        return [dict(row) for row in reversed(rows)]
+
+    def bounds(self, metric):
+        """(first ts, last ts) of `metric`, or (None, None); two index lookups, no scan."""
+        return self._conn().execute(
+            "SELECT (SELECT MIN(ts) FROM readings WHERE metric = ?), (SELECT MAX(ts) FROM readings WHERE metric = ?)",
+            (metric, metric)).fetchone()
+
+    def range(self, metric, start=None, end=None, limit=None):
+        """Rows of `metric` with start <= ts <= end (either bound optional), oldest first."""
+        query = "SELECT * FROM readings WHERE metric = ?"
+        args = [metric]
+        if start is not None:
+            query += " AND ts >= ?"
+            args.append(start)
+        if end is not None:
+            query += " AND ts <= ?"
+            args.append(end)
+        query += " ORDER BY ts"
+        if limit is not None:
+            query += " LIMIT ?"
+            args.append(limit)
+        return [dict(row) for row in self._conn().execute(query, args)]
+
+    def range_values(self, metric, start=None, end=None):
+        """(rowid, ts, value) tuples of `metric` in the range, oldest first; cheap input for downsampling."""
+        query = "SELECT rowid, ts, value FROM readings WHERE metric = ?"
+        args = [metric]
+        if start is not None:
+            query += " AND ts >= ?"
+            args.append(start)
+        if end is not None:
+            query += " AND ts <= ?"
+            args.append(end)
+        conn = self._conn()
+        conn.row_factory = None
+        try:
+            return conn.execute(query + " ORDER BY ts", args).fetchall()
+        finally:
+            conn.row_factory = sqlite3.Row
+
+    def rows_by_id(self, rowids):
+        """Full rows for the given rowids (e.g. the points kept by downsampling), oldest first."""
+        rows = []
+        ids = [int(i) for i in rowids]
+        for i in range(0, len(ids), 500):  # stay under SQLite's bound-parameter limit
+            chunk = ids[i:i + 500]
+            rows += self._conn().execute(
+                f"SELECT * FROM readings WHERE rowid IN ({', '.join('?' for _ in chunk)})", chunk).fetchall()
+        return sorted((dict(row) for row in rows), key=lambda row: row["ts"])
+
+    def close(self):
+        if not self.readonly:
+            self.flush()
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None